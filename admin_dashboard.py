@@ -2,8 +2,17 @@ import logging
 from datetime import datetime, timedelta
 from typing import Dict, Any, List
 from app import db
-from models import User, Goal, Task, AIConversation, BusinessProcess, FinancialData, ServiceTemplate, Payment, SystemMetrics
+from models import User, Goal, Task, AIConversation, BusinessProcess, FinancialData, ServiceTemplate, Payment
 from ai_providers import ai_manager
+from metrics_writer import metrics_writer
+from text_compression import text_codec
+from template_cache import customization_cache
+from identity_cache import identity_cache
+from metrics_rollup import metrics_rollup
+from provider_clients import provider_clients
+from tracing import tracer
+from sampling_profiler import sampling_profiler
+from usage_budget import usage_budget
 
 class AdminDashboardSystem:
     def __init__(self):
@@ -144,16 +153,24 @@ class AdminDashboardSystem:
             # Check AI providers
             ai_health = len(self.ai_manager.providers) > 0
             
-            # Get recent error metrics
-            error_metrics = SystemMetrics.query.filter(
-                SystemMetrics.metric_type == "error",
-                SystemMetrics.timestamp >= datetime.now() - timedelta(hours=24)
-            ).count()
+            # Get recent error metrics from the coarsest rollup tier that covers the window
+            error_metrics = metrics_rollup.aggregate(
+                "error", datetime.now() - timedelta(hours=24)
+            )["count"]
             
             return {
                 "database": db_health,
                 "ai_providers": ai_health,
                 "error_count_24h": error_metrics,
+                "metrics_writer": metrics_writer.get_stats(),
+                "text_compression": text_codec.get_stats(),
+                "template_cache": customization_cache.get_stats(),
+                "identity_cache": identity_cache.get_stats(),
+                "metrics_rollup": metrics_rollup.last_run,
+                "provider_pools": provider_clients.get_stats(),
+                "tracing": tracer.get_stats(),
+                "profiler": sampling_profiler.get_stats(),
+                "usage_budget": usage_budget.get_status(),
                 "status": "healthy" if db_health and ai_health and error_metrics < 10 else "degraded"
             }
             
@@ -5,11 +5,14 @@ Coordinates multiple agents to provide comprehensive responses
 
 import logging
 from typing import Dict, Any, List, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
 from ai_providers import ai_manager
-from query_analyzer import query_analyzer
+from agent_registry import agent_registry, AgentProfile
 from token_limiter import token_limiter
+from prompt_templates import prompt_cache, CompiledPrompt
+from tracing import tracer
+from prometheus_metrics import prometheus_metrics
 
 @dataclass
 class AgentResponse:
@@ -35,194 +38,54 @@ class ChainResult:
     processing_time: float
     confidence_score: float
     perspectives_covered: List[str]
+    failed_agents: List[str] = field(default_factory=list)
+
+FALLBACK_AGENT_PROMPT = """You are a {agent_type} AI agent providing expert analysis.
+                
+                Context from previous agents: {{context}}
+                
+                User Query: {{query}}
+                
+                Provide your expert perspective and actionable recommendations."""
+
+MASTER_SYNTHESIS_INSTRUCTIONS = """You are a Master Synthesizer AI agent responsible for combining multiple expert perspectives into one comprehensive, actionable response.
+            
+            Your task is to:
+            1. Synthesize all perspectives into a cohesive, comprehensive answer
+            2. Identify key themes and overlapping insights
+            3. Highlight any conflicting viewpoints and provide balanced resolution
+            4. Create a clear, actionable plan that incorporates all relevant perspectives
+            5. Prioritize recommendations based on importance and feasibility
+            
+            Provide a well-structured synthesis that gives the user a complete, actionable response to their query. Use clear headings and bullet points for organization."""
 
 class AgentChainOrchestrator:
     """Orchestrates multiple agents for comprehensive responses"""
     
     def __init__(self):
-        self.agent_prompts = {
-            'CFO': """You are a CFO (Chief Financial Officer) AI agent with expertise in financial analysis, budgeting, and strategic financial planning. 
-            
-            Your role is to provide comprehensive financial perspective on the user's query. Focus on:
-            - Financial implications and costs
-            - Budget analysis and recommendations
-            - Investment considerations
-            - Risk assessment from financial perspective
-            - Revenue and profitability analysis
-            - Cash flow considerations
-            
-            Context from previous agents: {context}
-            
-            User Query: {query}
-            
-            Provide a detailed financial analysis and recommendations. Use clear financial reasoning and include specific actionable insights.""",
-            
-            'CSA': """You are a CSA (Chief Strategy Advisor) AI agent with expertise in strategic planning, market analysis, and business development.
-            
-            Your role is to provide comprehensive strategic perspective on the user's query. Focus on:
-            - Strategic implications and opportunities
-            - Market analysis and competitive landscape
-            - Long-term planning and vision
-            - Growth strategies and scaling
-            - Competitive advantages and positioning
-            - Strategic risk assessment
-            
-            Context from previous agents: {context}
-            
-            User Query: {query}
-            
-            Provide a detailed strategic analysis and recommendations. Use clear strategic reasoning and include specific actionable insights.""",
-            
-            'COO': """You are a COO (Chief Operating Officer) AI agent with expertise in operations management, process optimization, and execution planning.
-            
-            Your role is to provide comprehensive operational perspective on the user's query. Focus on:
-            - Implementation roadmaps and timelines
-            - Process optimization and efficiency
-            - Resource allocation and management
-            - Operational risk mitigation
-            - Performance metrics and KPIs
-            - Execution strategies and tactics
-            
-            Context from previous agents: {context}
-            
-            User Query: {query}
-            
-            Provide a detailed operational analysis and implementation plan. Use clear operational reasoning and include specific actionable steps.""",
-            
-            'CRO': """You are a CRO (Chief Risk Officer) AI agent with expertise in risk assessment, compliance, and protective strategies.
-            
-            Your role is to provide comprehensive risk perspective on the user's query. Focus on:
-            - Risk identification and assessment
-            - Compliance requirements and regulations
-            - Threat analysis and mitigation strategies
-            - Safety and security considerations
-            - Contingency planning
-            - Risk monitoring and management
-            
-            Context from previous agents: {context}
-            
-            User Query: {query}
-            
-            Provide a detailed risk analysis and mitigation recommendations. Use clear risk reasoning and include specific protective measures.""",
-            
-            'Legal_Expert': """You are a Legal Expert AI agent with expertise in legal analysis, contract review, and rights assessment.
-            
-            Your role is to provide comprehensive legal perspective on the user's query. Focus on:
-            - Legal implications and requirements
-            - Rights and obligations analysis
-            - Contract and agreement considerations
-            - Regulatory compliance
-            - Legal risk assessment
-            - Protective legal strategies
-            
-            Context from previous agents: {context}
-            
-            User Query: {query}
-            
-            Provide a detailed legal analysis and recommendations. Use clear legal reasoning and include specific actionable guidance.""",
-            
-            'Life_Coach': """You are a Life Coach AI agent with expertise in personal development, goal setting, and motivational guidance.
-            
-            Your role is to provide comprehensive personal perspective on the user's query. Focus on:
-            - Personal development and growth
-            - Goal setting and achievement strategies
-            - Motivation and mindset optimization
-            - Life balance and well-being
-            - Personal readiness assessment
-            - Emotional and psychological considerations
-            
-            Context from previous agents: {context}
-            
-            User Query: {query}
-            
-            Provide a detailed personal development analysis and guidance. Use clear motivational reasoning and include specific actionable steps for personal growth.""",
-            
-            'Career_Coach': """You are a Career Coach AI agent with expertise in professional development, job search, and career advancement.
-            
-            Your role is to provide comprehensive career perspective on the user's query. Focus on:
-            - Career development strategies
-            - Professional growth opportunities
-            - Job market analysis and positioning
-            - Skill development recommendations
-            - Networking and relationship building
-            - Career transition planning
-            
-            Context from previous agents: {context}
-            
-            User Query: {query}
-            
-            Provide a detailed career analysis and development plan. Use clear career reasoning and include specific actionable career steps.""",
-            
-            'Tech_Expert': """You are a Technology Expert AI agent with expertise in technology analysis, system design, and digital transformation.
-            
-            Your role is to provide comprehensive technical perspective on the user's query. Focus on:
-            - Technology solutions and recommendations
-            - System design and architecture
-            - Digital transformation strategies
-            - Innovation opportunities
-            - Technical risk assessment
-            - Implementation and integration planning
-            
-            Context from previous agents: {context}
-            
-            User Query: {query}
-            
-            Provide a detailed technical analysis and recommendations. Use clear technical reasoning and include specific actionable technical steps.""",
-            
-            'Therapist': """You are a Therapist AI agent with expertise in mental health, emotional support, and psychological guidance.
-            
-            Your role is to provide comprehensive therapeutic perspective on the user's query. Focus on:
-            - Emotional and psychological well-being
-            - Mental health considerations
-            - Coping strategies and resilience
-            - Relationship dynamics and communication
-            - Stress management and self-care
-            - Personal healing and growth
-            
-            Context from previous agents: {context}
-            
-            User Query: {query}
-            
-            Provide a detailed therapeutic analysis and guidance. Use clear therapeutic reasoning and include specific actionable mental health strategies.""",
-            
-            'Financial_Advisor': """You are a Financial Advisor AI agent with expertise in personal finance, investment planning, and wealth management.
-            
-            Your role is to provide comprehensive financial advisory perspective on the user's query. Focus on:
-            - Personal financial planning
-            - Investment strategies and portfolio management
-            - Retirement and savings planning
-            - Insurance and protection strategies
-            - Tax optimization and planning
-            - Wealth building and preservation
-            
-            Context from previous agents: {context}
-            
-            User Query: {query}
-            
-            Provide a detailed financial advisory analysis and recommendations. Use clear financial planning reasoning and include specific actionable financial steps.""",
-            
-            'Gaming_Expert': """You are a Gaming Expert AI agent with expertise in competitive gaming, deck building, and strategic analysis.
-            
-            Your role is to provide comprehensive gaming perspective on the user's query. Focus on:
-            - Competitive gaming strategies and meta analysis
-            - Deck building and card game optimization
-            - Tournament preparation and competitive play
-            - Game balance and strategic considerations
-            - Player psychology and mindset
-            - Gaming trends and community insights
-            
-            Context from previous agents: {context}
-            
-            User Query: {query}
-            
-            Provide a detailed gaming analysis and strategic recommendations. Use clear gaming logic and include specific actionable gaming strategies."""
-        }
+        self.registry = agent_registry
+        
+        # Compile every registered agent prompt once up front
+        for agent_type, profile in self.registry.profiles.items():
+            if profile.prompt_template:
+                prompt_cache.get(agent_type, profile.prompt_template)
     
+    def _get_compiled_prompt(self, agent_type: str) -> CompiledPrompt:
+        """Get the compiled prompt for an agent, using the generic prompt for unknown agents"""
+        profile = self.registry.get(agent_type)
+        if profile.prompt_template:
+            return prompt_cache.get(agent_type, profile.prompt_template)
+        return prompt_cache.get(
+            f"fallback:{agent_type}", FALLBACK_AGENT_PROMPT.format(agent_type=agent_type)
+        )
+    
+    @tracer.traced("agent_chain.process")
     def process_chain(self, query: str, agent_chain: List[str], 
                      user_context: str = "") -> ChainResult:
         """Process a complete agent chain and return comprehensive results"""
         start_time = datetime.now()
         responses = []
+        failed_agents = []
         accumulated_context = user_context
         total_tokens = 0
         total_cost = 0.0
@@ -233,37 +96,41 @@ class AgentChainOrchestrator:
                 if agent_type == 'SYNTHESIZER':
                     continue  # Skip synthesizer in main chain, handle separately
                 
-                # Get optimal provider for this agent type
-                capabilities = query_analyzer.get_agent_capabilities(agent_type)
-                optimal_provider = capabilities.get('optimal_provider', 'grok')
+                with tracer.span(f"agent {agent_type}", **{"agent.type": agent_type, "agent.position": i}), \
+                        prometheus_metrics.labels(agent=agent_type):
+                    # Route this agent, using its configured provider as the prior
+                    profile = self.registry.get(agent_type)
+                    optimal_provider = self._select_provider(profile)
                 
-                # Apply context management with token limiting
-                managed_context = self._manage_context(
-                    accumulated_context, agent_type, query, optimal_provider
-                )
+                    # Apply context management with token limiting
+                    managed_context = self._manage_context(
+                        accumulated_context, agent_type, query, optimal_provider
+                    )
                 
-                # Generate response from current agent
-                agent_response = self._generate_agent_response(
-                    agent_type, query, managed_context
-                )
+                    # Generate response from current agent
+                    agent_response = self._generate_agent_response(
+                        agent_type, query, managed_context, profile, optimal_provider
+                    )
                 
-                if agent_response:
-                    responses.append(agent_response)
-                    total_tokens += agent_response.tokens_used
-                    total_cost += agent_response.cost
+                    if agent_response:
+                        responses.append(agent_response)
+                        total_tokens += agent_response.tokens_used
+                        total_cost += agent_response.cost
                     
-                    # Update context for next agent with sliding window
-                    new_context = f"\n\n{agent_response.agent_type} Perspective:\n{agent_response.content}"
-                    accumulated_context += new_context
+                        # Update context for next agent with sliding window
+                        new_context = f"\n\n{agent_response.agent_type} Perspective:\n{agent_response.content}"
+                        accumulated_context += new_context
                     
-                    # Apply sliding window to keep context manageable
-                    accumulated_context = token_limiter.truncate_context_sliding_window(
-                        accumulated_context, optimal_provider, max_context_tokens=8000
-                    )
+                        # Apply sliding window to keep context manageable
+                        with tracer.span("agent.sliding_window"):
+                            accumulated_context = token_limiter.truncate_context_sliding_window(
+                                accumulated_context, optimal_provider, max_context_tokens=8000
+                            )
                     
-                    logging.info(f"Agent {agent_type} completed. Tokens: {agent_response.tokens_used}, Cost: ${agent_response.cost:.4f}")
-                else:
-                    logging.warning(f"Agent {agent_type} failed to generate response")
+                        logging.info(f"Agent {agent_type} completed. Tokens: {agent_response.tokens_used}, Cost: ${agent_response.cost:.4f}")
+                    else:
+                        failed_agents.append(agent_type)
+                        logging.warning(f"Agent {agent_type} failed to generate response")
             
             # Generate synthesis if multiple agents
             synthesis = ""
@@ -288,7 +155,8 @@ class AgentChainOrchestrator:
                 total_cost=total_cost,
                 processing_time=processing_time,
                 confidence_score=confidence_score,
-                perspectives_covered=perspectives_covered
+                perspectives_covered=perspectives_covered,
+                failed_agents=failed_agents
             )
             
         except Exception as e:
@@ -303,22 +171,16 @@ class AgentChainOrchestrator:
                 perspectives_covered=[]
             )
     
+    @tracer.traced("agent.manage_context")
     def _manage_context(self, accumulated_context: str, agent_type: str, 
                        query: str, provider: str) -> str:
         """Manage context size with intelligent truncation"""
         try:
-            # Get agent system prompt
-            system_prompt = self.agent_prompts.get(agent_type, "")
-            
-            # Truncate using token limiter
-            truncated_system, truncated_context, truncated_query, was_truncated = \
-                token_limiter.truncate_prompt(
-                    system_prompt=system_prompt,
-                    user_context=accumulated_context,
-                    query=query,
-                    provider=provider
-                )
+            # Only the dynamic parts are measured; static prompt tokens are precomputed
+            truncated_context, truncated_query, was_truncated = \
+                self._get_compiled_prompt(agent_type).fit(accumulated_context, query, provider)
             
+            tracer.set_attributes(**{"context.truncated": was_truncated, "context.chars": len(truncated_context)})
             if was_truncated:
                 logging.warning(f"Context truncated for {agent_type} ({provider})")
             
@@ -331,50 +193,39 @@ class AgentChainOrchestrator:
                 accumulated_context, provider, max_context_tokens=4000
             )
     
-    def _generate_agent_response(self, agent_type: str, query: str, 
-                               context: str) -> Optional[AgentResponse]:
+    @tracer.traced("agent.select_provider")
+    def _select_provider(self, profile: AgentProfile) -> str:
+        """Pick a provider for an agent based on live provider health"""
+        try:
+            return ai_manager.get_best_provider("analysis", preferred=profile.optimal_provider)
+        except Exception:
+            return profile.optimal_provider
+    
+    def _generate_agent_response(self, agent_type: str, query: str, context: str,
+                               profile: AgentProfile = None, provider: str = None) -> Optional[AgentResponse]:
         """Generate response from a specific agent"""
         try:
-            # Get agent capabilities and optimal provider
-            capabilities = query_analyzer.get_agent_capabilities(agent_type)
-            optimal_provider = capabilities.get('optimal_provider', 'grok')
-            
-            # Construct agent prompt with token limiting
-            if agent_type in self.agent_prompts:
-                system_prompt = self.agent_prompts[agent_type]
-                
-                # Apply intelligent truncation
-                truncated_system, truncated_context, truncated_query, was_truncated = \
-                    token_limiter.truncate_prompt(
-                        system_prompt=system_prompt,
-                        user_context=context,
-                        query=query,
-                        provider=optimal_provider
-                    )
-                
-                if was_truncated:
-                    logging.warning(f"Prompt truncated for {agent_type}")
-                
-                # Format the final prompt
-                prompt = truncated_system.format(
-                    context=truncated_context, query=truncated_query
+            # Get agent profile and routed provider
+            profile = profile or self.registry.get(agent_type)
+            optimal_provider = provider or self._select_provider(profile)
+            
+            # Render the precompiled agent prompt with token limiting
+            with tracer.span("agent.render_prompt") as span:
+                rendered = self._get_compiled_prompt(agent_type).render(
+                    optimal_provider, context=context, query=query
                 )
-            else:
-                # Fallback prompt for unknown agents
-                prompt = f"""You are a {agent_type} AI agent providing expert analysis.
-                
-                Context from previous agents: {context}
-                
-                User Query: {query}
-                
-                Provide your expert perspective and actionable recommendations."""
+                span.set_attribute("prompt.truncated", rendered.was_truncated)
+            
+            if rendered.was_truncated:
+                logging.warning(f"Prompt truncated for {agent_type}")
             
-            # Generate AI response
+            # Generate AI response, sending the static prefix as a cacheable segment
             ai_response = ai_manager.generate_response(
-                prompt=prompt,
+                prompt=rendered.dynamic,
+                system=rendered.static_prefix,
                 provider=optimal_provider,
                 task_type="analysis",
-                max_tokens=1500
+                max_tokens=profile.max_tokens
             )
             
             if ai_response.get('success'):
@@ -386,7 +237,7 @@ class AgentChainOrchestrator:
                     tokens_used=ai_response.get('tokens_used', 0),
                     cost=ai_response.get('cost', 0.0),
                     confidence_score=self._calculate_response_confidence(ai_response),
-                    perspective=capabilities.get('strength', 'General analysis'),
+                    perspective=profile.strength,
                     timestamp=datetime.now(),
                     context_used=context[:200] + "..." if len(context) > 200 else context
                 )
@@ -398,6 +249,8 @@ class AgentChainOrchestrator:
             logging.error(f"Agent response generation failed for {agent_type}: {str(e)}")
             return None
     
+    @tracer.traced("agent_chain.synthesis")
+    @prometheus_metrics.labels(agent="chain_synthesis")
     def _generate_synthesis(self, query: str, responses: List[AgentResponse]) -> str:
         """Generate synthesis combining all agent perspectives"""
         try:
@@ -410,27 +263,18 @@ class AgentChainOrchestrator:
                 
                 """
             
-            synthesis_prompt = f"""You are a Master Synthesizer AI agent responsible for combining multiple expert perspectives into one comprehensive, actionable response.
-            
-            Original User Query: {query}
+            synthesis_prompt = f"""Original User Query: {query}
             
             Expert Perspectives Provided:
-            {perspectives_summary}
-            
-            Your task is to:
-            1. Synthesize all perspectives into a cohesive, comprehensive answer
-            2. Identify key themes and overlapping insights
-            3. Highlight any conflicting viewpoints and provide balanced resolution
-            4. Create a clear, actionable plan that incorporates all relevant perspectives
-            5. Prioritize recommendations based on importance and feasibility
-            
-            Provide a well-structured synthesis that gives the user a complete, actionable response to their query. Use clear headings and bullet points for organization."""
+            {perspectives_summary}"""
             
-            # Generate synthesis using anthropic for analytical reasoning
+            # Generate synthesis, preferring anthropic for analytical reasoning
             synthesis_response = ai_manager.generate_response(
                 prompt=synthesis_prompt,
-                provider="anthropic",
+                system=MASTER_SYNTHESIS_INSTRUCTIONS,
+                preferred_provider="anthropic",
                 task_type="analysis",
+                hedge=True,
                 max_tokens=2000
             )
             
@@ -496,14 +340,14 @@ class AgentChainOrchestrator:
     
     def get_agent_status(self, agent_type: str) -> Dict[str, Any]:
         """Get status and capabilities of a specific agent type"""
-        capabilities = query_analyzer.get_agent_capabilities(agent_type)
+        profile = self.registry.get(agent_type)
         
         return {
             'agent_type': agent_type,
-            'available': agent_type in self.agent_prompts,
-            'capabilities': capabilities,
-            'optimal_provider': capabilities.get('optimal_provider', 'anthropic'),
-            'specializations': capabilities.get('specializations', [])
+            'available': self.registry.has_prompt(agent_type),
+            'capabilities': self.registry.get_capabilities(agent_type),
+            'optimal_provider': profile.optimal_provider,
+            'specializations': list(profile.specializations)
         }
     
     def validate_agent_chain(self, agent_chain: List[str]) -> Dict[str, Any]:
@@ -518,7 +362,7 @@ class AgentChainOrchestrator:
         
         # Check for unknown agents
         for agent in agent_chain:
-            if agent not in self.agent_prompts and agent != 'SYNTHESIZER':
+            if not self.registry.has_prompt(agent) and agent != 'SYNTHESIZER':
                 validation_result['valid'] = False
                 validation_result['issues'].append(f"Unknown agent type: {agent}")
         
@@ -527,7 +371,9 @@ class AgentChainOrchestrator:
             validation_result['recommendations'].append("Consider reducing chain length for better performance")
         
         # Estimate costs and time
-        validation_result['estimated_cost'] = len(agent_chain) * 0.02  # Rough estimate
+        validation_result['estimated_cost'] = sum(
+            self.registry.get(agent).estimated_cost for agent in agent_chain
+        )
         validation_result['estimated_time'] = len(agent_chain) * 5.0   # Rough estimate in seconds
         
         return validation_result
@@ -0,0 +1,439 @@
+"""
+Agent Registry - OperatorOS
+Single immutable source of truth for agent prompts, providers and capabilities
+"""
+
+import os
+import json
+import logging
+from types import MappingProxyType
+from typing import Dict, Any, List, Optional, Mapping
+from dataclasses import dataclass, replace
+
+# Rough per-call cost estimates (USD) for each cost profile
+COST_PROFILE_ESTIMATES = {
+    'low': 0.01,
+    'standard': 0.02,
+    'high': 0.04
+}
+
+@dataclass(frozen=True, slots=True)
+class AgentProfile:
+    """Immutable definition of an agent type"""
+    agent_type: str
+    optimal_provider: str
+    specializations: tuple
+    strength: str
+    prompt_template: Optional[str] = None
+    keywords: tuple = ()
+    perspectives: tuple = ()
+    synthesis_group: Optional[str] = None
+    synthesis_component: Optional[str] = None
+    cost_profile: str = 'standard'
+    max_tokens: int = 1500
+
+    @property
+    def estimated_cost(self) -> float:
+        """Rough per-call cost estimate for this agent"""
+        return COST_PROFILE_ESTIMATES.get(self.cost_profile, COST_PROFILE_ESTIMATES['standard'])
+
+DEFAULT_AGENT_PROFILE = AgentProfile(
+    agent_type='default',
+    optimal_provider='anthropic',
+    specializations=('general guidance',),
+    strength='General problem-solving and analysis'
+)
+
+BUILTIN_AGENTS = (
+    AgentProfile(
+        agent_type='CFO',
+        optimal_provider='grok',
+        specializations=('financial analysis', 'budgeting', 'investment planning', 'cost optimization'),
+        strength='Financial expertise and quantitative analysis',
+        keywords=('financial', 'business', 'investment', 'budget'),
+        perspectives=('financial',),
+        synthesis_group='business',
+        synthesis_component='financial_analysis',
+        prompt_template="""You are a CFO (Chief Financial Officer) AI agent with expertise in financial analysis, budgeting, and strategic financial planning.
+
+            Your role is to provide comprehensive financial perspective on the user's query. Focus on:
+            - Financial implications and costs
+            - Budget analysis and recommendations
+            - Investment considerations
+            - Risk assessment from financial perspective
+            - Revenue and profitability analysis
+            - Cash flow considerations
+
+            Context from previous agents: {context}
+
+            User Query: {query}
+
+            Provide a detailed financial analysis and recommendations. Use clear financial reasoning and include specific actionable insights."""
+    ),
+    AgentProfile(
+        agent_type='CSA',
+        optimal_provider='openai',
+        specializations=('strategic planning', 'market analysis', 'competitive intelligence', 'business development'),
+        strength='Strategic thinking and analytical reasoning',
+        keywords=('strategy', 'business', 'market', 'competition'),
+        perspectives=('business', 'strategic'),
+        synthesis_group='business',
+        synthesis_component='strategic_analysis',
+        prompt_template="""You are a CSA (Chief Strategy Advisor) AI agent with expertise in strategic planning, market analysis, and business development.
+
+            Your role is to provide comprehensive strategic perspective on the user's query. Focus on:
+            - Strategic implications and opportunities
+            - Market analysis and competitive landscape
+            - Long-term planning and vision
+            - Growth strategies and scaling
+            - Competitive advantages and positioning
+            - Strategic risk assessment
+
+            Context from previous agents: {context}
+
+            User Query: {query}
+
+            Provide a detailed strategic analysis and recommendations. Use clear strategic reasoning and include specific actionable insights."""
+    ),
+    AgentProfile(
+        agent_type='COO',
+        optimal_provider='openai',
+        specializations=('operations management', 'process optimization', 'project management', 'execution planning'),
+        strength='Operational excellence and systematic thinking',
+        keywords=('operations', 'business', 'process', 'management'),
+        perspectives=('operational',),
+        synthesis_group='business',
+        synthesis_component='operational_analysis',
+        prompt_template="""You are a COO (Chief Operating Officer) AI agent with expertise in operations management, process optimization, and execution planning.
+
+            Your role is to provide comprehensive operational perspective on the user's query. Focus on:
+            - Implementation roadmaps and timelines
+            - Process optimization and efficiency
+            - Resource allocation and management
+            - Operational risk mitigation
+            - Performance metrics and KPIs
+            - Execution strategies and tactics
+
+            Context from previous agents: {context}
+
+            User Query: {query}
+
+            Provide a detailed operational analysis and implementation plan. Use clear operational reasoning and include specific actionable steps."""
+    ),
+    AgentProfile(
+        agent_type='CRO',
+        optimal_provider='grok',
+        specializations=('risk assessment', 'compliance', 'security analysis', 'threat mitigation'),
+        strength='Risk analysis and protective strategies',
+        keywords=('risk', 'business', 'financial', 'legal'),
+        perspectives=('risk',),
+        synthesis_group='business',
+        synthesis_component='risk_analysis',
+        prompt_template="""You are a CRO (Chief Risk Officer) AI agent with expertise in risk assessment, compliance, and protective strategies.
+
+            Your role is to provide comprehensive risk perspective on the user's query. Focus on:
+            - Risk identification and assessment
+            - Compliance requirements and regulations
+            - Threat analysis and mitigation strategies
+            - Safety and security considerations
+            - Contingency planning
+            - Risk monitoring and management
+
+            Context from previous agents: {context}
+
+            User Query: {query}
+
+            Provide a detailed risk analysis and mitigation recommendations. Use clear risk reasoning and include specific protective measures."""
+    ),
+    AgentProfile(
+        agent_type='Legal_Expert',
+        optimal_provider='openai',
+        specializations=('legal analysis', 'contract review', 'rights assessment', 'compliance guidance'),
+        strength='Legal knowledge and analytical precision',
+        keywords=('legal', 'law', 'contract', 'rights'),
+        perspectives=('legal',),
+        synthesis_group='legal',
+        synthesis_component='legal_analysis',
+        prompt_template="""You are a Legal Expert AI agent with expertise in legal analysis, contract review, and rights assessment.
+
+            Your role is to provide comprehensive legal perspective on the user's query. Focus on:
+            - Legal implications and requirements
+            - Rights and obligations analysis
+            - Contract and agreement considerations
+            - Regulatory compliance
+            - Legal risk assessment
+            - Protective legal strategies
+
+            Context from previous agents: {context}
+
+            User Query: {query}
+
+            Provide a detailed legal analysis and recommendations. Use clear legal reasoning and include specific actionable guidance."""
+    ),
+    AgentProfile(
+        agent_type='Life_Coach',
+        optimal_provider='openai',
+        specializations=('personal development', 'goal setting', 'motivation', 'life planning'),
+        strength='Personal guidance and motivational support',
+        keywords=('personal', 'life', 'goals', 'lifestyle'),
+        perspectives=('personal',),
+        synthesis_group='personal',
+        synthesis_component='personal_analysis',
+        prompt_template="""You are a Life Coach AI agent with expertise in personal development, goal setting, and motivational guidance.
+
+            Your role is to provide comprehensive personal perspective on the user's query. Focus on:
+            - Personal development and growth
+            - Goal setting and achievement strategies
+            - Motivation and mindset optimization
+            - Life balance and well-being
+            - Personal readiness assessment
+            - Emotional and psychological considerations
+
+            Context from previous agents: {context}
+
+            User Query: {query}
+
+            Provide a detailed personal development analysis and guidance. Use clear motivational reasoning and include specific actionable steps for personal growth."""
+    ),
+    AgentProfile(
+        agent_type='Career_Coach',
+        optimal_provider='openai',
+        specializations=('career development', 'job search', 'professional growth', 'networking'),
+        strength='Career guidance and professional development',
+        keywords=('career', 'job', 'work', 'employment'),
+        perspectives=('career',),
+        synthesis_group='personal',
+        synthesis_component='career_analysis',
+        prompt_template="""You are a Career Coach AI agent with expertise in professional development, job search, and career advancement.
+
+            Your role is to provide comprehensive career perspective on the user's query. Focus on:
+            - Career development strategies
+            - Professional growth opportunities
+            - Job market analysis and positioning
+            - Skill development recommendations
+            - Networking and relationship building
+            - Career transition planning
+
+            Context from previous agents: {context}
+
+            User Query: {query}
+
+            Provide a detailed career analysis and development plan. Use clear career reasoning and include specific actionable career steps."""
+    ),
+    AgentProfile(
+        agent_type='Tech_Expert',
+        optimal_provider='openai',
+        specializations=('technology analysis', 'system design', 'digital transformation', 'innovation'),
+        strength='Technical expertise and systematic analysis',
+        keywords=('technology', 'software', 'digital', 'system'),
+        perspectives=('technical',),
+        prompt_template="""You are a Technology Expert AI agent with expertise in technology analysis, system design, and digital transformation.
+
+            Your role is to provide comprehensive technical perspective on the user's query. Focus on:
+            - Technology solutions and recommendations
+            - System design and architecture
+            - Digital transformation strategies
+            - Innovation opportunities
+            - Technical risk assessment
+            - Implementation and integration planning
+
+            Context from previous agents: {context}
+
+            User Query: {query}
+
+            Provide a detailed technical analysis and recommendations. Use clear technical reasoning and include specific actionable technical steps."""
+    ),
+    AgentProfile(
+        agent_type='Therapist',
+        optimal_provider='anthropic',
+        specializations=('emotional support', 'mental health guidance', 'coping strategies', 'relationship dynamics'),
+        strength='Emotional insight and psychological support',
+        keywords=('mental', 'personal', 'relationship', 'health'),
+        perspectives=('health',),
+        prompt_template="""You are a Therapist AI agent with expertise in mental health, emotional support, and psychological guidance.
+
+            Your role is to provide comprehensive therapeutic perspective on the user's query. Focus on:
+            - Emotional and psychological well-being
+            - Mental health considerations
+            - Coping strategies and resilience
+            - Relationship dynamics and communication
+            - Stress management and self-care
+            - Personal healing and growth
+
+            Context from previous agents: {context}
+
+            User Query: {query}
+
+            Provide a detailed therapeutic analysis and guidance. Use clear therapeutic reasoning and include specific actionable mental health strategies."""
+    ),
+    AgentProfile(
+        agent_type='Financial_Advisor',
+        optimal_provider='anthropic',
+        specializations=('personal financial planning', 'investment strategy', 'retirement planning', 'wealth management'),
+        strength='Personal finance and wealth planning',
+        keywords=('financial', 'investment', 'budget', 'money'),
+        prompt_template="""You are a Financial Advisor AI agent with expertise in personal finance, investment planning, and wealth management.
+
+            Your role is to provide comprehensive financial advisory perspective on the user's query. Focus on:
+            - Personal financial planning
+            - Investment strategies and portfolio management
+            - Retirement and savings planning
+            - Insurance and protection strategies
+            - Tax optimization and planning
+            - Wealth building and preservation
+
+            Context from previous agents: {context}
+
+            User Query: {query}
+
+            Provide a detailed financial advisory analysis and recommendations. Use clear financial planning reasoning and include specific actionable financial steps."""
+    ),
+    AgentProfile(
+        agent_type='Gaming_Expert',
+        optimal_provider='openai',
+        specializations=('gaming strategy', 'competitive analysis', 'deck building', 'meta analysis'),
+        strength='Gaming expertise and strategic analysis',
+        keywords=('gaming', 'game', 'deck', 'card', 'strategy'),
+        perspectives=('gaming',),
+        prompt_template="""You are a Gaming Expert AI agent with expertise in competitive gaming, deck building, and strategic analysis.
+
+            Your role is to provide comprehensive gaming perspective on the user's query. Focus on:
+            - Competitive gaming strategies and meta analysis
+            - Deck building and card game optimization
+            - Tournament preparation and competitive play
+            - Game balance and strategic considerations
+            - Player psychology and mindset
+            - Gaming trends and community insights
+
+            Context from previous agents: {context}
+
+            User Query: {query}
+
+            Provide a detailed gaming analysis and strategic recommendations. Use clear gaming logic and include specific actionable gaming strategies."""
+    ),
+    AgentProfile(
+        agent_type='Business_Coach',
+        optimal_provider='anthropic',
+        specializations=('business coaching', 'startup guidance', 'growth planning'),
+        strength='Business growth coaching',
+        keywords=('business', 'startup', 'strategy', 'growth')
+    ),
+    AgentProfile(
+        agent_type='Child_Psychologist',
+        optimal_provider='anthropic',
+        specializations=('child development', 'parenting guidance', 'family dynamics'),
+        strength='Child development and family guidance',
+        keywords=('family', 'children', 'parenting', 'education')
+    )
+)
+
+class AgentRegistry:
+    """Read-only registry of agent profiles, built once at import"""
+
+    def __init__(self, profiles: List[AgentProfile]):
+        self._profiles = MappingProxyType({p.agent_type: p for p in profiles})
+
+        # Precompute derived views so lookups never rebuild structures
+        self._capabilities = MappingProxyType({
+            p.agent_type: self._build_capabilities(p) for p in profiles
+        })
+        self._default_capabilities = self._build_capabilities(DEFAULT_AGENT_PROFILE)
+
+        perspective_map = {}
+        for profile in profiles:
+            for perspective in profile.perspectives:
+                perspective_map.setdefault(perspective, profile.agent_type)
+        self._perspective_map = MappingProxyType(perspective_map)
+
+    @staticmethod
+    def _build_capabilities(profile: AgentProfile) -> Dict[str, Any]:
+        """Build the public capabilities view for a profile"""
+        return {
+            'specializations': list(profile.specializations),
+            'optimal_provider': profile.optimal_provider,
+            'strength': profile.strength,
+            'cost_profile': profile.cost_profile
+        }
+
+    def __contains__(self, agent_type: str) -> bool:
+        return agent_type in self._profiles
+
+    def get(self, agent_type: str) -> AgentProfile:
+        """Get the profile for an agent type, falling back to the default profile"""
+        return self._profiles.get(agent_type, DEFAULT_AGENT_PROFILE)
+
+    def get_capabilities(self, agent_type: str) -> Dict[str, Any]:
+        """Get the precomputed capabilities view for an agent type (treat as read-only)"""
+        return self._capabilities.get(agent_type, self._default_capabilities)
+
+    def has_prompt(self, agent_type: str) -> bool:
+        """Check whether an agent type has a dedicated prompt template"""
+        profile = self._profiles.get(agent_type)
+        return bool(profile and profile.prompt_template)
+
+    def agent_for_perspective(self, perspective: str) -> Optional[str]:
+        """Get the agent type that covers an analysis perspective"""
+        return self._perspective_map.get(perspective)
+
+    @property
+    def profiles(self) -> Mapping[str, AgentProfile]:
+        return self._profiles
+
+    @property
+    def agent_types(self) -> List[str]:
+        return list(self._profiles.keys())
+
+def _load_config_overrides(path: str) -> List[Dict[str, Any]]:
+    """Load agent definitions from a JSON config file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    agents = config.get('agents', config) if isinstance(config, dict) else config
+    if isinstance(agents, dict):
+        agents = [dict(definition, agent_type=name) for name, definition in agents.items()]
+    return agents
+
+def _profile_from_config(definition: Dict[str, Any], base: Optional[AgentProfile]) -> AgentProfile:
+    """Create or update a profile from a config definition"""
+    fields = dict(definition)
+    for key in ('specializations', 'keywords', 'perspectives'):
+        if key in fields:
+            fields[key] = tuple(fields[key])
+
+    template = fields.get('prompt_template')
+    if template and ('{context}' not in template or '{query}' not in template):
+        raise ValueError(f"Prompt template for {fields['agent_type']} must contain {{context}} and {{query}}")
+
+    if base is not None:
+        return replace(base, **fields)
+
+    fields.setdefault('optimal_provider', DEFAULT_AGENT_PROFILE.optimal_provider)
+    fields.setdefault('specializations', DEFAULT_AGENT_PROFILE.specializations)
+    fields.setdefault('strength', DEFAULT_AGENT_PROFILE.strength)
+    return AgentProfile(**fields)
+
+def load_agent_registry(config_path: str = None) -> AgentRegistry:
+    """
+    Build the agent registry from built-in definitions plus an optional JSON config.
+    Config entries override built-in agents field by field or add new agents.
+    """
+    profiles = {p.agent_type: p for p in BUILTIN_AGENTS}
+
+    config_path = config_path or os.environ.get(
+        'AGENT_REGISTRY_PATH',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'agent_registry.json')
+    )
+
+    if os.path.exists(config_path):
+        try:
+            for definition in _load_config_overrides(config_path):
+                agent_type = definition['agent_type']
+                profiles[agent_type] = _profile_from_config(definition, profiles.get(agent_type))
+            logging.info(f"Agent registry loaded overrides from {config_path}")
+        except Exception as e:
+            logging.error(f"Failed to load agent registry config {config_path}: {str(e)}")
+
+    return AgentRegistry(list(profiles.values()))
+
+# Global agent registry
+agent_registry = load_agent_registry()
@@ -1,14 +1,39 @@
 import os
 import json
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, wait, FIRST_COMPLETED
 from datetime import datetime
 from typing import Dict, Any, Optional, List
 
-# AI Provider imports
-from openai import OpenAI
-import anthropic
-from anthropic import Anthropic
+# Provider SDKs are imported when a provider client is first used, not at import time
+from provider_clients import provider_clients
+from tracing import tracer
+from prometheus_metrics import prometheus_metrics
 from token_limiter import token_limiter
+from provider_router import ProviderRouter
+from provider_resilience import ProviderResilience, CircuitOpenError, is_retryable
+from provider_rate_limiter import ProviderRateLimiter, RateLimitExceeded
+from usage_budget import usage_budget, BudgetExceeded
+
+DEFAULT_MODELS = {
+    "openai": "gpt-4o",
+    "anthropic": "claude-sonnet-4-20250514",
+    "grok": "grok-2-1212"
+}
+
+# Used instead of the defaults when the user's budget is nearly spent
+ECONOMY_MODELS = {
+    "openai": "gpt-3.5-turbo",
+    "anthropic": "claude-3-5-sonnet-20241022",
+    "grok": "grok-beta"
+}
+
+# Providers only cache prompt prefixes of at least this many tokens (Anthropic Sonnet and
+# OpenAI both use 1024). The current agent, synthesis and expert system segments are about
+# 150-300 tokens, so they are sent without a cache marker and caching stays a no-op until a
+# prefix grows past this size.
+PROMPT_CACHE_MIN_TOKENS = int(os.environ.get('AI_PROMPT_CACHE_MIN_TOKENS', '1024'))
 
 # <important_code_snippet_instructions>
 # The newest OpenAI model is "gpt-4o", not "gpt-4". 
@@ -21,159 +46,473 @@ from token_limiter import token_limiter
 class AIProviderManager:
     def __init__(self):
         self.providers = {}
+        self.router = ProviderRouter()
+        self.resilience = ProviderResilience()
+        self.rate_limiter = ProviderRateLimiter()
+        
+        # Hedged requests for latency-critical calls
+        self.hedging_enabled = os.environ.get('AI_HEDGING_ENABLED', 'true').lower() == 'true'
+        self.hedge_min_delay = float(os.environ.get('AI_HEDGE_MIN_DELAY', '2'))
+        self.hedge_max_delay = float(os.environ.get('AI_HEDGE_MAX_DELAY', '30'))
+        self.hedge_stats = {"launched": 0, "primary_wins": 0, "secondary_wins": 0,
+                            "abandoned": 0, "abandoned_cost": 0.0, "skipped_cold": 0, "skipped_busy": 0}
+        self._hedge_lock = threading.Lock()
+        hedge_threads = int(os.environ.get('AI_HEDGE_THREADS', '16'))
+        self._hedge_executor = ThreadPoolExecutor(max_workers=hedge_threads, thread_name_prefix="ai-hedge")
+        # One slot per executor thread: a call only goes to the pool when a thread is free to start it
+        self._hedge_slots = threading.BoundedSemaphore(hedge_threads)
+        
         self.initialize_providers()
     
     def initialize_providers(self):
-        """Initialize all available AI providers"""
-        # OpenAI
-        openai_key = os.environ.get('OPENAI_API_KEY')
-        if openai_key:
-            self.providers['openai'] = OpenAI(api_key=openai_key)
-            logging.info("OpenAI provider initialized")
-        
-        # Anthropic
-        anthropic_key = os.environ.get('ANTHROPIC_API_KEY')
-        if anthropic_key:
-            self.providers['anthropic'] = Anthropic(api_key=anthropic_key)
-            logging.info("Anthropic provider initialized")
-        
-        # Grok (xAI)
-        xai_key = os.environ.get('XAI_API_KEY')
-        if xai_key:
-            self.providers['grok'] = OpenAI(base_url="https://api.x.ai/v1", api_key=xai_key)
-            logging.info("Grok provider initialized")
-    
-    def get_best_provider(self, task_type: str = "general") -> str:
-        """Intelligent routing based on task type"""
-        task_routing = {
-            "analysis": "anthropic",
-            "creative": "openai", 
-            "reasoning": "grok",
-            "coding": "anthropic",
-            "financial": "grok",
-            "planning": "anthropic",
-            "general": "anthropic"
-        }
-        
-        preferred = task_routing.get(task_type, "anthropic")
-        
-        # Fallback logic
-        if preferred in self.providers:
-            return preferred
-        elif "anthropic" in self.providers:
-            return "anthropic"
-        elif "openai" in self.providers:
-            return "openai"
-        elif "grok" in self.providers:
-            return "grok"
-        else:
+        """Attach the process-wide provider clients shared by every subsystem"""
+        # Clients and their HTTP pools live in provider_clients and are built on first use;
+        # SDK retries are disabled there, retries and circuit breaking live in self.resilience
+        self.providers = provider_clients
+        logging.info(f"AI providers configured: {', '.join(self.providers) or 'none'}")
+    
+    def get_best_provider(self, task_type: str = "general", preferred: str = None,
+                          objective: str = None, exclude: List[str] = ()) -> str:
+        """
+        Adaptive routing based on task type and live provider health
+        The static task routing table (or `preferred`) is the prior; rolling latency,
+        error rate and cost observations adjust it under the configured objective.
+        Providers whose circuit breaker is open are skipped unless nothing else is left.
+        Users close to their usage budget are routed by cost.
+        """
+        if objective is None and usage_budget.should_economize():
+            objective = "cost"
+        open_circuits = [p for p in self.providers if not self.resilience.is_available(p)]
+        provider = self.router.select(
+            task_type, self.providers.keys(), preferred=preferred,
+            objective=objective, exclude=list(exclude) + open_circuits
+        )
+        if not provider and open_circuits:
+            provider = self.router.select(
+                task_type, self.providers.keys(), preferred=preferred,
+                objective=objective, exclude=exclude
+            )
+        if not provider:
             raise Exception("No AI providers available")
+        return provider
     
     def generate_response(self, prompt: str, provider: str = None, task_type: str = "general", 
-                         model: str = None, max_tokens: int = 1000) -> Dict[str, Any]:
-        """Generate AI response with intelligent routing and token limiting"""
+                         model: str = None, max_tokens: int = 1000, system: str = None,
+                         preferred_provider: str = None, hedge: bool = False) -> Dict[str, Any]:
+        """
+        Generate AI response with intelligent routing and token limiting
+        
+        `system` is an optional static instruction segment sent ahead of the prompt
+        and eligible for provider-side prompt caching (Anthropic cache_control,
+        OpenAI/Grok automatic prefix caching) once it reaches PROMPT_CACHE_MIN_TOKENS. When `provider` is not given, the
+        router picks one, treating `preferred_provider` as the prior. With `hedge`,
+        a slow primary call is raced against a second provider. Transient failures
+        (timeouts, 429/5xx, open circuit, local rate limit) fall back to the next
+        healthy provider.
+        """
+        with tracer.span("ai.generate", task_type=task_type, hedge=hedge) as span, \
+                prometheus_metrics.labels(task_type=task_type):
+            result = self._generate_response(prompt, provider, task_type, model, max_tokens, system,
+                                             preferred_provider, hedge)
+            span.set_attributes({
+                "ai.provider": result.get("provider"),
+                "ai.model": result.get("model"),
+                "ai.success": result.get("success"),
+                "ai.fallback_from": result.get("fallback_from"),
+                "ai.tokens": result.get("tokens_used"),
+                "ai.cost": result.get("cost")
+            })
+            return result
+    
+    def _generate_response(self, prompt: str, provider: str, task_type: str, model: str,
+                           max_tokens: int, system: str, preferred_provider: str,
+                           hedge: bool) -> Dict[str, Any]:
         try:
             if not provider:
-                provider = self.get_best_provider(task_type)
-            
+                provider = self.get_best_provider(task_type, preferred=preferred_provider)
+        except Exception as e:
+            logging.error(f"AI generation failed: {str(e)}")
+            return {"provider": provider, "error": str(e), "success": False}
+        
+        if hedge and self.hedging_enabled:
+            return self._generate_hedged_response(prompt, provider, task_type, model, max_tokens, system)
+        
+        result = self._generate_with_provider(prompt, provider, model, max_tokens, system)
+        tried = [provider]
+        while not result.get("success") and result.get("transient") and len(tried) < len(self.providers):
+            try:
+                fallback = self.get_best_provider(task_type, exclude=tried)
+            except Exception:
+                break
+            logging.warning(f"{tried[-1]} unavailable ({result.get('error')}), falling back to {fallback}")
+            # The original model name does not apply to the fallback provider
+            result = self._generate_with_provider(prompt, fallback, None, max_tokens, system)
+            result["fallback_from"] = provider
+            tried.append(fallback)
+        
+        return result
+    
+    def _generate_with_provider(self, prompt: str, provider: str, model: str = None,
+                                max_tokens: int = 1000, system: str = None) -> Dict[str, Any]:
+        """Generate a response from one specific provider and record the outcome"""
+        with tracer.span("ai.provider_call", kind="client", **{"ai.provider": provider}) as span:
+            result = self._call_provider(prompt, provider, model, max_tokens, system)
+            span.set_attributes({
+                "ai.model": result.get("model"),
+                "ai.success": result.get("success"),
+                "ai.provider_latency_ms": round(result["response_time"] * 1000, 2) if "response_time" in result else None,
+                "ai.input_tokens": result.get("input_tokens"),
+                "ai.output_tokens": result.get("output_tokens"),
+                "ai.cached_input_tokens": result.get("cached_input_tokens"),
+                "ai.cost": result.get("cost"),
+                "ai.error": result.get("error")
+            })
+            if not result.get("success"):
+                span.status, span.status_message = "ERROR", result.get("error")
+            prometheus_metrics.record_llm_call(
+                provider, result.get("model") or model or DEFAULT_MODELS.get(provider, "unknown"),
+                result.get("response_time"), bool(result.get("success")),
+                input_tokens=result.get("input_tokens", 0),
+                output_tokens=result.get("output_tokens", 0),
+                cached_input_tokens=result.get("cached_input_tokens", 0),
+                cost=result.get("cost", 0.0),
+                error="transient" if result.get("transient") else "permanent"
+            )
+            return result
+    
+    def _call_provider(self, prompt: str, provider: str, model: str = None,
+                       max_tokens: int = 1000, system: str = None) -> Dict[str, Any]:
+        start_time = None
+        reservation = None
+        try:
             if provider not in self.providers:
                 raise Exception(f"Provider {provider} not available")
             
-            # Check and truncate prompt if necessary
-            if not token_limiter.is_within_limits(prompt, provider):
+            # Check and truncate prompt if necessary (the system segment is never truncated)
+            system_tokens = token_limiter.estimate_tokens(system or "", provider)
+            if system_tokens + token_limiter.estimate_tokens(prompt, provider) > token_limiter.get_safe_limit(provider):
                 logging.warning(f"Prompt exceeds limits for {provider}. Truncating...")
                 # For single prompt, treat as user context
-                _, truncated_prompt, _, was_truncated = token_limiter.truncate_prompt(
-                    system_prompt="", user_context=prompt, query="", provider=provider
+                truncated_prompt, _, was_truncated = token_limiter.fit_to_budget(
+                    system_tokens, user_context=prompt, query="", provider=provider
                 )
                 if was_truncated:
                     logging.info(f"Prompt truncated for {provider}")
                 prompt = truncated_prompt
             
-            start_time = datetime.now()
-            
+            model = model or (ECONOMY_MODELS if usage_budget.should_economize() else DEFAULT_MODELS).get(provider)
             if provider == "openai":
-                response = self._generate_openai_response(prompt, model or "gpt-4o", max_tokens)
+                call = lambda: self._generate_openai_response(prompt, model, max_tokens, system)
             elif provider == "anthropic":
-                response = self._generate_anthropic_response(prompt, model or "claude-sonnet-4-20250514", max_tokens)
+                call = lambda: self._generate_anthropic_response(prompt, model, max_tokens, system)
             elif provider == "grok":
-                response = self._generate_grok_response(prompt, model or "grok-2-1212", max_tokens)
+                call = lambda: self._generate_grok_response(prompt, model, max_tokens, system)
             else:
                 raise Exception(f"Unknown provider: {provider}")
             
+            # Hold the worst-case cost against the user's budget; raises when it does not fit
+            input_tokens = system_tokens + token_limiter.estimate_tokens(prompt, provider)
+            reservation = usage_budget.reserve(self.estimate_cost(input_tokens, max_tokens, provider, model))
+            
+            # Reserve RPM/TPM budget shared across workers; queues briefly, else raises to reroute
+            estimated_tokens = input_tokens + max_tokens
+            self.rate_limiter.acquire(provider, model, estimated_tokens)
+            
+            with self.rate_limiter.concurrency_slot(provider):
+                start_time = datetime.now()
+                response = self.resilience.call(provider, call)
+            
             end_time = datetime.now()
             response_time = (end_time - start_time).total_seconds()
             
+            self.router.record(
+                provider, response["model"], response_time, True,
+                cost=response.get("cost", 0), tokens=response.get("tokens_used", 0)
+            )
+            self.rate_limiter.reconcile(provider, model, estimated_tokens, response.get("tokens_used", 0))
+            usage_budget.reconcile(reservation, response.get("cost", 0))
+            
             return {
                 "provider": provider,
                 "model": response["model"],
                 "content": response["content"],
                 "tokens_used": response.get("tokens_used", 0),
+                "input_tokens": response.get("input_tokens", 0),
+                "output_tokens": response.get("output_tokens", 0),
+                "cached_input_tokens": response.get("cached_input_tokens", 0),
+                "cache_write_tokens": response.get("cache_write_tokens", 0),
                 "cost": response.get("cost", 0),
                 "response_time": response_time,
                 "success": True
             }
             
+        except BudgetExceeded as e:
+            logging.info(f"AI generation refused for user {e.user_id}: {str(e)}")
+            return {
+                "provider": provider,
+                "error": str(e),
+                "budget_exceeded": True,
+                "transient": False,
+                "success": False
+            }
+        except (CircuitOpenError, RateLimitExceeded) as e:
+            usage_budget.reconcile(reservation, 0.0)
+            logging.warning(f"AI generation skipped: {str(e)}")
+            return {
+                "provider": provider,
+                "error": str(e),
+                "transient": True,
+                "success": False
+            }
         except Exception as e:
+            usage_budget.reconcile(reservation, 0.0)
             logging.error(f"AI generation failed: {str(e)}")
+            if start_time is not None:
+                self.router.record(
+                    provider, model, (datetime.now() - start_time).total_seconds(), False
+                )
             return {
                 "provider": provider,
                 "error": str(e),
+                "transient": is_retryable(e),
                 "success": False
             }
     
-    def _generate_openai_response(self, prompt: str, model: str, max_tokens: int) -> Dict[str, Any]:
+    def _hedge_delay(self, provider: str, max_tokens: int) -> Optional[float]:
+        """
+        Seconds to wait on the primary before hedging, from its rolling p95 scaled by the
+        call's max_tokens (longer answers take longer); None until enough calls are observed
+        """
+        snapshot = self.router.get_snapshot(provider)
+        if snapshot.p95_latency is None or snapshot.samples < self.router.min_samples:
+            return None
+        delay = snapshot.p95_latency * max(1.0, max_tokens / 1000)
+        return min(max(delay, self.hedge_min_delay), self.hedge_max_delay)
+    
+    def _submit_hedge_call(self, prompt: str, provider: str, model: str, max_tokens: int,
+                           system: str) -> Optional[tuple]:
+        """
+        Start a provider call on the hedge pool if a thread is free right now
+        Returns (future, started event), or None when the pool is busy.
+        """
+        if not self._hedge_slots.acquire(blocking=False):
+            return None
+        started = threading.Event()
+        call = tracer.wrap(self._generate_with_provider)
+        
+        def run():
+            started.set()
+            try:
+                return call(prompt, provider, model, max_tokens, system)
+            finally:
+                self._hedge_slots.release()
+        
+        try:
+            return self._hedge_executor.submit(run), started
+        except Exception:
+            self._hedge_slots.release()
+            raise
+    
+    def _generate_hedged_response(self, prompt: str, provider: str, task_type: str, model: str,
+                                  max_tokens: int, system: str) -> Dict[str, Any]:
+        """
+        Race the primary provider against a second one once the primary passes its p95 deadline
+        The deadline counts from when the primary call starts running. Whichever succeeds first
+        wins; the loser's result is discarded and its cost recorded when it finishes. Only
+        transient primary failures move to the secondary. Providers without enough observed
+        calls, and calls arriving while the hedge pool is busy, run unhedged on the caller's thread.
+        """
+        delay = self._hedge_delay(provider, max_tokens)
+        submitted = self._submit_hedge_call(prompt, provider, model, max_tokens, system) if delay else None
+        if submitted is None:
+            self._record_hedge("skipped_cold" if delay is None else "skipped_busy")
+            return self._generate_with_provider(prompt, provider, model, max_tokens, system)
+        primary_future, started = submitted
+        
+        try:
+            secondary = self.get_best_provider(task_type, exclude=[provider])
+        except Exception:
+            secondary = None
+        
+        started.wait()
+        try:
+            result = primary_future.result(timeout=delay)
+            if result.get("success") or not result.get("transient") or not secondary:
+                return result
+            # Primary failed fast on a transient error: go to the secondary right away
+            futures = {}
+        except FuturesTimeout:
+            futures = {primary_future: provider}
+        
+        if not secondary:
+            return primary_future.result()
+        
+        # The primary's model name does not apply to the secondary provider
+        submitted = self._submit_hedge_call(prompt, secondary, None, max_tokens, system)
+        if submitted is None:
+            self._record_hedge("skipped_busy")
+            if futures:
+                return primary_future.result()
+            return self._generate_with_provider(prompt, secondary, None, max_tokens, system)
+        secondary_future, _ = submitted
+        futures[secondary_future] = secondary
+        logging.info(f"Hedging {provider} call to {secondary} after {delay:.1f}s")
+        self._record_hedge("launched")
+        
+        result = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                candidate = future.result()
+                if candidate.get("success") or result is None:
+                    result = candidate
+            if result and result.get("success"):
+                break
+        
+        for future in pending:
+            if not future.cancel():
+                future.add_done_callback(self._record_abandoned_hedge)
+        
+        if result.get("success"):
+            self._record_hedge("secondary_wins" if result["provider"] == secondary else "primary_wins")
+        result["hedge"] = {
+            "primary": provider,
+            "secondary": secondary,
+            "delay": delay,
+            "winner": result.get("provider") if result.get("success") else None
+        }
+        return result
+    
+    def _record_hedge(self, event: str, cost: float = 0.0):
+        """Update hedging counters"""
+        with self._hedge_lock:
+            self.hedge_stats[event] = self.hedge_stats.get(event, 0) + 1
+            self.hedge_stats["abandoned_cost"] += cost
+    
+    def _record_abandoned_hedge(self, future):
+        """Record the cost of a hedged call whose result was discarded"""
+        try:
+            result = future.result()
+        except Exception:
+            return
+        cost = result.get("cost", 0) if result.get("success") else 0.0
+        self._record_hedge("abandoned", cost)
+        logging.info(f"Abandoned hedged call to {result.get('provider')} finished, cost ${cost:.4f}")
+    
+    def _build_chat_messages(self, prompt: str, system: Optional[str]) -> List[Dict[str, str]]:
+        """Build chat messages with the static segment first so prefix caching can apply"""
+        messages = []
+        if system:
+            messages.append({"role": "system", "content": system})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+    
+    def _chat_completion_usage(self, usage) -> Dict[str, int]:
+        """Extract input/output/cached token counts from an OpenAI-compatible usage block"""
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", None) or 0
+        return {
+            "tokens_used": usage.total_tokens,
+            "input_tokens": usage.prompt_tokens,
+            "output_tokens": usage.completion_tokens,
+            "cached_input_tokens": cached_tokens
+        }
+    
+    def _generate_openai_response(self, prompt: str, model: str, max_tokens: int, 
+                                  system: str = None) -> Dict[str, Any]:
         """Generate OpenAI response"""
         client = self.providers['openai']
         
         response = client.chat.completions.create(
             model=model,
-            messages=[{"role": "user", "content": prompt}],
+            messages=self._build_chat_messages(prompt, system),
             max_tokens=max_tokens
         )
         
+        usage = self._chat_completion_usage(response.usage)
         return {
             "model": model,
             "content": response.choices[0].message.content,
-            "tokens_used": response.usage.total_tokens,
-            "cost": self._calculate_openai_cost(model, response.usage.total_tokens)
+            **usage,
+            "cost": self._calculate_openai_cost(model, usage["tokens_used"], usage["cached_input_tokens"])
         }
     
-    def _generate_anthropic_response(self, prompt: str, model: str, max_tokens: int) -> Dict[str, Any]:
+    def _generate_anthropic_response(self, prompt: str, model: str, max_tokens: int, 
+                                     system: str = None) -> Dict[str, Any]:
         """Generate Anthropic response"""
         client = self.providers['anthropic']
         
-        response = client.messages.create(
-            model=model,
-            max_tokens=max_tokens,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        request = {
+            "model": model,
+            "max_tokens": max_tokens,
+            "messages": [{"role": "user", "content": prompt}]
+        }
+        if system:
+            segment = {"type": "text", "text": system}
+            # A cache marker on a prefix below the provider minimum is ignored, so only long ones get it
+            if token_limiter.estimate_tokens(system, "anthropic") >= PROMPT_CACHE_MIN_TOKENS:
+                segment["cache_control"] = {"type": "ephemeral"}
+            request["system"] = [segment]
+        
+        response = client.messages.create(**request)
+        
+        usage = response.usage
+        cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
         
         return {
             "model": model,
             "content": response.content[0].text,
-            "tokens_used": response.usage.input_tokens + response.usage.output_tokens,
-            "cost": self._calculate_anthropic_cost(model, response.usage.input_tokens, response.usage.output_tokens)
+            "tokens_used": usage.input_tokens + cache_read + cache_write + usage.output_tokens,
+            "input_tokens": usage.input_tokens + cache_read + cache_write,
+            "output_tokens": usage.output_tokens,
+            "cached_input_tokens": cache_read,
+            "cache_write_tokens": cache_write,
+            "cost": self._calculate_anthropic_cost(
+                model, usage.input_tokens, usage.output_tokens, cache_read, cache_write
+            )
         }
     
-    def _generate_grok_response(self, prompt: str, model: str, max_tokens: int) -> Dict[str, Any]:
+    def _generate_grok_response(self, prompt: str, model: str, max_tokens: int, 
+                                system: str = None) -> Dict[str, Any]:
         """Generate Grok response"""
         client = self.providers['grok']
         
         response = client.chat.completions.create(
             model=model,
-            messages=[{"role": "user", "content": prompt}],
+            messages=self._build_chat_messages(prompt, system),
             max_tokens=max_tokens
         )
         
+        usage = self._chat_completion_usage(response.usage)
         return {
             "model": model,
             "content": response.choices[0].message.content,
-            "tokens_used": response.usage.total_tokens,
-            "cost": self._calculate_grok_cost(model, response.usage.total_tokens)
+            **usage,
+            "cost": self._calculate_grok_cost(model, usage["tokens_used"])
         }
     
-    def _calculate_openai_cost(self, model: str, tokens: int) -> float:
+    def estimate_cost(self, input_tokens: int, output_tokens: int, provider: str = None,
+                      model: str = None, economy: bool = False) -> float:
+        """
+        Upper-bound cost of a call before it is made
+        Without a provider, the most expensive configured provider (at its default or
+        economy model) is assumed, since routing happens later.
+        """
+        if provider is None:
+            return max((self.estimate_cost(input_tokens, output_tokens, name, economy=economy)
+                        for name in self.providers), default=0.0)
+        model = model or (ECONOMY_MODELS if economy else DEFAULT_MODELS).get(provider)
+        if provider == "openai":
+            return self._calculate_openai_cost(model, input_tokens + output_tokens)
+        if provider == "anthropic":
+            return self._calculate_anthropic_cost(model, input_tokens, output_tokens)
+        if provider == "grok":
+            return self._calculate_grok_cost(model, input_tokens + output_tokens)
+        return 0.0
+    
+    def _calculate_openai_cost(self, model: str, tokens: int, cached_tokens: int = 0) -> float:
         """Calculate OpenAI cost based on model and tokens (2025 pricing)"""
         # OpenAI 2025 pricing per 1k tokens
         rates = {
@@ -181,18 +520,25 @@ class AIProviderManager:
             "gpt-4": 0.00003,    # $0.03 per 1k tokens
             "gpt-3.5-turbo": 0.000002  # $0.002 per 1k tokens
         }
-        return rates.get(model, 0.000015) * (tokens / 1000)
+        rate = rates.get(model, 0.000015)
+        # Cached prompt prefix tokens are billed at half price
+        return rate * ((tokens - cached_tokens * 0.5) / 1000)
     
-    def _calculate_anthropic_cost(self, model: str, input_tokens: int, output_tokens: int) -> float:
-        """Calculate Anthropic cost based on model and tokens (2025 pricing)"""
+    def _calculate_anthropic_cost(self, model: str, input_tokens: int, output_tokens: int,
+                                  cache_read_tokens: int = 0, cache_write_tokens: int = 0) -> float:
+        """
+        Calculate Anthropic cost based on model and tokens (2025 pricing)
+        `input_tokens` excludes cached tokens: cache reads bill at 0.1x and cache writes at 1.25x the input rate
+        """
         # Anthropic 2025 pricing per 1k tokens
         rates = {
             "claude-sonnet-4-20250514": {"input": 0.015, "output": 0.075},  # $0.015 input, $0.075 output
             "claude-3-5-sonnet-20241022": {"input": 0.003, "output": 0.015}  # $0.003 input, $0.015 output
         }
         rate = rates.get(model, {"input": 0.015, "output": 0.075})
-        return (rate["input"] * input_tokens + rate["output"] * output_tokens) / 1000
-    
+        input_cost = rate["input"] * (input_tokens + cache_read_tokens * 0.1 + cache_write_tokens * 1.25)
+        return (input_cost + rate["output"] * output_tokens) / 1000
+
     def _calculate_grok_cost(self, model: str, tokens: int) -> float:
         """Calculate Grok cost based on model and tokens (2025 pricing)"""
         # xAI Grok 2025 pricing per 1k tokens
@@ -202,7 +548,7 @@ class AIProviderManager:
             "grok-beta": 0.005  # $0.005 per 1k tokens
         }
         return rates.get(model, 0.010) * (tokens / 1000)
-    
+
     def create_specialized_expert(self, field: str, expertise_level: str = "expert") -> str:
         """Create a specialized AI expert for any field"""
         expert_prompt = f"""
@@ -25,11 +25,46 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
     "pool_pre_ping": True,
 }
 
+def database_pool_options(workers: int, threads: int) -> dict:
+    """
+    Per-process pool sized from the gunicorn worker and thread counts: a request thread
+    holds its session's connection until teardown, background threads need a few more,
+    and all workers together must stay under the database's connection budget
+    """
+    # Job workers, automation runs, metrics writer, rollup and bootstrap (gunicorn.conf.py exports this)
+    background = int(os.environ.get("DB_BACKGROUND_CONNECTIONS", str(
+        int(os.environ.get("JOB_WORKERS", "4")) + int(os.environ.get("AUTOMATION_CONCURRENCY", "8")) + 3
+    )))
+    budget = int(os.environ.get("DB_MAX_CONNECTIONS", "90"))
+    per_worker = max(2, budget // max(1, workers))
+    pool_size = min(threads + background, per_worker)
+    if threads + background > per_worker:
+        logging.warning(f"{threads} request threads and {background} background connections exceed the "
+                        f"{per_worker} connections per worker; requests may wait for a connection")
+    return {
+        "pool_size": pool_size,
+        "max_overflow": per_worker - pool_size,
+        "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", "30")),
+    }
+
+# gunicorn.conf.py exports the worker model; in-memory SQLite uses a pool that takes no sizing options
+if app.config["SQLALCHEMY_DATABASE_URI"] and ":memory:" not in app.config["SQLALCHEMY_DATABASE_URI"]:
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"].update(database_pool_options(
+        int(os.environ.get("GUNICORN_WORKERS", "1")),
+        int(os.environ.get("GUNICORN_THREADS", "1"))
+    ))
+
 # Initialize the app with the extension
 db.init_app(app)
 
-with app.app_context():
-    # Import models to ensure tables are created
-    import models  # noqa: F401
-    db.create_all()
-    logging.info("Database tables created")
+def init_db():
+    """Create missing tables and apply additive upgrades; run by the bootstrap stage, not at import"""
+    with app.app_context():
+        # Import models to ensure tables are created
+        import models  # noqa: F401
+        db.create_all()
+        logging.info("Database tables created")
+        
+        # Apply columns and indexes added to existing tables
+        from schema_upgrade import upgrade_schema
+        upgrade_schema(db.engine, db.metadata)
@@ -0,0 +1,221 @@
+"""
+Automation Runner - OperatorOS
+Runs due scheduled business automations concurrently and applies their results in batched transactions
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+from sqlalchemy import select, update, bindparam, func
+
+class AutomationRunner:
+    """
+    Every process sweeps for due BusinessProcess rows and claims them with a conditional
+    UPDATE that pushes next_run_at out by a lease, so concurrent sweeps in several worker
+    processes split the work instead of repeating it. Claimed runs execute on a bounded
+    thread pool, each charged to the process owner's usage budget; each chunk's outcomes are
+    written back in one executemany transaction. A run refused by the budget is skipped and
+    retried after AUTOMATION_BUDGET_RETRY_MINUTES (or the run interval, if longer).
+    """
+
+    def __init__(self):
+        self.concurrency = int(os.environ.get('AUTOMATION_CONCURRENCY', '8'))
+        self.batch_size = int(os.environ.get('AUTOMATION_BATCH_SIZE', '50'))
+        self.sweep_interval = int(os.environ.get('AUTOMATION_SWEEP_SECONDS', '60'))
+        self.lease_seconds = int(os.environ.get('AUTOMATION_LEASE_SECONDS', '900'))
+        self.budget_retry_minutes = int(os.environ.get('AUTOMATION_BUDGET_RETRY_MINUTES', '360'))
+        self.enabled = os.environ.get('AUTOMATION_SCHEDULER_ENABLED', 'true').lower() == 'true'
+
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self.last_sweep: Optional[Dict[str, Any]] = None
+
+    def ensure_started(self):
+        """Start the periodic sweep thread in this process (restarting it after fork)"""
+        if not self.enabled:
+            return
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="automation-runner", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        from app import app
+
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                with app.app_context():
+                    self.run_due()
+            except Exception as e:
+                logging.error(f"Automation sweep failed: {str(e)}")
+
+    def run_due(self, limit: int = None, now: datetime = None) -> Dict[str, Any]:
+        """Run every due automation (up to limit), one claimed chunk at a time"""
+        sweep_start = time.perf_counter()
+        latencies: List[float] = []
+        summary = {"runs": 0, "succeeded": 0, "failed": 0, "skipped": 0}
+
+        while limit is None or summary["runs"] < limit:
+            chunk_size = self.batch_size if limit is None else min(self.batch_size, limit - summary["runs"])
+            processes = self._claim_due(chunk_size, now)
+            if not processes:
+                break
+
+            runs = self._execute(processes)
+            self._apply(processes, runs, now)
+
+            for run in runs:
+                summary["runs"] += 1
+                if run["success"]:
+                    summary["succeeded"] += 1
+                elif run.get("budget_exceeded"):
+                    summary["skipped"] += 1
+                else:
+                    summary["failed"] += 1
+                latencies.append(run["latency_ms"])
+
+        latencies.sort()
+        summary["wall_ms"] = round((time.perf_counter() - sweep_start) * 1000, 2)
+        if latencies:
+            summary["latency_ms"] = {
+                "p50": latencies[len(latencies) // 2],
+                "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                "max": latencies[-1]
+            }
+        summary["finished_at"] = datetime.now().isoformat()
+        if summary["runs"]:
+            self.last_sweep = summary
+            logging.info(f"Automation sweep: {summary['runs']} runs in {summary['wall_ms']}ms")
+        return summary
+
+    def _claim_due(self, limit: int, now: datetime = None) -> List[Dict[str, Any]]:
+        """Claim up to limit due processes by moving their next_run_at past the lease"""
+        from app import db
+        from models import BusinessProcess
+
+        table = BusinessProcess.__table__
+        now = now or datetime.now()
+        due = (table.c.status == "active", table.c.next_run_at.isnot(None), table.c.next_run_at <= now)
+        columns = (table.c.id, table.c.automation_type, table.c.service_type,
+                   table.c.user_id, table.c.run_interval_minutes)
+
+        claimed = []
+        with db.engine.begin() as conn:
+            candidates = conn.execute(
+                select(*columns).where(*due).order_by(table.c.next_run_at).limit(limit)
+            ).all()
+            for candidate in candidates:
+                taken = conn.execute(update(table).where(table.c.id == candidate.id, *due).values(
+                    next_run_at=now + timedelta(seconds=self.lease_seconds)
+                )).rowcount
+                if taken == 1:
+                    claimed.append(dict(candidate._mapping))
+        return claimed
+
+    def _execute(self, processes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Run the LLM step of each process on a bounded pool"""
+        workers = max(1, min(self.concurrency, len(processes)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="automation-run") as executor:
+            return list(executor.map(self._run_process, processes))
+
+    def _run_process(self, process: Dict[str, Any]) -> Dict[str, Any]:
+        """One automation run on a pool thread, charged to the process owner's usage budget"""
+        from app import app
+        from business_automation import business_automation
+        from usage_budget import usage_budget
+
+        try:
+            with app.app_context(), usage_budget.account_for_user(process["user_id"]):
+                return business_automation.generate_automation_run(
+                    process["automation_type"], process["service_type"] or "general"
+                )
+        except Exception as e:
+            return {"success": False, "error": str(e), "latency_ms": 0.0}
+
+    def _apply(self, processes: List[Dict[str, Any]], runs: List[Dict[str, Any]], now: datetime = None):
+        """Write back a chunk of run outcomes in one transaction and queue their metrics"""
+        from app import db
+        from models import BusinessProcess
+        from business_automation import business_automation
+
+        table = BusinessProcess.__table__
+        finished_at = datetime.now()
+        schedule_from = now or finished_at
+        succeeded, failed = [], []
+        for process, run in zip(processes, runs):
+            interval = process["run_interval_minutes"] or 60
+            if run.get("budget_exceeded"):
+                # Skipped, not failed: wait for the owner's budget window to free up
+                interval = max(interval, self.budget_retry_minutes)
+            row = {
+                "b_id": process["id"],
+                "b_last_run_ms": run["latency_ms"],
+                "b_next_run_at": schedule_from + timedelta(minutes=interval)
+            }
+            if run["success"]:
+                row["b_success_rate"] = run["results"]["success_rate"]
+                row["b_revenue"] = run["results"]["revenue_generated"]
+                succeeded.append(row)
+            else:
+                row["b_error"] = str(run.get("error"))[:1000]
+                failed.append(row)
+
+        with db.engine.begin() as conn:
+            if succeeded:
+                conn.execute(update(table).where(table.c.id == bindparam("b_id")).values(
+                    success_rate=bindparam("b_success_rate"),
+                    revenue_generated=func.coalesce(table.c.revenue_generated, 0.0) + bindparam("b_revenue"),
+                    run_count=func.coalesce(table.c.run_count, 0) + 1,
+                    last_run_at=finished_at,
+                    last_run_ms=bindparam("b_last_run_ms"),
+                    last_error=None,
+                    next_run_at=bindparam("b_next_run_at"),
+                    updated_at=finished_at
+                ), succeeded)
+            if failed:
+                conn.execute(update(table).where(table.c.id == bindparam("b_id")).values(
+                    last_run_at=finished_at,
+                    last_run_ms=bindparam("b_last_run_ms"),
+                    last_error=bindparam("b_error"),
+                    next_run_at=bindparam("b_next_run_at"),
+                    updated_at=finished_at
+                ), failed)
+
+        for process, run in zip(processes, runs):
+            if run["success"]:
+                business_automation._log_automation_activity(
+                    process["id"], process["automation_type"], run["content"] or "",
+                    user_id=process["user_id"], provider=run["provider"], latency_ms=run["latency_ms"]
+                )
+            elif run.get("budget_exceeded"):
+                logging.info(f"Automation {process['id']} skipped: owner's usage budget exhausted")
+            else:
+                logging.error(f"Automation {process['id']} ({process['automation_type']}) failed: {run.get('error')}")
+
+    def get_status(self) -> Dict[str, Any]:
+        """Due backlog and the last sweep's summary"""
+        from app import db
+        from models import BusinessProcess
+
+        due = db.session.query(func.count(BusinessProcess.id)).filter(
+            BusinessProcess.status == "active",
+            BusinessProcess.next_run_at.isnot(None),
+            BusinessProcess.next_run_at <= datetime.now()
+        ).scalar()
+        scheduled = db.session.query(func.count(BusinessProcess.id)).filter(
+            BusinessProcess.next_run_at.isnot(None)
+        ).scalar()
+        return {"scheduled": scheduled, "due": due, "concurrency": self.concurrency, "last_sweep": self.last_sweep}
+
+# Global automation runner
+automation_runner = AutomationRunner()
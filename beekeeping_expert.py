@@ -6,13 +6,13 @@ Advanced AI-powered beekeeping assistant for successful hive management
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Any
-from ai_providers import AIProviderManager
+from ai_providers import ai_manager
 from models import db, User
 import json
 
 class BeekeepingExpertSystem:
     def __init__(self):
-        self.ai_manager = AIProviderManager()
+        self.ai_manager = ai_manager
         logging.info("Beekeeping Expert System initialized")
     
     def create_beekeeping_expert(self, expertise_level: str = "master") -> str:
@@ -68,8 +68,6 @@ class BeekeepingExpertSystem:
         expert_persona = self.create_beekeeping_expert()
         
         prompt = f"""
-        {expert_persona}
-        
         A beekeeper in {location} is asking for {season} guidance. Provide comprehensive seasonal advice including:
         
         1. **Key Tasks for {season.title()}:**
@@ -95,7 +93,7 @@ class BeekeepingExpertSystem:
         Make them feel like they're getting advice from a trusted mentor who believes in their success.
         """
         
-        response = self.ai_manager.generate_response(prompt, task_type="analysis")
+        response = self.ai_manager.generate_response(prompt, task_type="analysis", system=expert_persona)
         
         return {
             "season": season.title(),
@@ -111,8 +109,6 @@ class BeekeepingExpertSystem:
         expert_persona = self.create_beekeeping_expert()
         
         prompt = f"""
-        {expert_persona}
-        
         A beekeeper is concerned about their hive and reports these symptoms:
         
         **Symptoms:** {symptoms}
@@ -143,7 +139,7 @@ class BeekeepingExpertSystem:
         Remember: Every beekeeper faces challenges. This is part of the learning journey toward mastery.
         """
         
-        response = self.ai_manager.generate_response(prompt, task_type="analysis")
+        response = self.ai_manager.generate_response(prompt, task_type="analysis", system=expert_persona)
         
         return {
             "symptoms": symptoms,
@@ -159,8 +155,6 @@ class BeekeepingExpertSystem:
         expert_persona = self.create_beekeeping_expert()
         
         prompt = f"""
-        {expert_persona}
-        
         Create a comprehensive management plan for a {experience_level} beekeeper with {hive_count} hive(s).
         
         **Their Goals:** {goals}
@@ -195,7 +189,7 @@ class BeekeepingExpertSystem:
         Make this plan feel achievable and exciting - they're on the path to becoming a skilled beekeeper!
         """
         
-        response = self.ai_manager.generate_response(prompt, task_type="creative")
+        response = self.ai_manager.generate_response(prompt, task_type="creative", system=expert_persona)
         
         return {
             "hive_count": hive_count,
@@ -212,8 +206,6 @@ class BeekeepingExpertSystem:
         expert_persona = self.create_beekeeping_expert()
         
         prompt = f"""
-        {expert_persona}
-        
         A beekeeper wants to optimize their honey production. Here's their situation:
         
         **Current Yield:** {current_yield}
@@ -249,7 +241,7 @@ class BeekeepingExpertSystem:
         Help them see the path to becoming a highly productive, successful beekeeper!
         """
         
-        response = self.ai_manager.generate_response(prompt, task_type="analysis")
+        response = self.ai_manager.generate_response(prompt, task_type="analysis", system=expert_persona)
         
         return {
             "current_yield": current_yield,
@@ -264,8 +256,6 @@ class BeekeepingExpertSystem:
         expert_persona = self.create_beekeeping_expert()
         
         prompt = f"""
-        {expert_persona}
-        
         A beekeeper needs guidance on queen management:
         
         **Queen Status:** {queen_status}
@@ -301,7 +291,7 @@ class BeekeepingExpertSystem:
         Remember: Queen management is the heart of successful beekeeping!
         """
         
-        response = self.ai_manager.generate_response(prompt, task_type="analysis")
+        response = self.ai_manager.generate_response(prompt, task_type="analysis", system=expert_persona)
         
         return {
             "queen_status": queen_status,
@@ -317,8 +307,6 @@ class BeekeepingExpertSystem:
         expert_persona = self.create_beekeeping_expert()
         
         prompt = f"""
-        {expert_persona}
-        
         Create an encouraging success dashboard for a developing beekeeper. Include:
         
         1. **Success Indicators:**
@@ -350,7 +338,7 @@ class BeekeepingExpertSystem:
         Make this feel like a roadmap to becoming a truly successful, expert beekeeper!
         """
         
-        response = self.ai_manager.generate_response(prompt, task_type="creative")
+        response = self.ai_manager.generate_response(prompt, task_type="creative", system=expert_persona)
         
         return {
             "dashboard": response.get("content", ""),
@@ -364,8 +352,6 @@ class BeekeepingExpertSystem:
         expert_persona = self.create_beekeeping_expert()
         
         prompt = f"""
-        {expert_persona}
-        
         A beekeeper needs encouragement and motivation. 
         
         **Current Challenge:** {current_challenge}
@@ -400,7 +386,7 @@ class BeekeepingExpertSystem:
         Help them feel like they're on the path to becoming a truly accomplished beekeeper!
         """
         
-        response = self.ai_manager.generate_response(prompt, task_type="creative")
+        response = self.ai_manager.generate_response(prompt, task_type="creative", system=expert_persona)
         
         return {
             "challenge": current_challenge,
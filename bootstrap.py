@@ -0,0 +1,198 @@
+"""
+Bootstrap - OperatorOS
+One-time startup stage (schema, default data) run off the request path under a cross-worker lock
+"""
+
+import os
+import sys
+import hashlib
+import time
+import socket
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, Callable, List, Tuple
+from sqlalchemy import select, delete
+
+class Bootstrap:
+    """
+    Steps run once per deployment by whichever process takes the "bootstrap" lock first;
+    the others wait and re-check, so a crashed bootstrap is retried. Progress lives in
+    BootstrapStep, which is what the readiness endpoint reports for every worker.
+    """
+
+    def __init__(self):
+        self.retry_interval = int(os.environ.get('BOOTSTRAP_RETRY_SECONDS', '30'))
+        self.enabled = os.environ.get('BOOTSTRAP_ENABLED', 'true').lower() == 'true'
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._ready = False
+        self._fingerprint = None
+
+    @property
+    def owner(self) -> str:
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def steps(self) -> List[Tuple[str, Callable[[], Any]]]:
+        from app import init_db
+        return [
+            # Named after the model definitions, so a deploy that changes them upgrades the schema again
+            (f"schema:{self._schema_fingerprint()}", init_db),
+            ("metrics_entity_backfill", self._backfill_metric_entities),
+            ("default_service_templates", self._create_default_templates),
+        ]
+
+    def _backfill_metric_entities(self):
+        from app import db
+        from schema_upgrade import backfill_metric_entities
+        backfill_metric_entities(db.engine)
+
+    def _create_default_templates(self):
+        from service_templates import service_templates
+        service_templates.create_default_templates()
+
+    def _schema_fingerprint(self) -> str:
+        from app import db
+        import models  # noqa: F401
+
+        if self._fingerprint:
+            return self._fingerprint
+        columns = sorted(
+            f"{table.name}.{column.name}:{column.type}"
+            for table in db.metadata.sorted_tables for column in table.columns
+        )
+        indexes = sorted(index.name for table in db.metadata.sorted_tables for index in table.indexes)
+        self._fingerprint = hashlib.sha256("|".join(columns + indexes).encode()).hexdigest()[:12]
+        return self._fingerprint
+
+    def run(self, only: List[str] = None) -> Dict[str, Any]:
+        """
+        Run pending steps if this process gets the lock; returns the resulting readiness.
+        `only` limits the run to steps with these name prefixes (e.g. ["schema"]).
+        """
+        from app import app, db
+        from process_lock import try_lock
+
+        with app.app_context():
+            self._ensure_status_table()
+            if self.is_ready():
+                return {"ready": True, "ran": False}
+
+            with try_lock("bootstrap", db.engine) as acquired:
+                if not acquired:
+                    return {"ready": self.is_ready(), "ran": False}
+                for name, step in self.steps():
+                    if only is None or name.split(":")[0] in only:
+                        self._run_step(name, step)
+            return {"ready": self.is_ready(), "ran": True}
+
+    def _ensure_status_table(self):
+        from app import db
+        from models import BootstrapStep
+        BootstrapStep.__table__.create(db.engine, checkfirst=True)
+
+    def _run_step(self, name: str, step: Callable[[], Any]):
+        from app import db
+        from models import BootstrapStep
+
+        table = BootstrapStep.__table__
+        with db.engine.connect() as conn:
+            status = conn.execute(select(table.c.status).where(table.c.name == name)).scalar()
+        if status == "completed":
+            return
+
+        started_at = datetime.now()
+        self._record(name, status="running", owner=self.owner, started_at=started_at,
+                     completed_at=None, duration_ms=None, error=None)
+        start = time.perf_counter()
+        try:
+            step()
+            db.session.commit()
+            self._record(name, status="completed", completed_at=datetime.now(),
+                         duration_ms=round((time.perf_counter() - start) * 1000, 2))
+            logging.info(f"Bootstrap step {name} completed")
+        except Exception as e:
+            db.session.rollback()
+            self._record(name, status="failed", error=str(e),
+                         duration_ms=round((time.perf_counter() - start) * 1000, 2))
+            logging.error(f"Bootstrap step {name} failed: {str(e)}")
+        finally:
+            db.session.remove()
+
+    def _record(self, name: str, **values):
+        from app import db
+        from models import BootstrapStep
+
+        table = BootstrapStep.__table__
+        with db.engine.begin() as conn:
+            updated = conn.execute(table.update().where(table.c.name == name).values(**values)).rowcount
+            if not updated:
+                conn.execute(table.insert().values(name=name, **values))
+
+    def is_ready(self) -> bool:
+        """True once every step has completed (cached in-process after the first success)"""
+        if self._ready:
+            return True
+        status = self.get_status()
+        self._ready = status["ready"]
+        return self._ready
+
+    def get_status(self) -> Dict[str, Any]:
+        from app import db
+        from models import BootstrapStep
+
+        names = [name for name, _ in self.steps()]
+        table = BootstrapStep.__table__
+        with db.engine.connect() as conn:
+            rows = {row.name: row for row in conn.execute(select(table).where(table.c.name.in_(names)))}
+        steps = {
+            name: {
+                "status": rows[name].status if name in rows else "pending",
+                "completed_at": rows[name].completed_at.isoformat() if name in rows and rows[name].completed_at else None,
+                "duration_ms": rows[name].duration_ms if name in rows else None,
+                "error": rows[name].error if name in rows else None
+            }
+            for name in names
+        }
+        return {"ready": all(step["status"] == "completed" for step in steps.values()), "steps": steps}
+
+    def reset(self):
+        """Forget completed steps so the next run repeats them (e.g. after changing defaults)"""
+        from app import db
+        from models import BootstrapStep
+
+        with db.engine.begin() as conn:
+            conn.execute(delete(BootstrapStep.__table__))
+        self._ready = False
+
+    def ensure_started(self):
+        """Run the bootstrap on a background thread in this process until it is ready"""
+        if not self.enabled or self._ready:
+            return
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run_until_ready, name="bootstrap", daemon=True)
+            self._thread.start()
+
+    def _run_until_ready(self):
+        while True:
+            try:
+                if self.run()["ready"]:
+                    return
+            except Exception as e:
+                logging.error(f"Bootstrap failed: {str(e)}")
+            time.sleep(self.retry_interval)
+
+# Global bootstrap
+bootstrap = Bootstrap()
+
+if __name__ == "__main__":
+    # Run as a deploy/build step so the first requests never wait on default data
+    result = bootstrap.run()
+    print(result)
+    sys.exit(0 if result["ready"] else 1)
@@ -1,10 +1,19 @@
+import os
+import time
 import logging
 import random
 from datetime import datetime, timedelta
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple, Optional
 from app import db
 from models import BusinessProcess, SystemMetrics, User
 from ai_providers import ai_manager
+from metrics_writer import metrics_writer
+from metrics_rollup import metrics_rollup
+from automation_runner import automation_runner
+
+# Shortest repeat interval for a scheduled automation, and how many active schedules a user may have
+AUTOMATION_MIN_INTERVAL_MINUTES = int(os.environ.get('AUTOMATION_MIN_INTERVAL_MINUTES', '60'))
+AUTOMATION_MAX_SCHEDULES = int(os.environ.get('AUTOMATION_MAX_SCHEDULES', '5'))
 
 class BusinessAutomationSystem:
     def __init__(self):
@@ -52,18 +61,29 @@ class BusinessAutomationSystem:
             }
         }
     
-    def create_automation_process(self, process_type: str, user_id: str = None) -> BusinessProcess:
-        """Create a new automated business process"""
+    def create_automation_process(self, process_type: str, user_id: str = None, service_type: str = None,
+                                  run_interval_minutes: int = None) -> BusinessProcess:
+        """
+        Create a new automated business process
+        With run_interval_minutes the process is scheduled and the automation runner repeats it.
+        """
         try:
             template = self.automation_templates.get(process_type)
             if not template:
                 raise ValueError(f"Unknown process type: {process_type}")
+            schedule_error = self.schedule_error(user_id, run_interval_minutes)
+            if schedule_error:
+                raise ValueError(schedule_error)
             
             process = BusinessProcess(
                 name=template["name"],
                 description=template["description"],
                 automation_type=process_type,
-                status="active"
+                status="active",
+                user_id=user_id,
+                service_type=service_type,
+                run_interval_minutes=run_interval_minutes,
+                next_run_at=datetime.now() + timedelta(minutes=run_interval_minutes) if run_interval_minutes else None
             )
             
             db.session.add(process)
@@ -79,6 +99,63 @@ class BusinessAutomationSystem:
             db.session.rollback()
             raise
     
+    def schedule_error(self, user_id: Optional[str], run_interval_minutes: Optional[int]) -> Optional[str]:
+        """Why a user may not schedule a repeat at this interval, or None if they may"""
+        if not run_interval_minutes:
+            return None
+        if run_interval_minutes < AUTOMATION_MIN_INTERVAL_MINUTES:
+            return f"Run interval must be at least {AUTOMATION_MIN_INTERVAL_MINUTES} minutes"
+        active = BusinessProcess.query.filter(
+            BusinessProcess.user_id == user_id,
+            BusinessProcess.status == "active",
+            BusinessProcess.next_run_at.isnot(None)
+        ).count()
+        if active >= AUTOMATION_MAX_SCHEDULES:
+            return f"At most {AUTOMATION_MAX_SCHEDULES} scheduled automations are allowed; pause or delete one first"
+        return None
+    
+    def _owned_process(self, process_id: int, user_id: str, is_admin: bool = False) -> Optional[BusinessProcess]:
+        process = BusinessProcess.query.get(process_id)
+        if not process or (process.user_id != user_id and not is_admin):
+            return None
+        return process
+    
+    def pause_automation_process(self, process_id: int, user_id: str, is_admin: bool = False) -> Dict[str, Any]:
+        """Stop a process's scheduled repeats; a run already in progress finishes"""
+        process = self._owned_process(process_id, user_id, is_admin)
+        if not process:
+            return {"error": "Process not found"}
+        process.status = "paused"
+        process.next_run_at = None
+        db.session.commit()
+        return {"success": True, "process_id": process.id, "status": process.status}
+    
+    def resume_automation_process(self, process_id: int, user_id: str, is_admin: bool = False) -> Dict[str, Any]:
+        """Schedule a paused process again, subject to the same limits as a new schedule"""
+        process = self._owned_process(process_id, user_id, is_admin)
+        if not process:
+            return {"error": "Process not found"}
+        if not process.run_interval_minutes:
+            return {"error": "Process has no run interval"}
+        if process.status != "active":
+            error = self.schedule_error(process.user_id, process.run_interval_minutes)
+            if error:
+                return {"error": error}
+        process.status = "active"
+        process.next_run_at = datetime.now() + timedelta(minutes=process.run_interval_minutes)
+        db.session.commit()
+        return {"success": True, "process_id": process.id, "status": process.status,
+                "next_run_at": process.next_run_at.isoformat()}
+    
+    def delete_automation_process(self, process_id: int, user_id: str, is_admin: bool = False) -> Dict[str, Any]:
+        """Delete a process and its schedule"""
+        process = self._owned_process(process_id, user_id, is_admin)
+        if not process:
+            return {"error": "Process not found"}
+        db.session.delete(process)
+        db.session.commit()
+        return {"success": True, "process_id": process_id, "status": "deleted"}
+    
     def _initialize_automation(self, process: BusinessProcess):
         """Initialize automation with AI-generated content"""
         try:
@@ -108,20 +185,18 @@ class BusinessAutomationSystem:
             
             if response.get("success"):
                 # Store the automation strategy (in a real system, this would be structured)
-                self._log_automation_activity(process.id, "initialization", response["content"])
+                self._log_automation_activity(
+                    process.id, "initialization", response["content"],
+                    user_id=process.user_id, provider=response.get("provider")
+                )
             
         except Exception as e:
             logging.error(f"Automation initialization failed: {str(e)}")
     
-    def run_client_acquisition_automation(self, process_id: int) -> Dict[str, Any]:
-        """Run automated client acquisition process"""
-        try:
-            process = BusinessProcess.query.get(process_id)
-            if not process or process.automation_type != "client_acquisition":
-                return {"error": "Invalid process"}
-            
-            # Generate AI-powered client acquisition strategy
-            prompt = """
+    def _automation_prompt(self, automation_type: str, service_type: str = "general") -> Tuple[str, str]:
+        """Prompt and task type for one run of an automation"""
+        if automation_type == "client_acquisition":
+            return """
             As a client acquisition expert, provide a comprehensive strategy for:
             
             1. Identifying high-value prospects
@@ -130,26 +205,99 @@ class BusinessAutomationSystem:
             4. Tracking and optimizing conversion rates
             
             Include specific tactics, templates, and metrics for a professional service business.
-            """
+            """, "analysis"
+        
+        if automation_type == "service_fulfillment":
+            return f"""
+            As a service fulfillment expert, create a comprehensive automation plan for {service_type}:
             
-            response = self.ai_manager.generate_response(prompt, task_type="analysis")
+            1. Service delivery workflow
+            2. Quality assurance processes
+            3. Client communication templates
+            4. Performance tracking metrics
+            5. Scalability considerations
             
-            if response.get("success"):
-                # Simulate automation results
-                results = self._simulate_client_acquisition_results()
-                
-                # Update process metrics
-                process.success_rate = results["success_rate"]
-                process.revenue_generated += results["revenue_generated"]
-                db.session.commit()
-                
-                self._log_automation_activity(process_id, "client_acquisition", response["content"])
+            Provide specific, actionable steps that can be automated.
+            """, "planning"
+        
+        if automation_type == "revenue_optimization":
+            return """
+            As a revenue optimization expert, provide a comprehensive strategy for:
+            
+            1. Pricing optimization analysis
+            2. Service package restructuring
+            3. Upselling and cross-selling opportunities
+            4. Revenue stream diversification
+            5. Performance tracking and optimization
+            
+            Include specific tactics and metrics for maximizing revenue growth.
+            """, "financial"
+        
+        raise ValueError(f"Unknown process type: {automation_type}")
+    
+    def generate_automation_run(self, automation_type: str, service_type: str = "general") -> Dict[str, Any]:
+        """
+        Run the LLM step of an automation and simulate its results
+        Touches no database state, so many runs can execute concurrently; the caller applies the outcome.
+        """
+        start = time.perf_counter()
+        try:
+            prompt, task_type = self._automation_prompt(automation_type, service_type or "general")
+            response = self.ai_manager.generate_response(prompt, task_type=task_type)
+            
+            run = {
+                "success": bool(response.get("success")),
+                "content": response.get("content"),
+                "provider": response.get("provider")
+            }
+            if run["success"]:
+                if automation_type == "client_acquisition":
+                    run["results"] = self._simulate_client_acquisition_results()
+                elif automation_type == "service_fulfillment":
+                    run["results"] = self._simulate_fulfillment_results(service_type)
+                else:
+                    run["results"] = self._simulate_revenue_optimization_results()
+            else:
+                run["error"] = response.get("error", "AI generation failed")
+                run["budget_exceeded"] = bool(response.get("budget_exceeded"))
+        except Exception as e:
+            run = {"success": False, "error": str(e)}
+        
+        run["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return run
+    
+    def _apply_automation_run(self, process: BusinessProcess, run: Dict[str, Any]):
+        """Record a successful run on its process and log the activity"""
+        process.success_rate = run["results"]["success_rate"]
+        process.revenue_generated = (process.revenue_generated or 0.0) + run["results"]["revenue_generated"]
+        process.last_run_at = datetime.now()
+        process.last_run_ms = run["latency_ms"]
+        process.run_count = (process.run_count or 0) + 1
+        process.last_error = None
+        db.session.commit()
+        
+        self._log_automation_activity(
+            process.id, process.automation_type, run["content"],
+            user_id=process.user_id, provider=run["provider"], latency_ms=run["latency_ms"]
+        )
+    
+    def run_client_acquisition_automation(self, process_id: int) -> Dict[str, Any]:
+        """Run automated client acquisition process"""
+        try:
+            process = BusinessProcess.query.get(process_id)
+            if not process or process.automation_type != "client_acquisition":
+                return {"error": "Invalid process"}
+            
+            run = self.generate_automation_run("client_acquisition")
+            
+            if run["success"]:
+                self._apply_automation_run(process, run)
                 
                 return {
                     "success": True,
-                    "strategy": response["content"],
-                    "results": results,
-                    "provider": response.get("provider")
+                    "strategy": run["content"],
+                    "results": run["results"],
+                    "provider": run["provider"]
                 }
             
             return {"error": "Failed to generate acquisition strategy"}
@@ -165,37 +313,16 @@ class BusinessAutomationSystem:
             if not process or process.automation_type != "service_fulfillment":
                 return {"error": "Invalid process"}
             
-            # Generate AI-powered service fulfillment
-            prompt = f"""
-            As a service fulfillment expert, create a comprehensive automation plan for {service_type}:
-            
-            1. Service delivery workflow
-            2. Quality assurance processes
-            3. Client communication templates
-            4. Performance tracking metrics
-            5. Scalability considerations
-            
-            Provide specific, actionable steps that can be automated.
-            """
-            
-            response = self.ai_manager.generate_response(prompt, task_type="planning")
+            run = self.generate_automation_run("service_fulfillment", service_type)
             
-            if response.get("success"):
-                # Simulate fulfillment results
-                results = self._simulate_fulfillment_results(service_type)
-                
-                # Update process metrics
-                process.success_rate = results["success_rate"]
-                process.revenue_generated += results["revenue_generated"]
-                db.session.commit()
-                
-                self._log_automation_activity(process_id, "service_fulfillment", response["content"])
+            if run["success"]:
+                self._apply_automation_run(process, run)
                 
                 return {
                     "success": True,
-                    "fulfillment_plan": response["content"],
-                    "results": results,
-                    "provider": response.get("provider")
+                    "fulfillment_plan": run["content"],
+                    "results": run["results"],
+                    "provider": run["provider"]
                 }
             
             return {"error": "Failed to generate fulfillment plan"}
@@ -211,37 +338,16 @@ class BusinessAutomationSystem:
             if not process or process.automation_type != "revenue_optimization":
                 return {"error": "Invalid process"}
             
-            # Generate AI-powered revenue optimization strategy
-            prompt = """
-            As a revenue optimization expert, provide a comprehensive strategy for:
-            
-            1. Pricing optimization analysis
-            2. Service package restructuring
-            3. Upselling and cross-selling opportunities
-            4. Revenue stream diversification
-            5. Performance tracking and optimization
-            
-            Include specific tactics and metrics for maximizing revenue growth.
-            """
+            run = self.generate_automation_run("revenue_optimization")
             
-            response = self.ai_manager.generate_response(prompt, task_type="financial")
-            
-            if response.get("success"):
-                # Simulate optimization results
-                results = self._simulate_revenue_optimization_results()
-                
-                # Update process metrics
-                process.success_rate = results["success_rate"]
-                process.revenue_generated += results["revenue_generated"]
-                db.session.commit()
-                
-                self._log_automation_activity(process_id, "revenue_optimization", response["content"])
+            if run["success"]:
+                self._apply_automation_run(process, run)
                 
                 return {
                     "success": True,
-                    "optimization_strategy": response["content"],
-                    "results": results,
-                    "provider": response.get("provider")
+                    "optimization_strategy": run["content"],
+                    "results": run["results"],
+                    "provider": run["provider"]
                 }
             
             return {"error": "Failed to generate optimization strategy"}
@@ -280,16 +386,28 @@ class BusinessAutomationSystem:
             "success_rate": round(random.uniform(0.85, 0.95), 2)
         }
     
-    def _log_automation_activity(self, process_id: int, activity_type: str, content: str):
+    def _log_automation_activity(self, process_id: int, activity_type: str, content: str,
+                                 user_id: str = None, provider: str = None, latency_ms: float = None):
         """Log automation activity for tracking"""
         try:
-            metric = SystemMetrics(
-                metric_type=f"automation_{activity_type}",
-                value=1.0,
-                metadata=f"Process ID: {process_id}\nContent: {content[:500]}..."
+            metrics_writer.record(
+                f"automation_{activity_type}",
+                1.0,
+                additional_data=f"Process ID: {process_id}\nContent: {content[:500]}...",
+                entity_type="business_process",
+                entity_id=str(process_id),
+                user_id=user_id,
+                provider=provider
             )
-            db.session.add(metric)
-            db.session.commit()
+            if latency_ms is not None:
+                metrics_writer.record(
+                    "automation_run_latency_ms",
+                    latency_ms,
+                    entity_type="business_process",
+                    entity_id=str(process_id),
+                    user_id=user_id,
+                    provider=provider
+                )
             
         except Exception as e:
             logging.error(f"Failed to log automation activity: {str(e)}")
@@ -306,16 +424,23 @@ class BusinessAutomationSystem:
             
             # Get recent metrics
             recent_metrics = SystemMetrics.query.filter(
-                SystemMetrics.metric_type.like('automation_%')
+                SystemMetrics.entity_type == "business_process"
             ).order_by(SystemMetrics.timestamp.desc()).limit(10).all()
             
+            # Activity counts for the last week come from rollups rather than raw rows
+            activity_counts = metrics_rollup.count_by_metric_type(
+                datetime.now() - timedelta(days=7), entity_type="business_process"
+            )
+            
             return {
                 "total_processes": total_processes,
                 "active_processes": active_processes,
                 "total_revenue": round(total_revenue, 2),
                 "average_success_rate": round(avg_success_rate, 2),
                 "processes": processes,
-                "recent_metrics": recent_metrics
+                "recent_metrics": recent_metrics,
+                "activity_7d": activity_counts,
+                "scheduler": automation_runner.get_status()
             }
             
         except Exception as e:
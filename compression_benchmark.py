@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark storage ratio and decode cost of compressed LLM text
+Uses stored conversation/analysis text when there is enough of it, synthetic markdown otherwise.
+A dictionary is trained on one half of the samples and measured on the other half.
+"""
+
+import sys
+import time
+import zlib
+import random
+sys.path.append('.')
+
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
+SECTIONS = ["Executive Summary", "Key Recommendations", "Risk Assessment", "Action Items",
+            "Financial Impact", "Implementation Timeline", "Market Analysis", "Next Steps"]
+PHRASES = ["Focus on high-margin recurring revenue", "Automate client onboarding within 30 days",
+           "Reduce customer acquisition cost by refining targeting", "Build a 6-month emergency fund",
+           "Validate demand with a small pilot before scaling", "Track weekly cash flow against forecast",
+           "Negotiate annual contracts to stabilize income", "Delegate low-value operational tasks",
+           "Prioritize the two highest-impact initiatives", "Review pricing against competitors quarterly"]
+
+def synthetic_samples(count: int, seed: int = 7):
+    """Markdown shaped like our agent responses"""
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(count):
+        parts = []
+        for section in rng.sample(SECTIONS, rng.randint(3, 6)):
+            parts.append(f"## {section}\n")
+            for index in range(rng.randint(2, 6)):
+                amount = rng.randint(1, 500) * 100
+                parts.append(f"{index + 1}. **{rng.choice(PHRASES)}** - estimated impact ${amount:,} "
+                             f"over {rng.randint(1, 12)} months.\n")
+            parts.append("\n")
+        samples.append("".join(parts))
+    return samples
+
+def stored_samples(limit: int):
+    try:
+        from app import app
+        from text_compression import text_codec
+        with app.app_context():
+            return text_codec.collect_samples(limit)
+    except Exception as e:
+        print(f"   Could not read stored samples: {str(e)}")
+        return []
+
+def measure(name, compress, decompress, samples):
+    raw_bytes = sum(len(sample.encode('utf-8')) for sample in samples)
+    start = time.perf_counter()
+    blobs = [compress(sample.encode('utf-8')) for sample in samples]
+    encode_us = (time.perf_counter() - start) / len(samples) * 1e6
+    start = time.perf_counter()
+    for blob in blobs:
+        decompress(blob)
+    decode_us = (time.perf_counter() - start) / len(samples) * 1e6
+    stored_bytes = sum(len(blob) for blob in blobs)
+    print(f"   {name:<18} ratio {raw_bytes / stored_bytes:5.2f}x  "
+          f"encode {encode_us:8.1f} us  decode {decode_us:8.1f} us")
+
+def run_benchmark(sample_count: int = 1000):
+    print("=== TEXT COMPRESSION BENCHMARK ===")
+    samples = stored_samples(sample_count)
+    source = "stored"
+    if len(samples) < 100:
+        samples = synthetic_samples(sample_count)
+        source = "synthetic"
+    random.Random(1).shuffle(samples)
+    training, holdout = samples[:len(samples) // 2], samples[len(samples) // 2:]
+    average = sum(len(sample) for sample in holdout) / len(holdout)
+    print(f"\n{len(holdout)} {source} samples, average {average:.0f} chars\n")
+
+    measure("zlib-6", lambda data: zlib.compress(data, 6), zlib.decompress, holdout)
+    if zstd is None:
+        print("   zstandard is not installed; zstd results skipped")
+        return
+
+    for level in (3, 6):
+        compressor = zstd.ZstdCompressor(level=level)
+        decompressor = zstd.ZstdDecompressor()
+        measure(f"zstd-{level}", compressor.compress, decompressor.decompress, holdout)
+
+    dictionary = zstd.train_dictionary(64 * 1024, [sample.encode('utf-8') for sample in training], level=6)
+    dictionary.precompute_compress(level=6)
+    compressor = zstd.ZstdCompressor(level=6, dict_data=dictionary)
+    decompressor = zstd.ZstdDecompressor(dict_data=dictionary)
+    measure("zstd-6 + dict", compressor.compress, decompressor.decompress, holdout)
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
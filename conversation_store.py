@@ -0,0 +1,100 @@
+"""
+Conversation Store - OperatorOS
+Bulk persistence of AI conversations with compressed full text in a side table
+"""
+
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor, Future
+from datetime import datetime
+from typing import Dict, Any, List, Union
+from sqlalchemy import insert
+from tracing import tracer
+
+# Prompts/responses longer than this keep only a preview in AIConversation
+PREVIEW_CHARS = int(os.environ.get('CONVERSATION_PREVIEW_CHARS', '500'))
+
+class ConversationStore:
+    """Writes AIConversation rows in one bulk INSERT ... RETURNING on a dedicated connection"""
+
+    def __init__(self, preview_chars: int = PREVIEW_CHARS):
+        self.preview_chars = preview_chars
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="conversation-store")
+
+    def _preview(self, text: str) -> str:
+        if len(text) <= self.preview_chars:
+            return text
+        return text[:self.preview_chars - 3] + "..."
+
+    def save_many(self, records: List[Dict[str, Any]], wait: bool = True) -> Union[List[int], Future]:
+        """
+        Persist conversations and return their ids in input order
+        Each record has user_id, provider, model, prompt, response and optional tokens_used/cost.
+        With wait=False the write runs on a background thread and a Future of the ids is returned.
+        """
+        if not wait:
+            return self._executor.submit(tracer.wrap(self._save_in_app_context), records)
+        return self._save(records)
+
+    def save(self, **record) -> int:
+        """Persist a single conversation and return its id"""
+        return self._save([record])[0]
+
+    def _save_in_app_context(self, records: List[Dict[str, Any]]) -> List[int]:
+        from app import app
+        with app.app_context():
+            try:
+                return self._save(records)
+            except Exception as e:
+                logging.error(f"Background conversation save failed: {str(e)}")
+                raise
+
+    @tracer.traced("db.save_conversations")
+    def _save(self, records: List[Dict[str, Any]]) -> List[int]:
+        from app import db
+        from models import AIConversation, AIConversationContent
+
+        if not records:
+            return []
+        tracer.set_attributes(**{"db.rows": len(records)})
+
+        now = datetime.now()
+        rows = []
+        contents = []
+        for record in records:
+            prompt = record.get("prompt") or ""
+            response = record.get("response") or ""
+            rows.append({
+                "user_id": record["user_id"],
+                "provider": record["provider"],
+                "model": record["model"],
+                "prompt": self._preview(prompt),
+                "response": self._preview(response),
+                "tokens_used": record.get("tokens_used", 0),
+                "cost": record.get("cost", 0.0),
+                "created_at": record.get("created_at", now)
+            })
+            needs_side_row = len(prompt) > self.preview_chars or len(response) > self.preview_chars
+            contents.append((prompt, response) if needs_side_row else None)
+
+        with db.engine.begin() as conn:
+            ids = conn.execute(
+                insert(AIConversation).returning(AIConversation.id, sort_by_parameter_order=True),
+                rows
+            ).scalars().all()
+
+            side_rows = [
+                {
+                    "conversation_id": conversation_id,
+                    "prompt_compressed": content[0],
+                    "response_compressed": content[1]
+                }
+                for conversation_id, content in zip(ids, contents) if content
+            ]
+            if side_rows:
+                conn.execute(insert(AIConversationContent), side_rows)
+
+        return list(ids)
+
+# Global conversation store
+conversation_store = ConversationStore()
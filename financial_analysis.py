@@ -1,5 +1,4 @@
 import logging
-import pandas as pd
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
 from app import db
@@ -0,0 +1,79 @@
+"""
+Gunicorn configuration - OperatorOS
+Threaded workers for I/O-bound LLM traffic: a request waiting 10-60s on a provider holds one
+thread, not a whole worker process. Run with `gunicorn -c gunicorn.conf.py main:app`.
+"""
+
+import os
+import logging
+import multiprocessing
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# gthread keeps Flask, SQLAlchemy and the provider SDKs on plain threads; no monkey-patching
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+# A process per core for the CPU-bound parts, many threads each for requests waiting on I/O
+workers = int(os.environ.get("GUNICORN_WORKERS", str(min(max(multiprocessing.cpu_count(), 2), 4))))
+
+# A request thread holds its session's database connection until teardown, including while it
+# waits on a provider, so the default thread count is what the worker's share of
+# DB_MAX_CONNECTIONS leaves after its background threads (job workers, automation runs,
+# metrics writer, rollup, bootstrap)
+background_connections = int(os.environ.get("DB_BACKGROUND_CONNECTIONS", str(
+    int(os.environ.get("JOB_WORKERS", "4")) + int(os.environ.get("AUTOMATION_CONCURRENCY", "8")) + 3
+)))
+connection_share = int(os.environ.get("DB_MAX_CONNECTIONS", "90")) // workers
+default_threads = max(4, min(32, connection_share - background_connections))
+threads = int(os.environ.get("GUNICORN_THREADS", str(default_threads))) if worker_class == "gthread" else 1
+
+# app.py sizes each worker's database pool from these
+os.environ["GUNICORN_WORKERS"] = str(workers)
+os.environ["GUNICORN_THREADS"] = str(threads)
+os.environ["DB_BACKGROUND_CONNECTIONS"] = str(background_connections)
+
+# Provider calls can take a minute; a restarting worker gets time to finish them
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "90"))
+keepalive = 5
+
+# Recycle workers periodically so slow leaks (SDK clients, caches) cannot grow unbounded
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "200"))
+
+# Import the app once in the master so workers share its memory copy-on-write and start
+# instantly; --reload needs the app imported in each worker instead
+reload = os.environ.get("GUNICORN_RELOAD", "false").lower() == "true"
+preload_app = not reload
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG") or None
+
+def on_starting(server):
+    """Clear LLM metric files left by a previous server, so counters start from zero"""
+    from prometheus_metrics import prometheus_metrics
+    prometheus_metrics.reset_directory()
+
+def when_ready(server):
+    """Before any worker starts: create/upgrade the schema once, so no request races DDL"""
+    if not preload_app:
+        return
+    from app import app, db
+    from bootstrap import bootstrap
+
+    try:
+        result = bootstrap.run(only=["schema"])
+        server.log.info(f"Schema bootstrap: {result}")
+    except Exception as e:
+        # Workers' background bootstrap retries until the database is reachable
+        logging.error(f"Schema bootstrap in master failed: {str(e)}")
+    finally:
+        with app.app_context():
+            db.engine.dispose()
+
+def post_fork(server, worker):
+    """Drop pooled connections inherited from the master and start the worker's bootstrap"""
+    from app import app, db
+    from bootstrap import bootstrap
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+    bootstrap.ensure_started()
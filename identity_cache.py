@@ -0,0 +1,120 @@
+"""
+Identity Cache - OperatorOS
+Per-process TTL cache for the logged-in User and OAuth token lookups made on every request
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Any, Optional, Tuple
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+USER_TTL_SECONDS = float(os.environ.get('IDENTITY_CACHE_USER_TTL', '30'))
+TOKEN_TTL_SECONDS = float(os.environ.get('IDENTITY_CACHE_TOKEN_TTL', '30'))
+MAX_ENTRIES = int(os.environ.get('IDENTITY_CACHE_MAX_ENTRIES', '5000'))
+
+class IdentityCache:
+    """
+    Users are cached as detached snapshots and attached to each request's session with
+    merge(load=False), which issues no SELECT. Writes made in this process invalidate
+    immediately; other processes see them once the short TTL expires.
+    """
+
+    def __init__(self, user_ttl: float = USER_TTL_SECONDS, token_ttl: float = TOKEN_TTL_SECONDS,
+                 max_entries: int = MAX_ENTRIES):
+        self.user_ttl = user_ttl
+        self.token_ttl = token_ttl
+        self.max_entries = max_entries
+        self._users: Dict[str, Tuple[float, Any]] = {}
+        self._tokens: Dict[Tuple, Tuple[float, Optional[Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"user_hits": 0, "user_misses": 0, "token_hits": 0, "token_misses": 0}
+
+    # --- users ---
+
+    def load_user(self, user_id: str):
+        """The User for a session, attached to the current db session"""
+        from app import db
+        from models import User
+
+        if not user_id:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            cached = self._users.get(user_id)
+            if cached and cached[0] > now:
+                self.stats["user_hits"] += 1
+                snapshot = cached[1]
+            else:
+                self.stats["user_misses"] += 1
+                snapshot = None
+
+        if snapshot is not None:
+            return db.session.merge(snapshot, load=False)
+
+        user = db.session.get(User, user_id)
+        if user is not None:
+            self._store(self._users, user_id, (now + self.user_ttl, self._snapshot(user)))
+        return user
+
+    def _snapshot(self, user):
+        """Detached copy of the user's column values, safe to share between sessions"""
+        mapper = inspect(type(user))
+        copy = type(user)(**{column.key: getattr(user, column.key) for column in mapper.column_attrs})
+        make_transient_to_detached(copy)
+        return copy
+
+    def invalidate_user(self, user_id: str):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    # --- OAuth tokens ---
+
+    def get_token(self, key: Tuple, loader):
+        """Cached token for (user_id, browser_session_key, provider), loading it on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._tokens.get(key)
+            if cached and cached[0] > now:
+                self.stats["token_hits"] += 1
+                token = cached[1]
+                return dict(token) if isinstance(token, dict) else token
+            self.stats["token_misses"] += 1
+
+        token = loader()
+        # A token close to expiry is about to be refreshed, possibly by another process, so
+        # it is not cached; otherwise a stale copy here could replay a used refresh token
+        expires_at = token.get("expires_at") if isinstance(token, dict) else None
+        if expires_at is None or expires_at - time.time() > self.token_ttl:
+            self._store(self._tokens, key, (now + self.token_ttl, dict(token) if isinstance(token, dict) else token))
+        return token
+
+    def invalidate_token(self, key: Tuple):
+        with self._lock:
+            self._tokens.pop(key, None)
+
+    def _store(self, cache: Dict, key, value):
+        with self._lock:
+            if len(cache) >= self.max_entries:
+                now = time.monotonic()
+                for stale_key in [k for k, (expires, _) in cache.items() if expires <= now]:
+                    del cache[stale_key]
+                if len(cache) >= self.max_entries:
+                    cache.clear()
+            cache[key] = value
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, users=len(self._users), tokens=len(self._tokens))
+
+# Global identity cache
+identity_cache = IdentityCache()
+
+def _invalidate_user_on_write(mapper, connection, target):
+    identity_cache.invalidate_user(target.id)
+
+def register_user_invalidation(user_model):
+    """Drop a cached user whenever this process updates or deletes it"""
+    event.listen(user_model, "after_update", _invalidate_user_on_write)
+    event.listen(user_model, "after_delete", _invalidate_user_on_write)
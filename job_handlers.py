@@ -0,0 +1,192 @@
+"""
+Job Handlers - OperatorOS
+Long-running LLM work executed by the background job queue instead of inside HTTP requests
+"""
+
+from typing import Dict, Any
+from job_queue import job_queue, JobContext
+from lazy_import import lazy_singleton
+from conversation_store import conversation_store
+from text_compression import text_codec
+from automation_runner import automation_runner
+from tracing import tracer
+from usage_budget import usage_budget
+
+# Handlers register at import; the subsystems they call load when a job first runs
+business_automation = lazy_singleton("business_automation", "business_automation")
+service_templates = lazy_singleton("service_templates", "service_templates")
+admin_dashboard = lazy_singleton("admin_dashboard", "admin_dashboard")
+query_analyzer = lazy_singleton("query_analyzer", "query_analyzer")
+agent_orchestrator = lazy_singleton("agent_chain_orchestrator", "agent_orchestrator")
+response_synthesizer = lazy_singleton("response_synthesizer", "response_synthesizer")
+
+# Interactive jobs a user is waiting on run ahead of reports and automation
+PRIORITY_INTERACTIVE = 10
+PRIORITY_AUTOMATION = 5
+PRIORITY_REPORT = 0
+
+@job_queue.register("comprehensive_analysis", priority=PRIORITY_INTERACTIVE, max_attempts=2)
+def comprehensive_analysis_job(payload: Dict[str, Any], context: JobContext) -> Dict[str, Any]:
+    """Chain relevant agents for a query and synthesize a comprehensive answer"""
+    user_query = payload["query"]
+    user_id = context.user_id
+    complexity_preference = payload.get("complexity", "auto")  # auto, simple, comprehensive
+    max_agents = payload.get("max_agents", 5)
+
+    # Analyze what expertise is needed
+    analysis = query_analyzer.analyze_user_query(user_query)
+
+    # Adjust agent chain based on preferences
+    agent_chain = analysis.agent_chain
+    if complexity_preference == 'simple':
+        agent_chain = agent_chain[:2]  # Limit to 2 agents
+    elif complexity_preference == 'comprehensive':
+        # Keep all agents, maybe add more
+        pass
+
+    # Limit chain length
+    agent_chain = agent_chain[:max_agents]
+
+    # Fit the chain to the user's remaining budget: fewer agents and cheaper models near the limit
+    budget = usage_budget.plan_chain(
+        lambda agents: query_analyzer._estimate_token_usage(analysis.complexity_level, agents), len(agent_chain)
+    )
+    if not budget["allowed"]:
+        return {"success": False, "error": "Usage budget exhausted", "budget_exceeded": True, "budget": budget}
+    agent_chain = agent_chain[:budget["max_agents"]]
+
+    with usage_budget.economy(budget["economy"]):
+        # Process the agent chain
+        chain_result = agent_orchestrator.process_chain(
+            query=user_query,
+            agent_chain=agent_chain,
+            user_context=f"User: {payload.get('user_name') or 'User'}"
+        )
+        context.check_cancelled()
+
+        # Synthesize comprehensive answer
+        synthesis_result = response_synthesizer.synthesize_agent_responses(
+            chain_result.responses, user_query
+        )
+        context.check_cancelled()
+
+    # Store agent conversations and the synthesis in one bulk insert
+    conversation_records = [
+        {
+            "user_id": user_id,
+            "provider": response.provider,
+            "model": response.model,
+            "prompt": f"[{response.agent_type}] {user_query}",
+            "response": response.content,
+            "tokens_used": response.tokens_used,
+            "cost": response.cost
+        }
+        for response in chain_result.responses
+    ]
+    conversation_records.append({
+        "user_id": user_id,
+        "provider": "synthesis",
+        "model": "multi-agent",
+        "prompt": user_query,
+        "response": synthesis_result.comprehensive_answer,
+        "tokens_used": chain_result.total_tokens,
+        "cost": chain_result.total_cost
+    })
+    conversation_ids = conversation_store.save_many(conversation_records)
+
+    # Calculate confidence score
+    confidence_score = min(synthesis_result.confidence_score, chain_result.confidence_score)
+
+    return {
+        "success": True,
+        "comprehensive_answer": synthesis_result.comprehensive_answer,
+        "perspectives_included": analysis.required_perspectives,
+        "agents_consulted": agent_chain,
+        "agents_failed": chain_result.failed_agents,
+        "confidence_score": confidence_score,
+        "processing_time": chain_result.processing_time,
+        "trace_id": tracer.current_trace_id(),
+        "total_tokens": chain_result.total_tokens,
+        "total_cost": chain_result.total_cost,
+        "budget": budget,
+        "synthesis_quality": synthesis_result.synthesis_quality,
+        "key_insights": [
+            {
+                "content": insight.content,
+                "source_agents": insight.source_agents,
+                "priority": insight.priority
+            }
+            for insight in synthesis_result.key_insights
+        ],
+        "action_items": synthesis_result.action_items,
+        "conflicting_viewpoints": synthesis_result.conflicting_viewpoints,
+        "consensus_points": synthesis_result.consensus_points,
+        "conversation_id": conversation_ids[-1],
+        "agent_conversation_ids": conversation_ids[:-1],
+        "agent_responses": [
+            {
+                "agent_type": response.agent_type,
+                "provider": response.provider,
+                "model": response.model,
+                "content": response.content,
+                "tokens_used": response.tokens_used,
+                "cost": response.cost,
+                "confidence_score": response.confidence_score,
+                "perspective": response.perspective
+            }
+            for response in chain_result.responses
+        ]
+    }
+
+@job_queue.register("generate_proposal", priority=PRIORITY_INTERACTIVE)
+def generate_proposal_job(payload: Dict[str, Any], context: JobContext) -> Dict[str, Any]:
+    """Generate a service proposal from a template"""
+    return service_templates.generate_proposal(
+        payload["template_id"], payload["client_name"], payload["project_details"],
+        payload.get("budget_range"), user_id=context.user_id
+    )
+
+@job_queue.register("run_automation", priority=PRIORITY_AUTOMATION)
+def run_automation_job(payload: Dict[str, Any], context: JobContext) -> Dict[str, Any]:
+    """Create and run a business automation process, scheduling repeats if an interval is given"""
+    automation_type = payload.get("automation_type")
+    service_type = payload.get("service_type", "general")
+    if automation_type not in ('client_acquisition', 'service_fulfillment', 'revenue_optimization'):
+        return {"error": "Invalid automation type"}
+
+    # Schedule limits are checked again here: other jobs may have created schedules since the request
+    error = business_automation.schedule_error(context.user_id, payload.get("run_interval_minutes"))
+    if error:
+        return {"error": error}
+    process = business_automation.create_automation_process(
+        automation_type, user_id=context.user_id,
+        service_type=service_type if automation_type == 'service_fulfillment' else None,
+        run_interval_minutes=payload.get("run_interval_minutes")
+    )
+
+    if automation_type == 'client_acquisition':
+        return business_automation.run_client_acquisition_automation(process.id)
+    elif automation_type == 'service_fulfillment':
+        return business_automation.run_service_fulfillment_automation(process.id, service_type)
+    return business_automation.run_revenue_optimization(process.id)
+
+@job_queue.register("automation_sweep", priority=PRIORITY_AUTOMATION, max_attempts=1)
+def automation_sweep_job(payload: Dict[str, Any], context: JobContext) -> Dict[str, Any]:
+    """Run all due scheduled automations now"""
+    return automation_runner.run_due(limit=payload.get("limit"))
+
+@job_queue.register("admin_report", priority=PRIORITY_REPORT, max_attempts=2)
+def admin_report_job(payload: Dict[str, Any], context: JobContext) -> Dict[str, Any]:
+    """Generate the admin report with AI insights"""
+    return admin_dashboard.generate_admin_report()
+
+@job_queue.register("compress_text_backfill", priority=PRIORITY_REPORT, max_attempts=2)
+def compress_text_backfill_job(payload: Dict[str, Any], context: JobContext) -> Dict[str, Any]:
+    """Optionally train a new dictionary, then move and re-encode stored LLM text"""
+    result = {}
+    if payload.get("train_dictionary"):
+        result["dictionary"] = text_codec.train_dictionary(sample_limit=payload.get("sample_limit", 2000))
+    result.update(text_codec.backfill(
+        batch_size=payload.get("batch_size", 200), check_cancelled=context.check_cancelled
+    ))
+    return result
@@ -0,0 +1,352 @@
+"""
+Job Queue - OperatorOS
+Database-backed background job queue with a local worker pool, priorities, cancellation and leased retries
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, Callable, Optional, List
+from sqlalchemy import select, update, and_, or_
+from tracing import tracer
+from sampling_profiler import sampling_profiler
+from usage_budget import usage_budget
+
+TERMINAL_STATUSES = ("succeeded", "failed", "cancelled")
+
+class JobCancelled(Exception):
+    """Raised inside a handler when cancellation of its job was requested"""
+
+class JobContext:
+    """Handle passed to job handlers for cancellation checks"""
+
+    def __init__(self, job_queue: "JobQueue", job_id: str, user_id: Optional[str], attempt: int):
+        self.job_queue = job_queue
+        self.job_id = job_id
+        self.user_id = user_id
+        self.attempt = attempt
+
+    def is_cancel_requested(self) -> bool:
+        return self.job_queue.is_cancel_requested(self.job_id)
+
+    def check_cancelled(self):
+        """Stop the handler if the job was cancelled"""
+        if self.is_cancel_requested():
+            raise JobCancelled(self.job_id)
+
+class JobQueue:
+    """
+    Jobs are rows in BackgroundJob; every web process runs a small worker pool that
+    claims them with a conditional UPDATE and holds a renewable lease while running.
+    A job whose worker dies is picked up again once its lease expires (at-least-once).
+    """
+
+    def __init__(self):
+        self.worker_count = int(os.environ.get('JOB_WORKERS', '4'))
+        self.lease_seconds = int(os.environ.get('JOB_LEASE_SECONDS', '120'))
+        self.poll_interval = float(os.environ.get('JOB_POLL_INTERVAL', '1.0'))
+        self.enabled = os.environ.get('JOB_WORKERS_ENABLED', 'true').lower() == 'true'
+
+        self.handlers: Dict[str, Dict[str, Any]] = {}
+        self._threads: List[threading.Thread] = []
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._running_lock = threading.Lock()
+        self._running: set = set()
+        self._wakeup = threading.Event()
+        self.stats = {"executed": 0, "succeeded": 0, "failed": 0, "retried": 0, "cancelled": 0}
+
+    @property
+    def owner(self) -> str:
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def register(self, job_type: str, priority: int = 0, max_attempts: int = 3):
+        """Decorator registering a handler(payload, context) -> JSON-serializable result"""
+        def decorator(func: Callable[[Dict[str, Any], JobContext], Any]):
+            self.handlers[job_type] = {"func": func, "priority": priority, "max_attempts": max_attempts}
+            return func
+        return decorator
+
+    def enqueue(self, job_type: str, payload: Dict[str, Any] = None, user_id: str = None,
+                priority: int = None, max_attempts: int = None) -> str:
+        """Queue a job and return its id; written on its own connection, outside the caller's session"""
+        from app import db
+        from models import BackgroundJob
+
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        handler = self.handlers[job_type]
+
+        job_id = uuid.uuid4().hex
+        now = datetime.now()
+        # The worker continues the caller's trace (e.g. the request that queued the job)
+        trace = tracer.current_context()
+        if trace:
+            payload = dict(payload or {}, _trace=trace)
+        with tracer.span("db.enqueue_job", **{"job.id": job_id, "job.type": job_type}), db.engine.begin() as conn:
+            conn.execute(BackgroundJob.__table__.insert().values(
+                id=job_id,
+                job_type=job_type,
+                user_id=user_id,
+                status="queued",
+                priority=handler["priority"] if priority is None else priority,
+                payload=json.dumps(payload or {}, default=str),
+                attempts=0,
+                max_attempts=max_attempts or handler["max_attempts"],
+                cancel_requested=False,
+                available_at=now,
+                created_at=now
+            ))
+
+        self.ensure_started()
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str):
+        from models import BackgroundJob
+        return BackgroundJob.query.get(job_id)
+
+    def to_dict(self, job, include_result: bool = True) -> Dict[str, Any]:
+        """Public view of a job"""
+        data = {
+            "job_id": job.id,
+            "job_type": job.job_type,
+            "status": job.status,
+            "priority": job.priority,
+            "attempts": job.attempts,
+            "cancel_requested": job.cancel_requested,
+            "error": job.error,
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "started_at": job.started_at.isoformat() if job.started_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+            "trace_id": (json.loads(job.payload or "{}").get("_trace") or {}).get("trace_id")
+        }
+        if include_result and job.status == "succeeded" and job.result:
+            data["result"] = json.loads(job.result)
+        return data
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """Cancel a queued job immediately, or flag a running one; returns the resulting status"""
+        from app import db
+        from models import BackgroundJob
+
+        table = BackgroundJob.__table__
+        now = datetime.now()
+        with db.engine.begin() as conn:
+            conn.execute(update(table).where(
+                table.c.id == job_id, table.c.status == "queued"
+            ).values(status="cancelled", cancel_requested=True, finished_at=now))
+            conn.execute(update(table).where(
+                table.c.id == job_id, table.c.status == "running"
+            ).values(cancel_requested=True))
+            status = conn.execute(select(table.c.status).where(table.c.id == job_id)).scalar()
+        return status
+
+    def is_cancel_requested(self, job_id: str) -> bool:
+        from app import db
+        from models import BackgroundJob
+
+        table = BackgroundJob.__table__
+        with db.engine.connect() as conn:
+            return bool(conn.execute(
+                select(table.c.cancel_requested).where(table.c.id == job_id)
+            ).scalar())
+
+    def ensure_started(self):
+        """Start the worker pool and lease heartbeat in this process (restarting after fork)"""
+        if not self.enabled:
+            return
+        if self._pid == os.getpid() and all(thread.is_alive() for thread in self._threads):
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and all(thread.is_alive() for thread in self._threads):
+                return
+            if self._pid != os.getpid():
+                self._threads = []
+                self._running = set()
+            self._pid = os.getpid()
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+
+            names = {thread.name for thread in self._threads}
+            for index in range(self.worker_count):
+                name = f"job-worker-{index}"
+                if name not in names:
+                    thread = threading.Thread(target=self._worker_loop, name=name, daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+            if "job-heartbeat" not in names:
+                thread = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _worker_loop(self):
+        from app import app
+
+        while True:
+            try:
+                with app.app_context():
+                    job = self._claim()
+                    if job is None:
+                        self._wakeup.wait(self.poll_interval)
+                        self._wakeup.clear()
+                        continue
+                    self._execute(job)
+            except Exception as e:
+                logging.error(f"Job worker error: {str(e)}")
+                time.sleep(self.poll_interval)
+
+    def _claimable(self, table, now: datetime):
+        return or_(
+            and_(table.c.status == "queued", table.c.available_at <= now),
+            and_(table.c.status == "running", table.c.lease_expires_at < now)
+        )
+
+    def _claim(self):
+        """Claim the highest-priority available job with a conditional update"""
+        from app import db
+        from models import BackgroundJob
+
+        table = BackgroundJob.__table__
+        now = datetime.now()
+        with db.engine.connect() as conn:
+            candidates = conn.execute(
+                select(table.c.id).where(self._claimable(table, now))
+                .order_by(table.c.priority.desc(), table.c.available_at)
+                .limit(5)
+            ).scalars().all()
+
+        for job_id in candidates:
+            with db.engine.begin() as conn:
+                claimed = conn.execute(
+                    update(table).where(table.c.id == job_id, self._claimable(table, now)).values(
+                        status="running",
+                        lease_owner=self.owner,
+                        lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                        attempts=table.c.attempts + 1,
+                        started_at=now
+                    )
+                ).rowcount
+                if claimed == 1:
+                    return conn.execute(select(table).where(table.c.id == job_id)).one()
+        return None
+
+    def _finish(self, job_id: str, **values) -> bool:
+        """Update a job this worker still holds the lease for"""
+        from app import db
+        from models import BackgroundJob
+
+        table = BackgroundJob.__table__
+        with db.engine.begin() as conn:
+            return conn.execute(
+                update(table).where(
+                    table.c.id == job_id,
+                    table.c.status == "running",
+                    table.c.lease_owner == self.owner
+                ).values(lease_owner=None, lease_expires_at=None, **values)
+            ).rowcount == 1
+
+    def _execute(self, job):
+        """Run a claimed job and record its outcome"""
+        from app import db
+
+        now = datetime.now()
+        if job.cancel_requested:
+            self._finish(job.id, status="cancelled", finished_at=now)
+            self._count("cancelled")
+            return
+        if job.attempts > job.max_attempts:
+            self._finish(job.id, status="failed", finished_at=now,
+                         error=job.error or f"Gave up after {job.max_attempts} attempts")
+            self._count("failed")
+            return
+
+        handler = self.handlers.get(job.job_type)
+        if handler is None:
+            self._finish(job.id, status="failed", finished_at=now, error=f"No handler for {job.job_type}")
+            self._count("failed")
+            return
+
+        with self._running_lock:
+            self._running.add(job.id)
+        self._count("executed")
+        context = JobContext(self, job.id, job.user_id, job.attempts)
+        payload = json.loads(job.payload or "{}")
+        span, token = tracer.start_span(f"job {job.job_type}", parent=payload.pop("_trace", None), kind="consumer",
+                                        **{"job.id": job.id, "job.attempt": job.attempts})
+        try:
+            # LLM spend of a job counts against the budget of the user who queued it
+            with sampling_profiler.profile(f"job:{job.job_type}"), usage_budget.account_for_user(job.user_id):
+                result = handler["func"](payload, context)
+            if self.is_cancel_requested(job.id):
+                raise JobCancelled(job.id)
+            with tracer.span("db.finish_job"):
+                self._finish(job.id, status="succeeded", result=json.dumps(result, default=str),
+                             error=None, finished_at=datetime.now())
+            self._count("succeeded")
+        except JobCancelled:
+            self._finish(job.id, status="cancelled", finished_at=datetime.now())
+            self._count("cancelled")
+        except Exception as e:
+            span.record_exception(e)
+            db.session.rollback()
+            logging.error(f"Job {job.id} ({job.job_type}) attempt {job.attempts} failed: {str(e)}")
+            if job.attempts < job.max_attempts:
+                backoff = min(60, 2 ** job.attempts)
+                self._finish(job.id, status="queued", error=str(e),
+                             available_at=datetime.now() + timedelta(seconds=backoff))
+                self._count("retried")
+            else:
+                self._finish(job.id, status="failed", error=str(e), finished_at=datetime.now())
+                self._count("failed")
+        finally:
+            tracer.end_span(span, token)
+            with self._running_lock:
+                self._running.discard(job.id)
+            db.session.remove()
+
+    def _heartbeat_loop(self):
+        """Extend leases of jobs running in this process"""
+        from app import app, db
+        from models import BackgroundJob
+
+        table = BackgroundJob.__table__
+        while True:
+            time.sleep(max(1.0, self.lease_seconds / 3))
+            with self._running_lock:
+                running = list(self._running)
+            if not running:
+                continue
+            try:
+                with app.app_context():
+                    with db.engine.begin() as conn:
+                        conn.execute(update(table).where(
+                            table.c.id.in_(running),
+                            table.c.lease_owner == self.owner
+                        ).values(lease_expires_at=datetime.now() + timedelta(seconds=self.lease_seconds)))
+            except Exception as e:
+                logging.error(f"Job lease heartbeat failed: {str(e)}")
+
+    def _count(self, key: str):
+        with self._running_lock:
+            self.stats[key] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth by status plus this process's worker counters"""
+        from app import db
+        from models import BackgroundJob
+
+        by_status = dict(db.session.query(
+            BackgroundJob.status, db.func.count(BackgroundJob.id)
+        ).group_by(BackgroundJob.status).all())
+        with self._running_lock:
+            stats = dict(self.stats)
+            stats["running_here"] = len(self._running)
+        return {"workers": self.worker_count, "by_status": by_status, **stats}
+
+# Global job queue
+job_queue = JobQueue()
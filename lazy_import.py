@@ -0,0 +1,14 @@
+"""
+Lazy Import - OperatorOS
+Proxies for subsystem singletons so their modules (and the SDKs they pull in) load on first use
+"""
+
+from importlib import import_module
+from werkzeug.local import LocalProxy
+
+def lazy_singleton(module_name: str, attribute: str) -> LocalProxy:
+    """
+    Stand-in for `from module_name import attribute`
+    The module is imported the first time the proxy is used; later uses are a sys.modules lookup.
+    """
+    return LocalProxy(lambda: getattr(import_module(module_name), attribute))
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Load test for the gunicorn worker model
+Starts gunicorn with gunicorn.conf.py against a stub OpenAI-compatible provider with a fixed
+latency, fires concurrent authenticated /ai_chat requests and reports how many LLM calls were
+in flight at once, request latency, and peak server RSS (concurrent requests per GB of RAM).
+The server runs with the shipped thread, pool, rate-limit and concurrency defaults; set
+AI_RATE_LIMITS to the account's real limits so local throttling matches production.
+
+    python load_test.py --concurrency 64 --requests 256 --llm-latency 5
+    GUNICORN_WORKER_CLASS=sync GUNICORN_WORKERS=4 python load_test.py   # baseline
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+sys.path.append('.')
+
+class StubProvider(BaseHTTPRequestHandler):
+    """Chat completions endpoint that sleeps like a slow LLM and counts calls in flight"""
+    protocol_version = "HTTP/1.1"
+    latency = 5.0
+    in_flight = 0
+    peak_in_flight = 0
+    calls = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.calls += 1
+            cls.peak_in_flight = max(cls.peak_in_flight, cls.in_flight)
+        try:
+            time.sleep(cls.latency)
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+        body = json.dumps({
+            "id": "load-test", "object": "chat.completion", "created": int(time.time()), "model": "gpt-4o",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "Load test response."}}],
+            "usage": {"prompt_tokens": 20, "completion_tokens": 5, "total_tokens": 25}
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def prepare_session(env: dict) -> str:
+    """Create a load-test user with a non-expiring token and return a signed session cookie"""
+    os.environ.update(env)
+    from app import app, db, init_db
+    from models import User, OAuth
+
+    init_db()
+    browser_session_key = "load-test-session"
+    with app.app_context():
+        if db.session.get(User, "load-test-user") is None:
+            db.session.add(User(id="load-test-user", email="load-test@example.com", first_name="Load"))
+        db.session.query(OAuth).filter_by(user_id="load-test-user").delete()
+        db.session.add(OAuth(
+            user_id="load-test-user", browser_session_key=browser_session_key, provider="replit_auth",
+            token={"access_token": "load-test", "token_type": "Bearer",
+                   "expires_in": 86400, "expires_at": time.time() + 86400}
+        ))
+        db.session.commit()
+        serializer = app.session_interface.get_signing_serializer(app)
+        cookie = serializer.dumps({"_user_id": "load-test-user", "_fresh": True,
+                                   "_browser_session_key": browser_session_key})
+    return f"{app.config['SESSION_COOKIE_NAME']}={cookie}"
+
+def process_tree_rss_mb(root_pid: int) -> float:
+    """Resident memory of a process and its direct children, from /proc"""
+    total_kb = 0
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            if int(entry) != root_pid and ppid != root_pid:
+                continue
+            with open(f"/proc/{entry}/status") as f:
+                total_kb += next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        except (OSError, StopIteration, ValueError, IndexError):
+            continue
+    return total_kb / 1024
+
+def wait_for_server(base_url: str, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(base_url + "/pricing", timeout=2)
+            return
+        except Exception:
+            time.sleep(0.5)
+    raise RuntimeError(f"Server at {base_url} did not start within {timeout}s")
+
+def run(args) -> dict:
+    StubProvider.latency = args.llm_latency
+    stub = ThreadingHTTPServer(("127.0.0.1", free_port()), StubProvider)
+    stub.daemon_threads = True
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    port = free_port()
+    env = {
+        "DATABASE_URL": os.environ.get("DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp()}/load_test.db",
+        "SESSION_SECRET": os.environ.get("SESSION_SECRET") or "load-test-secret",
+        "REPL_ID": os.environ.get("REPL_ID") or "load-test",
+        "OPENAI_API_KEY": "load-test",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{stub.server_address[1]}/v1",
+        "PORT": str(port),
+        # Background work would call the stub too and skew the counts; client-side limits stay on
+        "BOOTSTRAP_ENABLED": "false",
+        "JOB_WORKERS_ENABLED": "false",
+        "AUTOMATION_SCHEDULER_ENABLED": "false",
+        "METRICS_ROLLUP_ENABLED": "false"
+    }
+    cookie = prepare_session(env)
+
+    server_env = {key: value for key, value in os.environ.items()
+                  if key not in ("ANTHROPIC_API_KEY", "XAI_API_KEY")}
+    server_env.update(env)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"],
+        env=server_env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL if not args.verbose else None
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    peak_rss = {"mb": 0.0}
+    sampling = threading.Event()
+
+    def sample_rss():
+        while not sampling.is_set():
+            peak_rss["mb"] = max(peak_rss["mb"], process_tree_rss_mb(server.pid))
+            time.sleep(0.2)
+
+    def request(index: int) -> tuple:
+        data = urllib.parse.urlencode({"prompt": f"Load test prompt {index}", "provider": "openai"}).encode()
+        req = urllib.request.Request(base_url + "/ai_chat", data=data, headers={"Cookie": cookie})
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=args.llm_latency * 20 + 60) as response:
+                ok = json.loads(response.read()).get("success", False)
+        except Exception:
+            ok = False
+        return ok, time.perf_counter() - start
+
+    try:
+        wait_for_server(base_url)
+        idle_rss = process_tree_rss_mb(server.pid)
+        threading.Thread(target=sample_rss, daemon=True).start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(request, range(args.requests)))
+        wall = time.perf_counter() - start
+    finally:
+        sampling.set()
+        server.terminate()
+        server.wait(timeout=30)
+        stub.shutdown()
+
+    latencies = sorted(latency for _, latency in results)
+    succeeded = sum(1 for ok, _ in results if ok)
+    peak_gb = peak_rss["mb"] / 1024
+    return {
+        "worker_class": os.environ.get("GUNICORN_WORKER_CLASS", "gthread"),
+        "requests": args.requests,
+        "succeeded": succeeded,
+        "client_concurrency": args.concurrency,
+        "llm_latency_s": args.llm_latency,
+        "wall_s": round(wall, 2),
+        "throughput_rps": round(succeeded / wall, 2) if wall else 0.0,
+        "latency_p50_s": round(latencies[len(latencies) // 2], 2),
+        "latency_p95_s": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+        "peak_llm_calls_in_flight": StubProvider.peak_in_flight,
+        "idle_rss_mb": round(idle_rss, 1),
+        "peak_rss_mb": round(peak_rss["mb"], 1),
+        "concurrent_requests_per_gb": round(StubProvider.peak_in_flight / peak_gb, 1) if peak_gb else 0.0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=64, help="simultaneous client requests")
+    parser.add_argument("--requests", type=int, default=256, help="total requests")
+    parser.add_argument("--llm-latency", type=float, default=5.0, help="seconds the stub provider takes per call")
+    parser.add_argument("--verbose", action="store_true", help="show gunicorn's log output")
+    args = parser.parse_args()
+
+    print("=== LOAD TEST ===")
+    for key, value in run(args).items():
+        print(f"   {key:<28} {value}")
+
+if __name__ == "__main__":
+    main()
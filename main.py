@@ -1,5 +1,13 @@
+import os
 from app import app
 import routes  # noqa: F401
+from bootstrap import bootstrap
+
+# Create default data in the background as soon as the app loads, not on a user request.
+# Under gunicorn the post_fork hook in gunicorn.conf.py starts it in each worker instead,
+# so a preloading master never forks while the bootstrap thread is running.
+if not os.environ.get("SERVER_SOFTWARE", "").startswith("gunicorn"):
+    bootstrap.ensure_started()
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
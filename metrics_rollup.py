@@ -0,0 +1,537 @@
+"""
+Metrics Rollup - OperatorOS
+Compacts SystemMetrics into minute/hour/day aggregates with percentile sketches and applies retention
+"""
+
+import os
+import json
+import math
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+
+TIER_WIDTHS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1)
+}
+SOURCE_TIER = {"hour": "minute", "day": "hour"}
+COARSEST_FIRST = ("day", "hour", "minute")
+# Watermark row holding the earliest raw timestamp written behind the minute watermark
+LATE_MARKER = "late"
+
+class ValueSketch:
+    """Mergeable log-bucket histogram giving percentiles within a fixed relative error"""
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero = 0
+
+    @property
+    def count(self) -> int:
+        return self.zero + sum(self.positive.values()) + sum(self.negative.values())
+
+    def _index(self, magnitude: float) -> int:
+        return int(math.ceil(math.log(magnitude) / self._log_gamma))
+
+    def _value(self, index: int) -> float:
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value: float, count: int = 1):
+        if value > 1e-12:
+            index = self._index(value)
+            self.positive[index] = self.positive.get(index, 0) + count
+        elif value < -1e-12:
+            index = self._index(-value)
+            self.negative[index] = self.negative.get(index, 0) + count
+        else:
+            self.zero += count
+
+    def merge(self, other: "ValueSketch"):
+        for index, count in other.positive.items():
+            self.positive[index] = self.positive.get(index, 0) + count
+        for index, count in other.negative.items():
+            self.negative[index] = self.negative.get(index, 0) + count
+        self.zero += other.zero
+
+    def quantile(self, q: float) -> Optional[float]:
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return -self._value(index)
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return self._value(index)
+        return self._value(max(self.positive)) if self.positive else 0.0
+
+    def to_json(self) -> str:
+        return json.dumps({"p": self.positive, "n": self.negative, "z": self.zero}, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: Optional[str]) -> "ValueSketch":
+        sketch = cls()
+        if data:
+            raw = json.loads(data)
+            sketch.positive = {int(k): v for k, v in raw.get("p", {}).items()}
+            sketch.negative = {int(k): v for k, v in raw.get("n", {}).items()}
+            sketch.zero = raw.get("z", 0)
+        return sketch
+
+class _Aggregate:
+    """Running count/sum/min/max plus sketch for one rollup bucket"""
+
+    __slots__ = ("count", "total", "minimum", "maximum", "sketch")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.sketch = ValueSketch()
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+        self.sketch.add(value)
+
+    def merge(self, count: int, total: float, minimum: float, maximum: float, sketch: ValueSketch):
+        self.count += count
+        self.total += total
+        if minimum is not None:
+            self.minimum = minimum if self.minimum is None else min(self.minimum, minimum)
+        if maximum is not None:
+            self.maximum = maximum if self.maximum is None else max(self.maximum, maximum)
+        self.sketch.merge(sketch)
+
+def floor_to_tier(timestamp: datetime, tier: str) -> datetime:
+    """Start of the tier bucket containing `timestamp`"""
+    if tier == "minute":
+        return timestamp.replace(second=0, microsecond=0)
+    if tier == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+class MetricsRollupEngine:
+    """
+    Builds rollup tiers from raw SystemMetrics and answers aggregate queries from the
+    coarsest tier that covers each part of the requested range
+    Raw rows are rolled into minutes once they are older than the settle delay, so late
+    writes from the buffered metrics writer are still counted. Hours are built from
+    minutes and days from hours. Precision beyond a tier's retention drops to the
+    next coarser tier's granularity. Spooled rows replayed after an outage can land behind the
+    watermark; the writer records the earliest such timestamp, and the next run rewinds every
+    tier to it and rebuilds from raw rows.
+    """
+
+    def __init__(self):
+        self.settle_seconds = int(os.environ.get('METRICS_ROLLUP_SETTLE_SECONDS', '120'))
+        self.interval = float(os.environ.get('METRICS_ROLLUP_INTERVAL', '60'))
+        self.enabled = os.environ.get('METRICS_ROLLUP_ENABLED', 'true').lower() == 'true'
+        self.retention = {
+            "raw": timedelta(days=float(os.environ.get('METRICS_RAW_RETENTION_DAYS', '2'))),
+            # Rollups drop entity_id, so per-entity lookups (template usage, process activity) read raw rows
+            "entity": timedelta(days=float(os.environ.get('METRICS_ENTITY_RETENTION_DAYS', '365'))),
+            "minute": timedelta(days=float(os.environ.get('METRICS_MINUTE_RETENTION_DAYS', '14'))),
+            "hour": timedelta(days=float(os.environ.get('METRICS_HOUR_RETENTION_DAYS', '90')))
+        }
+        self.chunk = timedelta(hours=1)
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self.last_run: Dict[str, Any] = {}
+
+    def ensure_started(self):
+        """Start the periodic rollup thread in this process (restarting it after fork)"""
+        if not self.enabled:
+            return
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="metrics-rollup", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.run_once()
+            except Exception as e:
+                logging.error(f"Metrics rollup failed: {str(e)}")
+
+    def run_once(self, now: datetime = None) -> Dict[str, Any]:
+        """Roll up all tiers and apply retention; only one process does this at a time"""
+        from app import app, db
+        from process_lock import try_lock
+
+        now = now or datetime.now()
+        with app.app_context():
+            with try_lock("metrics_rollup", db.engine) as acquired:
+                if not acquired:
+                    return {"skipped": True}
+
+                start = time.perf_counter()
+                result = {
+                    "reopened": self._reopen_late(now),
+                    "minute": self._rollup_raw(now),
+                    "hour": self._rollup_tier("hour"),
+                    "day": self._rollup_tier("day"),
+                    "deleted": self._apply_retention(now)
+                }
+                result["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+                result["ran_at"] = now.isoformat()
+                self.last_run = result
+                return result
+
+    def get_watermark(self, tier: str) -> Optional[datetime]:
+        from models import MetricRollupWatermark
+        state = MetricRollupWatermark.query.get(tier)
+        return state.watermark if state else None
+
+    def _set_watermark(self, tier: str, watermark: datetime):
+        from app import db
+        from models import MetricRollupWatermark
+        state = MetricRollupWatermark.query.get(tier)
+        if state:
+            state.watermark = watermark
+        else:
+            db.session.add(MetricRollupWatermark(tier=tier, watermark=watermark))
+
+    def note_late(self, earliest: datetime) -> bool:
+        """Record raw rows written at or after `earliest` so already rolled-up minutes are rebuilt"""
+        from app import app, db
+        from models import MetricRollupWatermark
+        from sqlalchemy.exc import IntegrityError
+
+        table = MetricRollupWatermark.__table__
+        with app.app_context():
+            with db.engine.begin() as conn:
+                watermark = conn.execute(
+                    table.select().with_only_columns(table.c.watermark).where(table.c.tier == "minute")
+                ).scalar()
+            if watermark is None or earliest >= watermark:
+                return False
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(table.insert().values(tier=LATE_MARKER, watermark=earliest))
+            except IntegrityError:
+                # Only ever move the marker earlier
+                with db.engine.begin() as conn:
+                    conn.execute(table.update().where(
+                        table.c.tier == LATE_MARKER, table.c.watermark > earliest
+                    ).values(watermark=earliest))
+        return True
+
+    def _reopen_late(self, now: datetime) -> Optional[str]:
+        """Rewind every tier past the earliest late raw row and drop its buckets so they are rebuilt"""
+        from app import db
+        from models import MetricRollup, MetricRollupWatermark
+
+        state = MetricRollupWatermark.query.get(LATE_MARKER)
+        if state is None:
+            return None
+        marker = state.watermark
+        start = floor_to_tier(marker, "minute")
+        # Older raw rows may already be pruned, so minutes before this cannot be rebuilt exactly
+        oldest_complete = floor_to_tier(now - self.retention["raw"], "minute") + TIER_WIDTHS["minute"]
+        if start < oldest_complete:
+            logging.warning(f"Late metrics from {start.isoformat()} are older than raw retention; "
+                            f"rebuilding from {oldest_complete.isoformat()}")
+            start = oldest_complete
+
+        for tier in ("minute", "hour", "day"):
+            watermark = self.get_watermark(tier)
+            tier_start = floor_to_tier(start, tier)
+            if watermark is None or tier_start >= watermark:
+                continue
+            MetricRollup.query.filter(
+                MetricRollup.tier == tier,
+                MetricRollup.bucket_start >= tier_start
+            ).delete(synchronize_session=False)
+            self._set_watermark(tier, tier_start)
+
+        # A marker moved earlier by a concurrent replay survives for the next run
+        MetricRollupWatermark.query.filter_by(tier=LATE_MARKER, watermark=marker).delete(synchronize_session=False)
+        db.session.commit()
+        return start.isoformat()
+
+    def _write_buckets(self, tier: str, buckets: Dict[Tuple, _Aggregate]):
+        from app import db
+        from models import MetricRollup
+
+        if not buckets:
+            return
+        db.session.execute(MetricRollup.__table__.insert(), [
+            {
+                "tier": tier,
+                "bucket_start": bucket_start,
+                "metric_type": metric_type,
+                "entity_type": entity_type,
+                "provider": provider,
+                "count": aggregate.count,
+                "value_sum": aggregate.total,
+                "value_min": aggregate.minimum,
+                "value_max": aggregate.maximum,
+                "sketch": aggregate.sketch.to_json()
+            }
+            for (bucket_start, metric_type, entity_type, provider), aggregate in buckets.items()
+        ])
+
+    def _rollup_raw(self, now: datetime) -> int:
+        """Aggregate settled raw rows into minute buckets, one chunk per transaction"""
+        from app import db
+        from models import SystemMetrics
+
+        end = floor_to_tier(now - timedelta(seconds=self.settle_seconds), "minute")
+        watermark = self.get_watermark("minute")
+        if watermark is None:
+            oldest = db.session.query(db.func.min(SystemMetrics.timestamp)).scalar()
+            watermark = floor_to_tier(oldest, "minute") if oldest else end
+
+        written = 0
+        while watermark < end:
+            chunk_end = min(end, watermark + self.chunk)
+            buckets: Dict[Tuple, _Aggregate] = {}
+            rows = db.session.query(
+                SystemMetrics.timestamp, SystemMetrics.metric_type, SystemMetrics.entity_type,
+                SystemMetrics.provider, SystemMetrics.value
+            ).filter(
+                SystemMetrics.timestamp >= watermark,
+                SystemMetrics.timestamp < chunk_end
+            ).yield_per(5000)
+
+            for timestamp, metric_type, entity_type, provider, value in rows:
+                key = (floor_to_tier(timestamp, "minute"), metric_type, entity_type or "", provider or "")
+                aggregate = buckets.get(key)
+                if aggregate is None:
+                    aggregate = buckets[key] = _Aggregate()
+                aggregate.add(value)
+
+            self._write_buckets("minute", buckets)
+            self._set_watermark("minute", chunk_end)
+            db.session.commit()
+            written += len(buckets)
+            watermark = chunk_end
+        return written
+
+    def _rollup_tier(self, tier: str) -> int:
+        """Merge complete source-tier buckets into this tier"""
+        from app import db
+        from models import MetricRollup
+
+        source = SOURCE_TIER[tier]
+        source_watermark = self.get_watermark(source)
+        if source_watermark is None:
+            return 0
+        end = floor_to_tier(source_watermark, tier)
+        watermark = self.get_watermark(tier)
+        if watermark is None:
+            oldest = db.session.query(db.func.min(MetricRollup.bucket_start)).filter(
+                MetricRollup.tier == source
+            ).scalar()
+            watermark = floor_to_tier(oldest, tier) if oldest else end
+
+        written = 0
+        step = TIER_WIDTHS[tier] if tier == "day" else self.chunk
+        while watermark < end:
+            chunk_end = min(end, watermark + step)
+            buckets: Dict[Tuple, _Aggregate] = {}
+            rows = MetricRollup.query.filter(
+                MetricRollup.tier == source,
+                MetricRollup.bucket_start >= watermark,
+                MetricRollup.bucket_start < chunk_end
+            ).yield_per(5000)
+
+            for row in rows:
+                key = (floor_to_tier(row.bucket_start, tier), row.metric_type, row.entity_type, row.provider)
+                aggregate = buckets.get(key)
+                if aggregate is None:
+                    aggregate = buckets[key] = _Aggregate()
+                aggregate.merge(row.count, row.value_sum, row.value_min, row.value_max,
+                                ValueSketch.from_json(row.sketch))
+
+            self._write_buckets(tier, buckets)
+            self._set_watermark(tier, chunk_end)
+            db.session.commit()
+            written += len(buckets)
+            watermark = chunk_end
+        return written
+
+    def _apply_retention(self, now: datetime) -> Dict[str, int]:
+        """Delete raw rows and fine tiers past retention, never beyond what is rolled up"""
+        from app import db
+        from models import SystemMetrics, MetricRollup
+
+        deleted = {}
+        minute_watermark = self.get_watermark("minute")
+        if minute_watermark:
+            cutoff = min(now - self.retention["raw"], minute_watermark)
+            deleted["raw"] = SystemMetrics.query.filter(
+                SystemMetrics.timestamp < cutoff,
+                db.or_(SystemMetrics.entity_id.is_(None), SystemMetrics.timestamp < now - self.retention["entity"])
+            ).delete(synchronize_session=False)
+
+        for tier, covering in (("minute", "hour"), ("hour", "day")):
+            covering_watermark = self.get_watermark(covering)
+            if not covering_watermark:
+                continue
+            cutoff = min(now - self.retention[tier], covering_watermark)
+            deleted[tier] = MetricRollup.query.filter(
+                MetricRollup.tier == tier,
+                MetricRollup.bucket_start < cutoff
+            ).delete(synchronize_session=False)
+
+        db.session.commit()
+        return deleted
+
+    def plan(self, start: datetime, end: datetime) -> List[Tuple[str, datetime, datetime]]:
+        """Cover [start, end) with the coarsest rolled-up buckets, using raw rows for the rest"""
+        watermarks = {tier: self.get_watermark(tier) for tier in TIER_WIDTHS}
+        segments: List[Tuple[str, datetime, datetime]] = []
+        cursor = start
+        while cursor < end:
+            for index, tier in enumerate(COARSEST_FIRST):
+                width = TIER_WIDTHS[tier]
+                limit = min(end, watermarks[tier]) if watermarks[tier] else None
+                if limit and floor_to_tier(cursor, tier) == cursor and cursor + width <= limit:
+                    if index > 0:
+                        # Stop at the next coarser boundary so the coarser tier can take over there
+                        coarser = COARSEST_FIRST[index - 1]
+                        limit = min(limit, floor_to_tier(cursor, coarser) + TIER_WIDTHS[coarser])
+                    segment_end = cursor + ((limit - cursor) // width) * width
+                    break
+            else:
+                tier = "raw"
+                minute_watermark = watermarks["minute"]
+                if minute_watermark and cursor < minute_watermark:
+                    segment_end = min(end, floor_to_tier(cursor, "minute") + TIER_WIDTHS["minute"])
+                else:
+                    segment_end = end
+
+            if segments and segments[-1][0] == tier and segments[-1][2] == cursor:
+                segments[-1] = (tier, segments[-1][1], segment_end)
+            else:
+                segments.append((tier, cursor, segment_end))
+            cursor = segment_end
+        return segments
+
+    def aggregate(self, metric_type: str, start: datetime, end: datetime = None,
+                  entity_type: str = None, provider: str = None,
+                  percentiles: Iterable[float] = ()) -> Dict[str, Any]:
+        """Count, sum, min, max, mean and optional percentiles of a metric over [start, end)"""
+        from app import db
+        from models import SystemMetrics, MetricRollup
+
+        end = end or datetime.now()
+        percentiles = tuple(percentiles)
+        result = _Aggregate()
+        segments = self.plan(start, end)
+
+        for tier, segment_start, segment_end in segments:
+            if tier == "raw":
+                filters = [
+                    SystemMetrics.metric_type == metric_type,
+                    SystemMetrics.timestamp >= segment_start,
+                    SystemMetrics.timestamp < segment_end
+                ]
+                if entity_type is not None:
+                    filters.append(SystemMetrics.entity_type == entity_type)
+                if provider is not None:
+                    filters.append(SystemMetrics.provider == provider)
+
+                if percentiles:
+                    for (value,) in db.session.query(SystemMetrics.value).filter(*filters):
+                        result.add(value)
+                else:
+                    count, total, minimum, maximum = db.session.query(
+                        db.func.count(SystemMetrics.id), db.func.sum(SystemMetrics.value),
+                        db.func.min(SystemMetrics.value), db.func.max(SystemMetrics.value)
+                    ).filter(*filters).one()
+                    result.merge(count or 0, total or 0.0, minimum, maximum, ValueSketch())
+                continue
+
+            filters = [
+                MetricRollup.tier == tier,
+                MetricRollup.metric_type == metric_type,
+                MetricRollup.bucket_start >= segment_start,
+                MetricRollup.bucket_start < segment_end
+            ]
+            if entity_type is not None:
+                filters.append(MetricRollup.entity_type == entity_type)
+            if provider is not None:
+                filters.append(MetricRollup.provider == provider)
+
+            if percentiles:
+                for row in MetricRollup.query.filter(*filters):
+                    result.merge(row.count, row.value_sum, row.value_min, row.value_max,
+                                 ValueSketch.from_json(row.sketch))
+            else:
+                count, total, minimum, maximum = db.session.query(
+                    db.func.sum(MetricRollup.count), db.func.sum(MetricRollup.value_sum),
+                    db.func.min(MetricRollup.value_min), db.func.max(MetricRollup.value_max)
+                ).filter(*filters).one()
+                result.merge(count or 0, total or 0.0, minimum, maximum, ValueSketch())
+
+        summary = {
+            "count": result.count,
+            "sum": result.total,
+            "min": result.minimum,
+            "max": result.maximum,
+            "mean": (result.total / result.count) if result.count else None,
+            "tiers": [tier for tier, _, _ in segments]
+        }
+        for q in percentiles:
+            summary[f"p{int(round(q * 100))}"] = result.sketch.quantile(q)
+        return summary
+
+    def count_by_metric_type(self, start: datetime, end: datetime = None,
+                             entity_type: str = None) -> Dict[str, int]:
+        """Event counts per metric type over [start, end), served from rollups where possible"""
+        from app import db
+        from models import SystemMetrics, MetricRollup
+
+        end = end or datetime.now()
+        counts: Dict[str, int] = {}
+        for tier, segment_start, segment_end in self.plan(start, end):
+            if tier == "raw":
+                query = db.session.query(SystemMetrics.metric_type, db.func.count(SystemMetrics.id)).filter(
+                    SystemMetrics.timestamp >= segment_start, SystemMetrics.timestamp < segment_end
+                )
+                if entity_type is not None:
+                    query = query.filter(SystemMetrics.entity_type == entity_type)
+                rows = query.group_by(SystemMetrics.metric_type)
+            else:
+                query = db.session.query(MetricRollup.metric_type, db.func.sum(MetricRollup.count)).filter(
+                    MetricRollup.tier == tier,
+                    MetricRollup.bucket_start >= segment_start,
+                    MetricRollup.bucket_start < segment_end
+                )
+                if entity_type is not None:
+                    query = query.filter(MetricRollup.entity_type == entity_type)
+                rows = query.group_by(MetricRollup.metric_type)
+
+            for metric_type, count in rows:
+                counts[metric_type] = counts.get(metric_type, 0) + int(count or 0)
+        return counts
+
+# Global metrics rollup engine
+metrics_rollup = MetricsRollupEngine()
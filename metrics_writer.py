@@ -0,0 +1,258 @@
+"""
+Metrics Writer - OperatorOS
+Buffered SystemMetrics writer: in-memory queue, background bulk inserts and a bounded disk spool
+"""
+
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import tempfile
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+class MetricsWriter:
+    """
+    Queues metric events and writes them in bulk INSERT batches on a background thread
+    Writes use their own engine connection, so a metrics failure never touches the caller's
+    session. Batches that fail to insert go to a bounded JSONL spool and are replayed on
+    the next successful flush.
+    """
+
+    def __init__(self, batch_size: int = None, flush_interval: float = None,
+                 max_queue: int = None, spool_dir: str = None, spool_max_bytes: int = None):
+        self.batch_size = batch_size or int(os.environ.get('METRICS_BATCH_SIZE', '200'))
+        self.flush_interval = flush_interval or float(os.environ.get('METRICS_FLUSH_INTERVAL', '2'))
+        self.max_queue = max_queue or int(os.environ.get('METRICS_MAX_QUEUE', '10000'))
+        self.spool_dir = spool_dir or os.environ.get(
+            'METRICS_SPOOL_DIR', os.path.join(tempfile.gettempdir(), 'operatoros_metrics_spool')
+        )
+        self.spool_max_bytes = spool_max_bytes or int(os.environ.get('METRICS_SPOOL_MAX_BYTES', str(10 * 1024 * 1024)))
+
+        self._queue: queue.Queue = queue.Queue(maxsize=self.max_queue)
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._columns = None
+
+        self.stats = {
+            "enqueued": 0,
+            "written": 0,
+            "dropped": 0,
+            "spooled": 0,
+            "replayed": 0,
+            "flushes": 0,
+            "failed_flushes": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0
+        }
+        atexit.register(self.flush)
+
+    def record(self, metric_type: str, value: float = 1.0, additional_data: str = None,
+               timestamp: datetime = None, **columns):
+        """Enqueue a metric event; never blocks and never raises into the caller"""
+        event = {
+            "metric_type": metric_type,
+            "value": value,
+            "timestamp": timestamp or datetime.now(),
+            "additional_data": additional_data,
+            **columns
+        }
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(event)
+            self._count("enqueued")
+        except queue.Full:
+            self._count("dropped")
+            return
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def _ensure_worker(self):
+        """Start the flush thread, restarting it in forked worker processes"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                # Forked worker: the parent's queue and flush lock belong to the parent
+                self._queue = queue.Queue(maxsize=self.max_queue)
+                self._flush_lock = threading.Lock()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Metrics flush loop error: {str(e)}")
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self):
+        """Write everything queued so far, batch by batch"""
+        with self._flush_lock:
+            if self._queue.empty():
+                self._replay_spool()
+                return
+            while True:
+                batch = self._drain()
+                if not batch:
+                    break
+                if self._write_batch(batch):
+                    self._replay_spool()
+                else:
+                    self._spool(batch)
+
+    def _table_columns(self):
+        if self._columns is None:
+            from models import SystemMetrics
+            self._columns = {column.name for column in SystemMetrics.__table__.columns} - {"id"}
+        return self._columns
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> bool:
+        """Bulk insert a batch on a dedicated connection; returns False on failure"""
+        from app import app, db
+        from models import SystemMetrics
+
+        columns = self._table_columns()
+        rows = [{k: v for k, v in event.items() if k in columns} for event in batch]
+
+        start = time.perf_counter()
+        try:
+            with app.app_context():
+                with db.engine.begin() as conn:
+                    conn.execute(SystemMetrics.__table__.insert(), rows)
+        except Exception as e:
+            logging.error(f"Metrics batch insert failed ({len(rows)} rows): {str(e)}")
+            self._count("failed_flushes")
+            return False
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self.stats["written"] += len(rows)
+            self.stats["flushes"] += 1
+            self.stats["last_flush_ms"] = round(elapsed_ms, 2)
+            self.stats["max_flush_ms"] = round(max(self.stats["max_flush_ms"], elapsed_ms), 2)
+            self.stats["total_flush_ms"] += elapsed_ms
+        return True
+
+    def _spool_path(self, pid: int = None) -> str:
+        return os.path.join(self.spool_dir, f"metrics_{pid or os.getpid()}.jsonl")
+
+    def _spool(self, batch: List[Dict[str, Any]]):
+        """Append a failed batch to this process's spool file, dropping it if the spool is full"""
+        try:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            path = self._spool_path()
+            lines = "".join(json.dumps(event, default=str) + "\n" for event in batch)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if size + len(lines) > self.spool_max_bytes:
+                logging.warning(f"Metrics spool full, dropping {len(batch)} events")
+                self._count("dropped", len(batch))
+                return
+            with open(path, "a") as spool_file:
+                spool_file.write(lines)
+            self._count("spooled", len(batch))
+        except OSError as e:
+            logging.error(f"Metrics spool write failed: {str(e)}")
+            self._count("dropped", len(batch))
+
+    def _replayable_spools(self) -> List[str]:
+        """This process's spool plus spools left behind by dead processes"""
+        if not os.path.isdir(self.spool_dir):
+            return []
+        paths = []
+        for name in os.listdir(self.spool_dir):
+            if not (name.startswith("metrics_") and name.endswith(".jsonl")):
+                continue
+            try:
+                pid = int(name[len("metrics_"):-len(".jsonl")])
+            except ValueError:
+                continue
+            if pid != os.getpid():
+                try:
+                    os.kill(pid, 0)
+                    continue
+                except ProcessLookupError:
+                    pass
+                except PermissionError:
+                    continue
+            paths.append(os.path.join(self.spool_dir, name))
+        return paths
+
+    def _replay_spool(self):
+        """Insert spooled events once the database is reachable again"""
+        for path in self._replayable_spools():
+            claimed = f"{path}.replaying"
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue
+
+            with open(claimed) as spool_file:
+                events = []
+                for line in spool_file:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    event["timestamp"] = datetime.fromisoformat(event["timestamp"])
+                    events.append(event)
+
+            earliest = None
+            for start in range(0, len(events), self.batch_size):
+                batch = events[start:start + self.batch_size]
+                if self._write_batch(batch):
+                    self._count("replayed", len(batch))
+                    batch_earliest = min(event["timestamp"] for event in batch)
+                    earliest = batch_earliest if earliest is None else min(earliest, batch_earliest)
+                else:
+                    self._spool(events[start:])
+                    break
+            os.remove(claimed)
+            if earliest is not None:
+                self._note_late(earliest)
+
+    def _note_late(self, earliest: datetime):
+        """Have the rollup rebuild minutes that replayed events landed behind"""
+        from metrics_rollup import metrics_rollup
+        try:
+            metrics_rollup.note_late(earliest)
+        except Exception as e:
+            logging.error(f"Recording late metrics failed: {str(e)}")
+
+    def _count(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth, throughput, flush latency and drop counts"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        flushes = stats.pop("total_flush_ms")
+        stats["avg_flush_ms"] = round(flushes / stats["flushes"], 2) if stats["flushes"] else 0.0
+        stats["queue_depth"] = self._queue.qsize()
+        return stats
+
+# Global metrics writer
+metrics_writer = MetricsWriter()
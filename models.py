@@ -1,8 +1,10 @@
 from datetime import datetime
+from typing import Optional
 from app import db
 from flask_dance.consumer.storage.sqla import OAuthConsumerMixin
 from flask_login import UserMixin
 from sqlalchemy import UniqueConstraint
+from text_compression import CompressedText
 
 # User model for Replit Auth
 class User(UserMixin, db.Model):
@@ -58,13 +60,39 @@ class AIConversation(db.Model):
     user_id = db.Column(db.String, db.ForeignKey(User.id), nullable=False)
     provider = db.Column(db.String(50), nullable=False)  # openai, anthropic, grok
     model = db.Column(db.String(100), nullable=False)
-    prompt = db.Column(db.Text, nullable=False)
-    response = db.Column(db.Text, nullable=False)
+    # Deferred so analytics scans over conversations don't load the text
+    prompt = db.deferred(db.Column(db.Text, nullable=False))
+    response = db.deferred(db.Column(db.Text, nullable=False))
     tokens_used = db.Column(db.Integer)
     cost = db.Column(db.Float)
     clarity_rating = db.Column(db.Integer)  # 1-5 stars
     created_at = db.Column(db.DateTime, default=datetime.now)
     user = db.relationship(User, backref='conversations')
+    # Full text of long prompts/responses lives in AIConversationContent; prompt/response hold previews
+    content = db.relationship('AIConversationContent', uselist=False, lazy='select')
+    
+    @property
+    def full_prompt(self) -> str:
+        return self.content.prompt_text if self.content else self.prompt
+    
+    @property
+    def full_response(self) -> str:
+        return self.content.response_text if self.content else self.response
+
+# Compressed full text of AI conversations, kept out of the hot conversation table
+class AIConversationContent(db.Model):
+    conversation_id = db.Column(db.Integer, db.ForeignKey(AIConversation.id, ondelete='CASCADE'), primary_key=True)
+    prompt_text = db.Column('prompt_compressed', CompressedText, nullable=False)
+    response_text = db.Column('response_compressed', CompressedText, nullable=False)
+
+# Trained zstd dictionaries; compressed values reference the one they were written with
+class CompressionDictionary(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    algorithm = db.Column(db.String(20), nullable=False, default='zstd')
+    dict_data = db.Column(db.LargeBinary, nullable=False)
+    sample_count = db.Column(db.Integer)
+    active = db.Column(db.Boolean, default=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.now)
 
 # Business automation model
 class BusinessProcess(db.Model):
@@ -75,6 +103,15 @@ class BusinessProcess(db.Model):
     status = db.Column(db.String(50), default='active')
     success_rate = db.Column(db.Float, default=0.0)
     revenue_generated = db.Column(db.Float, default=0.0)
+    user_id = db.Column(db.String, db.ForeignKey(User.id), index=True)
+    service_type = db.Column(db.String(100))  # for service_fulfillment runs
+    # Scheduling: processes with next_run_at set are run by the automation runner when due
+    run_interval_minutes = db.Column(db.Integer)
+    next_run_at = db.Column(db.DateTime, index=True)
+    last_run_at = db.Column(db.DateTime)
+    last_run_ms = db.Column(db.Float)
+    run_count = db.Column(db.Integer, default=0)
+    last_error = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
 
@@ -87,9 +124,22 @@ class FinancialData(db.Model):
     amount = db.Column(db.Float, nullable=False)
     date = db.Column(db.Date, nullable=False)
     description = db.Column(db.String(500))
-    analysis_result = db.Column(db.Text)
+    # Analyses are stored compressed; the plain column only holds rows not yet backfilled
+    analysis_result_legacy = db.deferred(db.Column('analysis_result', db.Text))
+    analysis_result_compressed = db.deferred(db.Column(CompressedText))
     created_at = db.Column(db.DateTime, default=datetime.now)
     user = db.relationship(User, backref='financial_data')
+    
+    @property
+    def analysis_result(self) -> Optional[str]:
+        if self.analysis_result_compressed is not None:
+            return self.analysis_result_compressed
+        return self.analysis_result_legacy
+    
+    @analysis_result.setter
+    def analysis_result(self, value: Optional[str]):
+        self.analysis_result_compressed = value
+        self.analysis_result_legacy = None
 
 # Service templates model
 class ServiceTemplate(db.Model):
@@ -121,5 +171,101 @@ class SystemMetrics(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     metric_type = db.Column(db.String(100), nullable=False)
     value = db.Column(db.Float, nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.now)
+    timestamp = db.Column(db.DateTime, default=datetime.now, index=True)
     additional_data = db.Column(db.Text)
+    # Typed dimensions for indexed per-entity lookups
+    entity_type = db.Column(db.String(50))
+    entity_id = db.Column(db.String(100))
+    user_id = db.Column(db.String, index=True)
+    provider = db.Column(db.String(50), index=True)
+    __table_args__ = (
+        db.Index('ix_system_metrics_type_timestamp', 'metric_type', 'timestamp'),
+        db.Index('ix_system_metrics_entity', 'entity_type', 'entity_id', 'timestamp'),
+        db.Index('ix_system_metrics_entity_type_timestamp', 'entity_type', 'timestamp'),
+    )
+
+# Pre-aggregated SystemMetrics per time bucket (minute/hour/day tiers)
+class MetricRollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    tier = db.Column(db.String(10), nullable=False)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    metric_type = db.Column(db.String(100), nullable=False)
+    entity_type = db.Column(db.String(50), nullable=False, default='')
+    provider = db.Column(db.String(50), nullable=False, default='')
+    count = db.Column(db.Integer, nullable=False, default=0)
+    value_sum = db.Column(db.Float, nullable=False, default=0.0)
+    value_min = db.Column(db.Float)
+    value_max = db.Column(db.Float)
+    sketch = db.Column(db.Text)  # JSON log-bucket histogram for percentiles
+    __table_args__ = (
+        UniqueConstraint('tier', 'bucket_start', 'metric_type', 'entity_type', 'provider', name='uq_metric_rollup_bucket'),
+        db.Index('ix_metric_rollup_tier_type_bucket', 'tier', 'metric_type', 'bucket_start'),
+    )
+
+# How far each rollup tier has been computed
+class MetricRollupWatermark(db.Model):
+    tier = db.Column(db.String(10), primary_key=True)
+    watermark = db.Column(db.DateTime, nullable=False)
+
+# Background job queue entries
+class BackgroundJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)
+    user_id = db.Column(db.String, db.ForeignKey(User.id), index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed, cancelled
+    priority = db.Column(db.Integer, nullable=False, default=0)  # higher runs first
+    payload = db.Column(db.Text)  # JSON
+    result = db.Column(db.Text)  # JSON
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    lease_owner = db.Column(db.String(100))
+    lease_expires_at = db.Column(db.DateTime)
+    available_at = db.Column(db.DateTime, default=datetime.now)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    __table_args__ = (
+        db.Index('ix_background_job_claim', 'status', 'priority', 'available_at'),
+    )
+
+# Cached LLM customizations/proposals per template version and normalized client requirements
+class TemplateResultCache(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # customization, proposal
+    template_id = db.Column(db.Integer, db.ForeignKey(ServiceTemplate.id, ondelete='CASCADE'), nullable=False)
+    template_version = db.Column(db.String(16), nullable=False)  # fingerprint of the template content
+    requirements_key = db.Column(db.String(64), nullable=False)  # hash of the normalized requirements
+    requirement_terms = db.Column(db.Text, nullable=False)  # normalized terms for near-duplicate matching
+    content = db.deferred(db.Column(CompressedText, nullable=False))
+    provider = db.Column(db.String(50))
+    hit_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    last_hit_at = db.Column(db.DateTime)
+    __table_args__ = (
+        UniqueConstraint('kind', 'template_id', 'template_version', 'requirements_key', name='uq_template_result_cache_key'),
+        db.Index('ix_template_result_cache_lookup', 'kind', 'template_id', 'template_version', 'created_at'),
+    )
+
+# Per-user LLM spend in hourly buckets for usage budgets, shared by every instance
+class UsageBudgetBucket(db.Model):
+    user_id = db.Column(db.String, primary_key=True)
+    bucket = db.Column(db.Integer, primary_key=True)  # hours since the epoch
+    spent = db.Column(db.Float, nullable=False, default=0.0)
+    reserved = db.Column(db.Float, nullable=False, default=0.0)  # estimated cost of calls in flight
+
+# Users whose earlier conversation spend has been loaded into the buckets; the row is locked while reserving
+class UsageBudgetAccount(db.Model):
+    user_id = db.Column(db.String, primary_key=True)
+    seeded_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+# One-time startup steps (default data) and their completion, shared by all workers
+class BootstrapStep(db.Model):
+    name = db.Column(db.String(100), primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # running, completed, failed
+    owner = db.Column(db.String(100))
+    started_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    duration_ms = db.Column(db.Float)
+    error = db.Column(db.Text)
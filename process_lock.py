@@ -0,0 +1,48 @@
+"""
+Process Lock - OperatorOS
+Non-blocking cross-process locks: Postgres advisory locks, or a file lock for local databases
+"""
+
+import os
+import zlib
+import fcntl
+import logging
+import tempfile
+from contextlib import contextmanager
+from sqlalchemy import text
+
+@contextmanager
+def try_lock(name: str, engine=None):
+    """
+    Yield True if the named lock was acquired, False if another process holds it
+    With a Postgres engine the lock is a session advisory lock, so it is shared by every
+    host using the database; otherwise it is a file lock shared by processes on this host.
+    """
+    if engine is not None and engine.dialect.name == "postgresql":
+        key = zlib.crc32(name.encode())
+        conn = engine.connect()
+        try:
+            acquired = bool(conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}).scalar())
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+        finally:
+            conn.close()
+        return
+
+    path = os.path.join(tempfile.gettempdir(), f"operatoros_{name}.lock")
+    with open(path, "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            except OSError as e:
+                logging.warning(f"Failed to release lock {name}: {str(e)}")
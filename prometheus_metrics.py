@@ -0,0 +1,270 @@
+"""
+Prometheus Metrics - OperatorOS
+In-memory counters and histograms for LLM calls, aggregated across gunicorn workers and served at /metrics
+"""
+
+import os
+import json
+import time
+import atexit
+import fcntl
+import logging
+import tempfile
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, List, Tuple
+
+MULTIPROC_DIR = os.environ.get(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'operatoros_prometheus')
+)
+# Seconds between writes of a worker's values to its file (also written at scrape and exit)
+FLUSH_INTERVAL = float(os.environ.get('PROMETHEUS_FLUSH_INTERVAL', '5'))
+
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+LLM_LABELS = ("provider", "model", "task_type", "agent")
+
+# Labels the call site knows but the provider layer does not (task type, agent)
+_labels: contextvars.ContextVar[Dict[str, str]] = contextvars.ContextVar("metric_labels", default={})
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+class PrometheusMetrics:
+    """
+    Each process keeps its own counters and histograms and periodically writes them to
+    <dir>/metrics_<pid>.json. A scrape sums every file; files of exited workers are folded
+    into an archive file first, so counters stay monotonic across worker recycling.
+    """
+
+    def __init__(self, directory: str = MULTIPROC_DIR):
+        self.directory = directory
+        self._definitions: Dict[str, Dict[str, Any]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, List[float]]] = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._last_flush = time.monotonic()
+        atexit.register(self.flush)
+
+        self.counter("operatoros_llm_requests_total", "LLM provider calls", LLM_LABELS)
+        self.counter("operatoros_llm_errors_total", "Failed LLM provider calls", LLM_LABELS + ("error",))
+        self.histogram("operatoros_llm_request_duration_seconds", "LLM provider call latency", LLM_LABELS)
+        self.counter("operatoros_llm_tokens_total", "Tokens sent to and received from LLM providers",
+                     LLM_LABELS + ("direction",))
+        self.counter("operatoros_llm_cost_dollars_total", "Estimated LLM spend in US dollars", LLM_LABELS)
+
+    # --- definitions ---
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...]):
+        self._definitions[name] = {"type": "counter", "help": help_text, "labels": labels}
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...], buckets=LATENCY_BUCKETS):
+        self._definitions[name] = {"type": "histogram", "help": help_text, "labels": labels,
+                                   "buckets": tuple(buckets)}
+
+    # --- recording ---
+
+    @contextmanager
+    def labels(self, **labels):
+        """Label LLM metrics recorded inside this block (e.g. agent, task_type)"""
+        token = _labels.set({**_labels.get(), **{key: str(value) for key, value in labels.items()}})
+        try:
+            yield
+        finally:
+            _labels.reset(token)
+
+    def _key(self, name: str, labels: Dict[str, Any]) -> LabelKey:
+        return tuple((label, str(labels.get(label) or "none")) for label in self._definitions[name]["labels"])
+
+    def _check_fork(self):
+        # A forked worker starts from zero; its parent's values are in the parent's file
+        if self._pid != os.getpid():
+            self._counters, self._histograms = {}, {}
+            self._pid = os.getpid()
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._check_fork()
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+        self._maybe_flush()
+
+    def observe(self, name: str, value: float, **labels):
+        buckets = self._definitions[name]["buckets"]
+        key = self._key(name, labels)
+        with self._lock:
+            self._check_fork()
+            # [count per bucket..., +Inf count, sum]
+            state = self._histograms.setdefault(name, {}).setdefault(key, [0.0] * (len(buckets) + 2))
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += 1
+            state[-1] += value
+        self._maybe_flush()
+
+    def record_llm_call(self, provider: str, model: str, latency: float, success: bool,
+                        input_tokens: int = 0, output_tokens: int = 0, cached_input_tokens: int = 0,
+                        cost: float = 0.0, error: str = None):
+        """One provider call, labeled with the task type and agent of the surrounding block"""
+        labels = dict(_labels.get(), provider=provider, model=model)
+        self.inc("operatoros_llm_requests_total", **labels)
+        if latency is not None:
+            self.observe("operatoros_llm_request_duration_seconds", latency, **labels)
+        if not success:
+            self.inc("operatoros_llm_errors_total", error=error or "error", **labels)
+            return
+        for direction, tokens in (("input", input_tokens), ("output", output_tokens),
+                                  ("cached_input", cached_input_tokens)):
+            if tokens:
+                self.inc("operatoros_llm_tokens_total", tokens, direction=direction, **labels)
+        if cost:
+            self.inc("operatoros_llm_cost_dollars_total", cost, **labels)
+
+    # --- multiprocess files ---
+
+    def _maybe_flush(self):
+        if time.monotonic() - self._last_flush >= FLUSH_INTERVAL:
+            self.flush()
+
+    def _snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            self._check_fork()
+            return {
+                "counters": {name: [[list(key), value] for key, value in series.items()]
+                             for name, series in self._counters.items()},
+                "histograms": {name: [[list(key), list(state)] for key, state in series.items()]
+                               for name, series in self._histograms.items()}
+            }
+
+    def flush(self):
+        """Write this process's values to its file (atomically replaced)"""
+        self._last_flush = time.monotonic()
+        snapshot = self._snapshot()
+        if not snapshot["counters"] and not snapshot["histograms"]:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"metrics_{os.getpid()}.json")
+            with open(path + ".tmp", "w") as f:
+                json.dump(snapshot, f)
+            os.replace(path + ".tmp", path)
+        except Exception as e:
+            logging.error(f"Metrics file write failed: {str(e)}")
+
+    def _merge(self, totals: Dict[str, Any], snapshot: Dict[str, Any]):
+        for name, series in snapshot.get("counters", {}).items():
+            merged = totals["counters"].setdefault(name, {})
+            for key, value in series:
+                key = tuple(tuple(pair) for pair in key)
+                merged[key] = merged.get(key, 0.0) + value
+        for name, series in snapshot.get("histograms", {}).items():
+            merged = totals["histograms"].setdefault(name, {})
+            for key, state in series:
+                key = tuple(tuple(pair) for pair in key)
+                current = merged.get(key)
+                merged[key] = state if current is None else [a + b for a, b in zip(current, state)]
+
+    def _pid_alive(self, pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+            return True
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+
+    def collect(self) -> Dict[str, Any]:
+        """Values summed over every worker, live or exited"""
+        self.flush()
+        os.makedirs(self.directory, exist_ok=True)
+        archive_path = os.path.join(self.directory, "metrics_archive.json")
+        totals = {"counters": {}, "histograms": {}}
+
+        with open(os.path.join(self.directory, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            archive = {"counters": {}, "histograms": {}}
+            if os.path.exists(archive_path):
+                with open(archive_path) as f:
+                    self._merge(archive, json.load(f))
+
+            dead = []
+            for filename in os.listdir(self.directory):
+                if not (filename.startswith("metrics_") and filename.endswith(".json")) or filename == "metrics_archive.json":
+                    continue
+                pid = int(filename[len("metrics_"):-len(".json")])
+                try:
+                    with open(os.path.join(self.directory, filename)) as f:
+                        snapshot = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                if self._pid_alive(pid):
+                    self._merge(totals, snapshot)
+                else:
+                    self._merge(archive, snapshot)
+                    dead.append(filename)
+
+            if dead:
+                # Fold exited workers into the archive so their counts survive, then drop their files
+                with open(archive_path + ".tmp", "w") as f:
+                    json.dump(self._serialize(archive), f)
+                os.replace(archive_path + ".tmp", archive_path)
+                for filename in dead:
+                    os.remove(os.path.join(self.directory, filename))
+
+        self._merge(totals, self._serialize(archive))
+        return totals
+
+    def _serialize(self, totals: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            kind: {name: [[list(key), value] for key, value in series.items()]
+                   for name, series in totals[kind].items()}
+            for kind in ("counters", "histograms")
+        }
+
+    def reset_directory(self):
+        """Remove all stored values; run once by the gunicorn master before workers start"""
+        if not os.path.isdir(self.directory):
+            return
+        for filename in os.listdir(self.directory):
+            if filename.startswith("metrics_"):
+                os.remove(os.path.join(self.directory, filename))
+
+    # --- exposition ---
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)"""
+        totals = self.collect()
+        lines = []
+        for name, definition in self._definitions.items():
+            lines.append(f"# HELP {name} {definition['help']}")
+            lines.append(f"# TYPE {name} {definition['type']}")
+            if definition["type"] == "counter":
+                for key, value in sorted(totals["counters"].get(name, {}).items()):
+                    lines.append(f"{name}{self._format_labels(key)} {self._format_value(value)}")
+                continue
+            for key, state in sorted(totals["histograms"].get(name, {}).items()):
+                for bound, count in zip(definition["buckets"], state):
+                    lines.append(f"{name}_bucket{self._format_labels(key + (('le', repr(float(bound))),))} "
+                                 f"{self._format_value(count)}")
+                lines.append(f"{name}_bucket{self._format_labels(key + (('le', '+Inf'),))} "
+                             f"{self._format_value(state[-2])}")
+                lines.append(f"{name}_sum{self._format_labels(key)} {self._format_value(state[-1])}")
+                lines.append(f"{name}_count{self._format_labels(key)} {self._format_value(state[-2])}")
+        return "\n".join(lines) + "\n"
+
+    def _format_labels(self, key: LabelKey) -> str:
+        if not key:
+            return ""
+        escaped = (
+            f'{label}="' + value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') + '"'
+            for label, value in key
+        )
+        return "{" + ",".join(escaped) + "}"
+
+    def _format_value(self, value: float) -> str:
+        return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+# Global Prometheus metrics
+prometheus_metrics = PrometheusMetrics()
@@ -0,0 +1,99 @@
+"""
+Prompt Templates - OperatorOS
+Compiles prompt templates once into static text and dynamic slots with precomputed token counts
+"""
+
+import string
+from typing import Dict, List, Tuple, Optional
+from dataclasses import dataclass
+from token_limiter import token_limiter
+
+@dataclass(frozen=True)
+class RenderedPrompt:
+    """A rendered prompt split into its cacheable static prefix and per-call remainder"""
+    static_prefix: str
+    dynamic: str
+    was_truncated: bool = False
+
+    @property
+    def text(self) -> str:
+        return self.static_prefix + self.dynamic
+
+class CompiledPrompt:
+    """A prompt template parsed once into (literal, slot) segments"""
+
+    __slots__ = ('name', 'static_prefix', 'segments', 'slots', '_static_text', '_static_tokens')
+
+    def __init__(self, template: str, name: str = ""):
+        self.name = name
+
+        # Each segment is (literal_text, slot_name or None); braces are unescaped by the parser
+        segments = []
+        for literal, field_name, format_spec, conversion in string.Formatter().parse(template):
+            if format_spec or conversion:
+                raise ValueError(f"Prompt template {name!r} uses unsupported format spec on {{{field_name}}}")
+            segments.append((literal, field_name))
+
+        self.segments: Tuple[Tuple[str, Optional[str]], ...] = tuple(segments)
+        self.slots = tuple(field for _, field in segments if field is not None)
+
+        # Everything before the first slot is identical on every call
+        self.static_prefix = segments[0][0] if segments else ""
+
+        self._static_text = "".join(literal for literal, _ in segments)
+        self._static_tokens = {
+            provider: token_limiter.estimate_tokens(self._static_text, provider)
+            for provider in token_limiter.provider_limits
+        }
+
+    def static_tokens(self, provider: str) -> int:
+        """Token estimate for all static text in the template"""
+        tokens = self._static_tokens.get(provider)
+        if tokens is None:
+            tokens = token_limiter.estimate_tokens(self._static_text, provider)
+            self._static_tokens[provider] = tokens
+        return tokens
+
+    def fit(self, context: str, query: str, provider: str) -> Tuple[str, str, bool]:
+        """Truncate the dynamic context and query so the rendered prompt fits provider limits"""
+        return token_limiter.fit_to_budget(
+            self.static_tokens(provider), context, query, provider
+        )
+
+    def render(self, provider: str, context: str = "", query: str = "") -> RenderedPrompt:
+        """Fill the slots, measuring only the dynamic context and query"""
+        context, query, was_truncated = self.fit(context, query, provider)
+        values = {'context': context, 'query': query}
+
+        parts: List[str] = []
+        for index, (literal, field_name) in enumerate(self.segments):
+            if index > 0:
+                parts.append(literal)
+            if field_name is not None:
+                parts.append(values.get(field_name, ""))
+
+        return RenderedPrompt(
+            static_prefix=self.static_prefix,
+            dynamic="".join(parts),
+            was_truncated=was_truncated
+        )
+
+class PromptTemplateCache:
+    """Caches compiled prompts by name so each template is parsed and measured once"""
+
+    def __init__(self):
+        self._compiled: Dict[str, CompiledPrompt] = {}
+
+    def get(self, name: str, template: str) -> CompiledPrompt:
+        """Get a compiled prompt, compiling it on first use"""
+        compiled = self._compiled.get(name)
+        if compiled is None:
+            compiled = CompiledPrompt(template, name)
+            self._compiled[name] = compiled
+        return compiled
+
+    def __len__(self) -> int:
+        return len(self._compiled)
+
+# Global compiled prompt cache
+prompt_cache = PromptTemplateCache()
@@ -0,0 +1,187 @@
+"""
+Provider Clients - OperatorOS
+Process-wide registry of AI provider SDK clients sharing tuned HTTP keep-alive pools
+"""
+
+import os
+import logging
+import threading
+import importlib.util
+from collections.abc import Mapping
+from typing import Dict, Any, Iterator, Optional
+
+from provider_resilience import provider_timeout, CONNECT_TIMEOUT
+
+# Which environment variable enables each provider
+PROVIDER_KEYS = {
+    "openai": "OPENAI_API_KEY",
+    "anthropic": "ANTHROPIC_API_KEY",
+    "grok": "XAI_API_KEY"
+}
+
+MAX_CONNECTIONS = int(os.environ.get('AI_HTTP_MAX_CONNECTIONS', '32'))
+MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('AI_HTTP_MAX_KEEPALIVE', '16'))
+# The SDK default of 5s drops idle connections between ordinary request gaps, so most
+# calls pay a fresh TLS handshake; providers keep idle connections open far longer
+KEEPALIVE_EXPIRY = float(os.environ.get('AI_HTTP_KEEPALIVE_EXPIRY', '90'))
+# HTTP/2 multiplexes concurrent calls over one connection; it needs the optional h2 package
+HTTP2_ENABLED = os.environ.get('AI_HTTP2', 'true').lower() == 'true' and importlib.util.find_spec("h2") is not None
+
+class ProviderClientRegistry(Mapping):
+    """
+    One SDK client per provider for the whole process, each on its own HTTP pool, shared by
+    every subsystem and worker thread (httpx clients are thread-safe). Behaves as a read-only
+    mapping of configured provider name -> client; clients are built on first use and rebuilt
+    in a forked child, which must not reuse the parent's sockets.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, Any] = {}
+        self._http_clients: Dict[str, Any] = {}
+        self._pool_stats: Dict[str, Dict[str, Any]] = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    # --- mapping interface ---
+
+    def configured(self):
+        return [name for name, key in PROVIDER_KEYS.items() if os.environ.get(key)]
+
+    def __getitem__(self, provider: str):
+        if provider not in self.configured():
+            raise KeyError(provider)
+        client = self._clients.get(provider) if self._pid == os.getpid() else None
+        if client is not None:
+            return client
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked: drop the parent's clients without closing its sockets
+                self._clients, self._http_clients, self._pool_stats = {}, {}, {}
+                self._pid = os.getpid()
+            if provider not in self._clients:
+                self._clients[provider] = self._build(provider)
+            return self._clients[provider]
+
+    def __contains__(self, provider) -> bool:
+        return provider in self.configured()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.configured())
+
+    def __len__(self) -> int:
+        return len(self.configured())
+
+    # --- construction ---
+
+    def _build(self, provider: str):
+        """SDK client for a provider on a dedicated, tuned connection pool"""
+        api_key = os.environ.get(PROVIDER_KEYS[provider])
+        # SDK retries are disabled; retries, backoff and circuit breaking live in ProviderResilience
+        if provider == "anthropic":
+            import anthropic as sdk
+            http_client = self._http_client(sdk, provider)
+            client = sdk.Anthropic(api_key=api_key, http_client=http_client, max_retries=0)
+        else:
+            import openai as sdk
+            http_client = self._http_client(sdk, provider)
+            options = {"base_url": "https://api.x.ai/v1"} if provider == "grok" else {}
+            client = sdk.OpenAI(api_key=api_key, http_client=http_client, max_retries=0, **options)
+
+        self._http_clients[provider] = http_client
+        logging.info(f"{provider} provider client initialized (http2={HTTP2_ENABLED}, "
+                     f"max_connections={MAX_CONNECTIONS})")
+        return client
+
+    def _http_client(self, sdk, provider: str):
+        """The SDK's own httpx client class with our pool limits, timeouts and usage hooks"""
+        stats = {"requests": 0, "responses": 0, "connections_opened": 0,
+                 "peak_connections": 0, "peak_active": 0, "_seen": set()}
+        self._pool_stats[provider] = stats
+        holder = {}
+
+        def on_request(request):
+            with self._lock:
+                stats["requests"] += 1
+
+        def on_response(response):
+            self._observe_pool(holder.get("client"), stats)
+
+        # Limits and Timeout come from the httpx build the SDK was installed with
+        limits = type(sdk.DEFAULT_CONNECTION_LIMITS)(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY
+        )
+        client = sdk.DefaultHttpxClient(
+            limits=limits,
+            timeout=sdk.Timeout(provider_timeout(provider), connect=CONNECT_TIMEOUT),
+            http2=HTTP2_ENABLED,
+            event_hooks={"request": [on_request], "response": [on_response]}
+        )
+        holder["client"] = client
+        return client
+
+    # --- metrics ---
+
+    def _connections(self, http_client) -> Optional[list]:
+        """Connections currently held by a client's pool, if its transport exposes them"""
+        pool = getattr(getattr(http_client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        return list(connections) if connections is not None else None
+
+    def _observe_pool(self, http_client, stats: Dict[str, Any]):
+        """Called as each response arrives: count new connections and peak pool usage"""
+        connections = self._connections(http_client)
+        with self._lock:
+            stats["responses"] += 1
+            if connections is None:
+                return
+            current = {id(connection) for connection in connections}
+            stats["connections_opened"] += len(current - stats["_seen"])
+            stats["_seen"] = current
+            active = sum(1 for connection in connections if not connection.is_idle())
+            stats["peak_connections"] = max(stats["peak_connections"], len(connections))
+            stats["peak_active"] = max(stats["peak_active"], active)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Pool configuration and per-provider connection usage for this process"""
+        providers = {}
+        for provider in self.configured():
+            stats = self._pool_stats.get(provider) if self._pid == os.getpid() else None
+            if stats is None:
+                providers[provider] = {"initialized": False}
+                continue
+            connections = self._connections(self._http_clients.get(provider)) or []
+            active = sum(1 for connection in connections if not connection.is_idle())
+            with self._lock:
+                requests, opened = stats["requests"], stats["connections_opened"]
+                providers[provider] = {
+                    "initialized": True,
+                    "requests": requests,
+                    "connections_opened": opened,
+                    "connection_reuse_rate": round(1 - opened / requests, 3) if requests else 0.0,
+                    "open_connections": len(connections),
+                    "active_connections": active,
+                    "idle_connections": len(connections) - active,
+                    "utilization": round(active / MAX_CONNECTIONS, 3),
+                    "peak_connections": stats["peak_connections"],
+                    "peak_active": stats["peak_active"]
+                }
+        return {
+            "pid": os.getpid(),
+            "http2": HTTP2_ENABLED,
+            "max_connections": MAX_CONNECTIONS,
+            "max_keepalive_connections": MAX_KEEPALIVE_CONNECTIONS,
+            "keepalive_expiry": KEEPALIVE_EXPIRY,
+            "providers": providers
+        }
+
+    def close(self):
+        """Close every pooled connection in this process"""
+        with self._lock:
+            for http_client in self._http_clients.values():
+                http_client.close()
+            self._clients, self._http_clients, self._pool_stats = {}, {}, {}
+
+# Global provider client registry
+provider_clients = ProviderClientRegistry()
@@ -0,0 +1,252 @@
+"""
+Provider Rate Limiter - OperatorOS
+Token-bucket RPM/TPM limits per provider/model shared across worker processes, plus a concurrency governor
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Tuple
+
+# Requests and tokens per minute per provider; "provider:model" keys override the provider default
+DEFAULT_RATE_LIMITS = {
+    "openai": {"rpm": 500, "tpm": 30000},
+    "anthropic": {"rpm": 50, "tpm": 40000},
+    "grok": {"rpm": 60, "tpm": 100000}
+}
+DEFAULT_MAX_CONCURRENCY = 8
+
+class RateLimitExceeded(Exception):
+    """Raised when a call would have to wait longer than the allowed queue time"""
+
+    def __init__(self, key: str, wait_seconds: float):
+        super().__init__(f"Local rate limit for {key} needs {wait_seconds:.1f}s wait")
+        self.key = key
+        self.wait_seconds = wait_seconds
+
+class ProviderRateLimiter:
+    """
+    Token buckets for requests and tokens, stored in a local SQLite file so every
+    gunicorn worker draws from the same budget. Falls back to in-process buckets
+    when the file cannot be used.
+    """
+
+    def __init__(self, db_path: str = None, limits: Dict[str, Dict[str, float]] = None,
+                 max_queue_wait: float = None, max_concurrency: int = None):
+        self.enabled = os.environ.get('AI_RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+        self.limits = dict(DEFAULT_RATE_LIMITS)
+        self.limits.update(limits or self._load_env_limits())
+        self.max_queue_wait = max_queue_wait if max_queue_wait is not None else float(
+            os.environ.get('AI_RATE_LIMIT_MAX_WAIT', '10')
+        )
+        self.max_concurrency = max_concurrency or int(
+            os.environ.get('AI_MAX_CONCURRENCY', str(DEFAULT_MAX_CONCURRENCY))
+        )
+
+        self.db_path = db_path or os.environ.get(
+            'AI_RATE_LIMIT_DB', os.path.join(tempfile.gettempdir(), 'operatoros_rate_limits.db')
+        )
+        self._memory_buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self.stats = {"acquired": 0, "queued": 0, "queued_seconds": 0.0, "rejected": 0}
+        self._init_store()
+
+    def _load_env_limits(self) -> Dict[str, Dict[str, float]]:
+        """Read limit overrides from AI_RATE_LIMITS (JSON)"""
+        raw = os.environ.get('AI_RATE_LIMITS')
+        if not raw:
+            return {}
+        try:
+            return json.loads(raw)
+        except ValueError as e:
+            logging.error(f"Invalid AI_RATE_LIMITS: {str(e)}")
+            return {}
+
+    def _init_store(self):
+        """Create the shared bucket table, or fall back to in-process buckets"""
+        try:
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS rate_buckets ("
+                    "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+                )
+        except sqlite3.Error as e:
+            logging.warning(f"Rate limiter store unavailable ({str(e)}), using per-process buckets")
+            self.db_path = None
+
+    @contextmanager
+    def _connect(self):
+        """Short-lived autocommit connection to the shared bucket store"""
+        conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def limit_key(self, provider: str, model: str = None) -> str:
+        """Bucket key: the model-specific limit if configured, otherwise the provider's"""
+        if model and f"{provider}:{model}" in self.limits:
+            return f"{provider}:{model}"
+        return provider
+
+    def _buckets(self, key: str, tokens: int) -> Dict[str, Tuple[float, float, float]]:
+        """(capacity, refill per second, amount) for each bucket of a key"""
+        limit = self.limits.get(key) or self.limits.get(key.split(":")[0]) or {}
+        buckets = {}
+        if limit.get("rpm"):
+            buckets[f"{key}|rpm"] = (limit["rpm"], limit["rpm"] / 60.0, 1)
+        if limit.get("tpm"):
+            # A single call larger than the bucket can still pass once the bucket is full
+            buckets[f"{key}|tpm"] = (limit["tpm"], limit["tpm"] / 60.0, min(tokens, limit["tpm"]))
+        return buckets
+
+    def _try_take(self, buckets: Dict[str, Tuple[float, float, float]]) -> float:
+        """Take from all buckets atomically; returns 0 on success or the seconds to wait"""
+        now = time.time()
+        if self.db_path is None:
+            with self._lock:
+                return self._take_from(self._memory_buckets, buckets, now)
+
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                keys = list(buckets)
+                rows = conn.execute(
+                    f"SELECT key, tokens, updated FROM rate_buckets WHERE key IN ({','.join('?' * len(keys))})",
+                    keys
+                ).fetchall()
+                state = {key: (level, updated) for key, level, updated in rows}
+                wait_seconds = self._take_from(state, buckets, now)
+                if wait_seconds == 0:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                        [(key, state[key][0], state[key][1]) for key in keys]
+                    )
+                conn.execute("COMMIT")
+                return wait_seconds
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _take_from(self, state: Dict[str, Tuple[float, float]],
+                   buckets: Dict[str, Tuple[float, float, float]], now: float) -> float:
+        """Refill and take from buckets in `state`, mutating it only when all can be taken"""
+        levels = {}
+        wait_seconds = 0.0
+        for key, (capacity, rate, amount) in buckets.items():
+            level, updated = state.get(key, (capacity, now))
+            level = min(capacity, level + (now - updated) * rate)
+            levels[key] = level
+            if level < amount:
+                wait_seconds = max(wait_seconds, (amount - level) / rate)
+
+        if wait_seconds == 0:
+            for key, (capacity, rate, amount) in buckets.items():
+                state[key] = (levels[key] - amount, now)
+        return wait_seconds
+
+    def acquire(self, provider: str, model: str = None, tokens: int = 0,
+                max_wait: float = None) -> float:
+        """
+        Reserve one request and `tokens` estimated tokens, queueing up to `max_wait` seconds
+        Returns the seconds spent waiting; raises RateLimitExceeded when the wait would be
+        longer, so the caller can reroute to another provider.
+        """
+        if not self.enabled:
+            return 0.0
+
+        key = self.limit_key(provider, model)
+        buckets = self._buckets(key, tokens)
+        if not buckets:
+            return 0.0
+
+        max_wait = self.max_queue_wait if max_wait is None else max_wait
+        waited = 0.0
+        while True:
+            try:
+                wait_seconds = self._try_take(buckets)
+            except sqlite3.Error as e:
+                logging.warning(f"Rate limiter store error ({str(e)}), allowing call")
+                return waited
+
+            if wait_seconds == 0:
+                with self._lock:
+                    self.stats["acquired"] += 1
+                    if waited:
+                        self.stats["queued"] += 1
+                        self.stats["queued_seconds"] += waited
+                return waited
+
+            if waited + wait_seconds > max_wait:
+                with self._lock:
+                    self.stats["rejected"] += 1
+                raise RateLimitExceeded(key, wait_seconds)
+
+            time.sleep(wait_seconds)
+            waited += wait_seconds
+
+    def reconcile(self, provider: str, model: str, estimated_tokens: int, actual_tokens: int):
+        """Charge (or refund) the token bucket for the difference between estimate and actual usage"""
+        if not self.enabled or not actual_tokens:
+            return
+        key = self.limit_key(provider, model)
+        limit = self.limits.get(key) or self.limits.get(provider) or {}
+        if not limit.get("tpm"):
+            return
+
+        delta = actual_tokens - estimated_tokens
+        bucket_key = f"{key}|tpm"
+        try:
+            if self.db_path is None:
+                with self._lock:
+                    level, updated = self._memory_buckets.get(bucket_key, (limit["tpm"], time.time()))
+                    self._memory_buckets[bucket_key] = (min(limit["tpm"], level - delta), updated)
+                return
+            with self._connect() as conn:
+                conn.execute(
+                    "UPDATE rate_buckets SET tokens = MIN(?, tokens - ?) WHERE key = ?",
+                    (limit["tpm"], delta, bucket_key)
+                )
+        except sqlite3.Error as e:
+            logging.warning(f"Rate limiter reconcile failed: {str(e)}")
+
+    @contextmanager
+    def concurrency_slot(self, provider: str, max_wait: float = None):
+        """
+        Cap in-flight calls per provider within this process
+        Waits up to `max_wait` seconds for a free slot, then raises RateLimitExceeded so the
+        caller can reroute instead of blocking its request thread.
+        """
+        with self._lock:
+            semaphore = self._semaphores.get(provider)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.max_concurrency)
+                self._semaphores[provider] = semaphore
+        max_wait = self.max_queue_wait if max_wait is None else max_wait
+        if not semaphore.acquire(timeout=max_wait):
+            with self._lock:
+                self.stats["rejected"] += 1
+            raise RateLimitExceeded(f"{provider} concurrency", max_wait)
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    def get_status(self) -> Dict[str, Any]:
+        """Configured limits and local counters"""
+        with self._lock:
+            stats = dict(self.stats)
+        return {
+            "enabled": self.enabled,
+            "shared_store": self.db_path,
+            "limits": self.limits,
+            "max_concurrency": self.max_concurrency,
+            **stats
+        }
@@ -0,0 +1,255 @@
+"""
+Provider Resilience - OperatorOS
+Timeouts, jittered retries honoring Retry-After, and per-provider circuit breakers
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Callable, Optional, TypeVar
+from dataclasses import dataclass
+
+T = TypeVar("T")
+
+# Per-provider request timeouts in seconds (overridable via <PROVIDER>_TIMEOUT env vars)
+DEFAULT_TIMEOUTS = {
+    "openai": 45.0,
+    "anthropic": 60.0,
+    "grok": 45.0
+}
+CONNECT_TIMEOUT = 5.0
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+RETRYABLE_ERROR_NAMES = {"APITimeoutError", "APIConnectionError", "Timeout", "ConnectError", "ReadTimeout"}
+TIMEOUT_ERROR_NAMES = {"APITimeoutError", "Timeout", "ReadTimeout"}
+
+class CircuitOpenError(Exception):
+    """Raised when a provider's circuit breaker is open"""
+
+    def __init__(self, provider: str, retry_in: float):
+        super().__init__(f"Provider {provider} circuit open, retry in {retry_in:.0f}s")
+        self.provider = provider
+        self.retry_in = retry_in
+
+def provider_timeout(provider: str) -> float:
+    """Request timeout for a provider"""
+    env_value = os.environ.get(f"{provider.upper()}_TIMEOUT")
+    return float(env_value) if env_value else DEFAULT_TIMEOUTS.get(provider, 45.0)
+
+def error_status_code(error: Exception) -> Optional[int]:
+    """HTTP status code carried by an SDK error, if any"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+def is_retryable(error: Exception) -> bool:
+    """Whether an error is transient (rate limit, server error, timeout, connection)"""
+    if isinstance(error, CircuitOpenError):
+        return False
+    status = error_status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__)
+
+def is_timeout(error: Exception) -> bool:
+    """Whether an error is a client-side request timeout (the call already used its full timeout)"""
+    if isinstance(error, TimeoutError):
+        return True
+    return any(cls.__name__ in TIMEOUT_ERROR_NAMES for cls in type(error).__mro__)
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Parse Retry-After / retry-after-ms headers from an SDK error response"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+@dataclass
+class RetryPolicy:
+    """Jittered exponential backoff settings"""
+    max_retries: int = 2
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    max_total_delay: float = 20.0
+    # Wall-clock seconds from the first attempt after which no retry starts; None uses the provider timeout
+    deadline: Optional[float] = None
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        """Delay before retry `attempt` (1-based), honoring Retry-After when present"""
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        # Full jitter: uniform between 0 and the exponential ceiling
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a half-open probe"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.total_opens = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Whether a call may proceed; lets a single probe through once the recovery timeout passes"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.time() - self.opened_at >= self.recovery_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def is_open(self) -> bool:
+        """Whether the breaker is currently rejecting calls (without consuming a probe)"""
+        with self._lock:
+            if self.state == self.OPEN:
+                return time.time() - self.opened_at < self.recovery_timeout
+            return self.state == self.HALF_OPEN and self._probe_in_flight
+
+    def retry_in(self) -> float:
+        with self._lock:
+            return max(0.0, self.recovery_timeout - (time.time() - self.opened_at))
+
+    def release_probe(self):
+        """End a half-open probe without a verdict, letting the next call probe instead"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.total_opens += 1
+                self.state = self.OPEN
+                self.opened_at = time.time()
+                self._probe_in_flight = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "total_opens": self.total_opens,
+            "retry_in": round(self.retry_in(), 1) if self.state != self.CLOSED else 0
+        }
+
+class ProviderResilience:
+    """Wraps provider calls with circuit breakers and retries"""
+
+    def __init__(self, retry_policy: RetryPolicy = None, failure_threshold: int = None,
+                 recovery_timeout: float = None):
+        self.retry_policy = retry_policy or RetryPolicy(
+            max_retries=int(os.environ.get("AI_MAX_RETRIES", "2")),
+            deadline=float(os.environ["AI_RETRY_DEADLINE"]) if os.environ.get("AI_RETRY_DEADLINE") else None
+        )
+        self.failure_threshold = failure_threshold or int(os.environ.get("AI_BREAKER_THRESHOLD", "5"))
+        self.recovery_timeout = recovery_timeout or float(os.environ.get("AI_BREAKER_RECOVERY", "30"))
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.retry_count = 0
+        self._lock = threading.Lock()
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        """Get (or create) the circuit breaker for a provider"""
+        with self._lock:
+            breaker = self.breakers.get(provider)
+            if breaker is None:
+                breaker = CircuitBreaker(self.failure_threshold, self.recovery_timeout)
+                self.breakers[provider] = breaker
+            return breaker
+
+    def is_available(self, provider: str) -> bool:
+        """Whether a provider's circuit is accepting calls"""
+        return not self.breaker(provider).is_open()
+
+    def call(self, provider: str, func: Callable[[], T]) -> T:
+        """
+        Run a provider call with breaker gating and jittered retries on fast transient errors
+        Timeouts are not retried, and no retry starts after the deadline, so a failing provider
+        hands over to the caller's fallback after at most about two request timeouts.
+        """
+        breaker = self.breaker(provider)
+        if not breaker.allow_request():
+            raise CircuitOpenError(provider, breaker.retry_in())
+
+        deadline = time.monotonic() + (self.retry_policy.deadline or provider_timeout(provider))
+        waited = 0.0
+        attempt = 0
+        while True:
+            try:
+                result = func()
+                breaker.record_success()
+                return result
+            except Exception as e:
+                if not is_retryable(e):
+                    # Client errors say nothing about provider health, so a probe stays undecided
+                    breaker.release_probe()
+                    raise
+
+                breaker.record_failure()
+                attempt += 1
+                delay = self.retry_policy.backoff(attempt, e)
+                if (is_timeout(e)
+                        or attempt > self.retry_policy.max_retries
+                        or waited + delay > self.retry_policy.max_total_delay
+                        or time.monotonic() + delay > deadline
+                        or not breaker.allow_request()):
+                    raise
+
+                with self._lock:
+                    self.retry_count += 1
+                logging.warning(f"{provider} call failed ({str(e)}), retry {attempt} in {delay:.1f}s")
+                time.sleep(delay)
+                waited += delay
+
+    def get_status(self) -> Dict[str, Any]:
+        """Breaker state per provider"""
+        with self._lock:
+            breakers = dict(self.breakers)
+        return {
+            "retries": self.retry_count,
+            "breakers": {provider: breaker.to_dict() for provider, breaker in breakers.items()}
+        }
@@ -0,0 +1,198 @@
+"""
+Provider Router - OperatorOS
+Adaptive provider selection using rolling latency, error rate and cost observations
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+from dataclasses import dataclass
+
+# Static task routing table, used as the prior when there is no live data
+TASK_ROUTING = {
+    "analysis": "anthropic",
+    "creative": "openai",
+    "reasoning": "grok",
+    "coding": "anthropic",
+    "financial": "grok",
+    "planning": "anthropic",
+    "general": "anthropic"
+}
+
+FALLBACK_ORDER = ["anthropic", "openai", "grok"]
+
+# Approximate blended USD per 1k tokens, used for the cost objective before calls are observed
+PRIOR_COST_PER_1K = {
+    "openai": 0.015,
+    "anthropic": 0.045,
+    "grok": 0.010
+}
+
+ROUTING_OBJECTIVES = ("quality", "latency", "cost")
+
+@dataclass
+class ProviderObservation:
+    """A single observed provider call"""
+    timestamp: float
+    latency: float
+    success: bool
+    cost: float
+    tokens: int
+
+@dataclass
+class ProviderSnapshot:
+    """Rolling statistics for a provider or provider/model pair"""
+    samples: int
+    p50_latency: Optional[float]
+    p95_latency: Optional[float]
+    error_rate: float
+    avg_cost: Optional[float]
+    cost_per_1k: Optional[float]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "samples": self.samples,
+            "p50_latency": self.p50_latency,
+            "p95_latency": self.p95_latency,
+            "error_rate": round(self.error_rate, 4),
+            "avg_cost": self.avg_cost,
+            "cost_per_1k": self.cost_per_1k
+        }
+
+def _percentile(sorted_values: List[float], percentile: float) -> Optional[float]:
+    """Nearest-rank percentile of pre-sorted values"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(percentile * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+class ProviderRouter:
+    """Tracks provider health in memory and picks a provider per call"""
+
+    def __init__(self, window_size: int = 200, max_age_seconds: int = 900,
+                 min_samples: int = 5, objective: str = None):
+        self.window_size = window_size
+        self.max_age_seconds = max_age_seconds
+        self.min_samples = min_samples
+        self.objective = objective or os.environ.get("AI_ROUTING_OBJECTIVE", "quality")
+        if self.objective not in ROUTING_OBJECTIVES:
+            logging.warning(f"Unknown routing objective {self.objective}, using quality")
+            self.objective = "quality"
+
+        self._observations: Dict[Tuple[str, str], deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, model: str, latency: float, success: bool,
+               cost: float = 0.0, tokens: int = 0):
+        """Record the outcome of a provider call"""
+        observation = ProviderObservation(
+            timestamp=time.time(), latency=latency, success=success, cost=cost, tokens=tokens
+        )
+        key = (provider, model or "default")
+        with self._lock:
+            window = self._observations.get(key)
+            if window is None:
+                window = deque(maxlen=self.window_size)
+                self._observations[key] = window
+            window.append(observation)
+
+    def _recent(self, provider: str, model: str = None) -> List[ProviderObservation]:
+        """Observations for a provider (optionally one model) inside the max-age window"""
+        cutoff = time.time() - self.max_age_seconds
+        with self._lock:
+            windows = [
+                list(window) for (p, m), window in self._observations.items()
+                if p == provider and (model is None or m == model)
+            ]
+        return [o for window in windows for o in window if o.timestamp >= cutoff]
+
+    def get_snapshot(self, provider: str, model: str = None) -> ProviderSnapshot:
+        """Rolling p50/p95 latency, error rate and cost for a provider"""
+        observations = self._recent(provider, model)
+        successes = [o for o in observations if o.success]
+        latencies = sorted(o.latency for o in successes)
+        tokens = sum(o.tokens for o in successes)
+        cost = sum(o.cost for o in successes)
+
+        return ProviderSnapshot(
+            samples=len(observations),
+            p50_latency=_percentile(latencies, 0.5),
+            p95_latency=_percentile(latencies, 0.95),
+            error_rate=(1 - len(successes) / len(observations)) if observations else 0.0,
+            avg_cost=(cost / len(successes)) if successes else None,
+            cost_per_1k=(cost / tokens * 1000) if tokens else None
+        )
+
+    def _prior_score(self, provider: str, preferred: str) -> float:
+        """Prior preference from the static routing table and fallback order"""
+        if provider == preferred:
+            return 1.0
+        if provider in FALLBACK_ORDER:
+            return 0.8 - 0.1 * FALLBACK_ORDER.index(provider)
+        return 0.5
+
+    def select(self, task_type: str, available: Iterable[str], preferred: str = None,
+               objective: str = None, exclude: Iterable[str] = ()) -> Optional[str]:
+        """
+        Pick a provider for a call
+        With too few observations every candidate is scored by the prior alone,
+        so cold-start behaviour matches the static routing table.
+        """
+        excluded = set(exclude)
+        candidates = [p for p in available if p not in excluded]
+        if not candidates:
+            return None
+
+        preferred = preferred or TASK_ROUTING.get(task_type, "anthropic")
+        objective = objective or self.objective
+
+        snapshots = {p: self.get_snapshot(p) for p in candidates}
+        warm = {p: s for p, s in snapshots.items() if s.samples >= self.min_samples}
+
+        # Providers without enough data get the mean of observed providers (neutral)
+        def neutral(values: List[float], default: float) -> float:
+            return sum(values) / len(values) if values else default
+
+        warm_p95 = [s.p95_latency for s in warm.values() if s.p95_latency is not None]
+        default_latency = neutral(warm_p95, 0.0)
+
+        scores = {}
+        for provider in candidates:
+            snapshot = warm.get(provider)
+            prior = self._prior_score(provider, preferred)
+            error_rate = snapshot.error_rate if snapshot else 0.0
+
+            latency = snapshot.p95_latency if snapshot and snapshot.p95_latency is not None else default_latency
+            cost = (snapshot.cost_per_1k if snapshot and snapshot.cost_per_1k is not None
+                    else PRIOR_COST_PER_1K.get(provider, max(PRIOR_COST_PER_1K.values())))
+
+            if objective == "latency":
+                score = -latency * (1 + 2 * error_rate)
+            elif objective == "cost":
+                score = -cost * (1 + 2 * error_rate)
+            else:
+                # Quality-weighted: prior dominates, live latency and errors demote it
+                relative_latency = (latency / default_latency) if default_latency else 1.0
+                score = prior * (1 - error_rate) - 0.15 * max(0.0, relative_latency - 1.0)
+
+            scores[provider] = (round(score, 6), prior)
+
+        return max(candidates, key=lambda p: scores[p])
+
+    def get_routing_stats(self) -> Dict[str, Any]:
+        """Current rolling statistics per provider and model"""
+        with self._lock:
+            keys = list(self._observations.keys())
+
+        stats = {}
+        for provider, model in keys:
+            provider_stats = stats.setdefault(provider, {
+                "overall": self.get_snapshot(provider).to_dict(),
+                "models": {}
+            })
+            provider_stats["models"][model] = self.get_snapshot(provider, model).to_dict()
+
+        return {"objective": self.objective, "providers": stats}
@@ -8,6 +8,8 @@ import logging
 from typing import Dict, Any, List
 from dataclasses import dataclass
 from ai_providers import ai_manager
+from agent_registry import agent_registry
+from tracing import tracer
 
 @dataclass
 class QueryAnalysis:
@@ -36,27 +38,13 @@ class QueryAnalyzer:
             'gaming': ['gaming', 'game', 'deck', 'card', 'yugioh', 'yu-gi-oh', 'strategy', 'competitive', 'tournament', 'meta', 'burn']
         }
         
-        self.agent_specializations = {
-            'CFO': ['financial', 'business', 'investment', 'budget'],
-            'CSA': ['strategy', 'business', 'market', 'competition'],
-            'COO': ['operations', 'business', 'process', 'management'],
-            'CRO': ['risk', 'business', 'financial', 'legal'],
-            'Legal_Expert': ['legal', 'law', 'contract', 'rights'],
-            'Financial_Advisor': ['financial', 'investment', 'budget', 'money'],
-            'Therapist': ['mental', 'personal', 'relationship', 'health'],
-            'Career_Coach': ['career', 'job', 'work', 'employment'],
-            'Business_Coach': ['business', 'startup', 'strategy', 'growth'],
-            'Life_Coach': ['personal', 'life', 'goals', 'lifestyle'],
-            'Tech_Expert': ['technology', 'software', 'digital', 'system'],
-            'Child_Psychologist': ['family', 'children', 'parenting', 'education']
-        }
-        
         self.complexity_indicators = {
             'high': ['complex', 'comprehensive', 'detailed', 'thorough', 'complete', 'multiple', 'all aspects'],
             'medium': ['analyze', 'evaluate', 'assess', 'consider', 'review', 'examine'],
             'low': ['simple', 'quick', 'basic', 'brief', 'what is', 'how to']
         }
     
+    @tracer.traced("query_analyzer.analyze")
     def analyze_user_query(self, user_input: str) -> QueryAnalysis:
         """
         Analyze user query to identify what types of expertise are needed
@@ -86,6 +74,11 @@ class QueryAnalyzer:
             # Estimate token usage
             estimated_tokens = self._estimate_token_usage(complexity_level, len(agent_chain))
             
+            tracer.set_attributes(**{
+                "query.primary_domain": primary_domain,
+                "query.complexity": complexity_level,
+                "query.agent_chain": ",".join(agent_chain)
+            })
             return QueryAnalysis(
                 primary_domain=primary_domain,
                 required_perspectives=required_perspectives,
@@ -166,27 +159,11 @@ class QueryAnalyzer:
         """Build optimal agent chain based on required perspectives"""
         agent_chain = []
         
-        # Map perspectives to agents
-        perspective_to_agent = {
-            'financial': 'CFO',
-            'business': 'CSA',
-            'strategic': 'CSA',
-            'operational': 'COO',
-            'risk': 'CRO',
-            'legal': 'Legal_Expert',
-            'personal': 'Life_Coach',
-            'career': 'Career_Coach',
-            'technical': 'Tech_Expert',
-            'health': 'Therapist',
-            'gaming': 'Gaming_Expert'
-        }
-        
-        # Add agents based on perspectives
+        # Map perspectives to agents via the agent registry
         for perspective in perspectives:
-            if perspective in perspective_to_agent:
-                agent = perspective_to_agent[perspective]
-                if agent not in agent_chain:
-                    agent_chain.append(agent)
+            agent = agent_registry.agent_for_perspective(perspective)
+            if agent and agent not in agent_chain:
+                agent_chain.append(agent)
         
         # Ensure minimum one agent
         if not agent_chain:
@@ -242,59 +219,7 @@ class QueryAnalyzer:
     
     def get_agent_capabilities(self, agent_type: str) -> Dict[str, Any]:
         """Get capabilities and specializations for an agent type"""
-        capabilities = {
-            'CFO': {
-                'specializations': ['financial analysis', 'budgeting', 'investment planning', 'cost optimization'],
-                'optimal_provider': 'grok',
-                'strength': 'Financial expertise and quantitative analysis'
-            },
-            'CSA': {
-                'specializations': ['strategic planning', 'market analysis', 'competitive intelligence', 'business development'],
-                'optimal_provider': 'openai',
-                'strength': 'Strategic thinking and analytical reasoning'
-            },
-            'COO': {
-                'specializations': ['operations management', 'process optimization', 'project management', 'execution planning'],
-                'optimal_provider': 'openai',
-                'strength': 'Operational excellence and systematic thinking'
-            },
-            'CRO': {
-                'specializations': ['risk assessment', 'compliance', 'security analysis', 'threat mitigation'],
-                'optimal_provider': 'grok',
-                'strength': 'Risk analysis and protective strategies'
-            },
-            'Legal_Expert': {
-                'specializations': ['legal analysis', 'contract review', 'rights assessment', 'compliance guidance'],
-                'optimal_provider': 'openai',
-                'strength': 'Legal knowledge and analytical precision'
-            },
-            'Life_Coach': {
-                'specializations': ['personal development', 'goal setting', 'motivation', 'life planning'],
-                'optimal_provider': 'openai',
-                'strength': 'Personal guidance and motivational support'
-            },
-            'Career_Coach': {
-                'specializations': ['career development', 'job search', 'professional growth', 'networking'],
-                'optimal_provider': 'openai',
-                'strength': 'Career guidance and professional development'
-            },
-            'Tech_Expert': {
-                'specializations': ['technology analysis', 'system design', 'digital transformation', 'innovation'],
-                'optimal_provider': 'openai',
-                'strength': 'Technical expertise and systematic analysis'
-            },
-            'Gaming_Expert': {
-                'specializations': ['gaming strategy', 'competitive analysis', 'deck building', 'meta analysis'],
-                'optimal_provider': 'openai',
-                'strength': 'Gaming expertise and strategic analysis'
-            }
-        }
-        
-        return capabilities.get(agent_type, {
-            'specializations': ['general guidance'],
-            'optimal_provider': 'anthropic',
-            'strength': 'General problem-solving and analysis'
-        })
+        return agent_registry.get_capabilities(agent_type)
 
 # Initialize global analyzer
 query_analyzer = QueryAnalyzer()
\ No newline at end of file
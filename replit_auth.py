@@ -18,15 +18,23 @@ from werkzeug.local import LocalProxy
 
 from app import app, db
 from models import OAuth, User
+from identity_cache import identity_cache, register_user_invalidation
 
 login_manager = LoginManager(app)
+register_user_invalidation(User)
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(user_id)
+    return identity_cache.load_user(user_id)
 
 class UserSessionStorage(BaseStorage):
+    def _cache_key(self, blueprint):
+        return (current_user.get_id(), g.browser_session_key, blueprint.name)
+
     def get(self, blueprint):
+        return identity_cache.get_token(self._cache_key(blueprint), lambda: self._load(blueprint))
+
+    def _load(self, blueprint):
         try:
             token = db.session.query(OAuth).filter_by(
                 user_id=current_user.get_id(),
@@ -38,6 +46,7 @@ class UserSessionStorage(BaseStorage):
         return token
 
     def set(self, blueprint, token):
+        identity_cache.invalidate_token(self._cache_key(blueprint))
         db.session.query(OAuth).filter_by(
             user_id=current_user.get_id(),
             browser_session_key=g.browser_session_key,
@@ -50,8 +59,10 @@ class UserSessionStorage(BaseStorage):
         new_model.token = token
         db.session.add(new_model)
         db.session.commit()
+        identity_cache.invalidate_token(self._cache_key(blueprint))
 
     def delete(self, blueprint):
+        identity_cache.invalidate_token(self._cache_key(blueprint))
         db.session.query(OAuth).filter_by(
             user_id=current_user.get_id(),
             browser_session_key=g.browser_session_key,
@@ -126,6 +137,7 @@ def save_user(user_claims):
     user.profile_image_url = user_claims.get('profile_image_url')
     merged_user = db.session.merge(user)
     db.session.commit()
+    identity_cache.invalidate_user(merged_user.id)
     return merged_user
 
 @oauth_authorized.connect
@@ -10,6 +10,9 @@ from dataclasses import dataclass
 from datetime import datetime
 from ai_providers import ai_manager
 from agent_chain_orchestrator import AgentResponse
+from agent_registry import agent_registry
+from tracing import tracer
+from prometheus_metrics import prometheus_metrics
 
 @dataclass
 class SynthesisInsight:
@@ -124,7 +127,42 @@ class ResponseSynthesizer:
 ## Next Steps
 {next_steps}"""
         }
+        
+        # Static instructions sent as cacheable system segments; only expert content varies per call
+        self.instruction_prompts = {
+            'insights': """Analyze the expert response provided and extract the top 3 most important insights.
+            
+            For each insight, provide:
+            1. The insight in 1-2 sentences
+            2. Why it's important
+            3. Priority level (1-5)
+            
+            Format as numbered list.""",
+            
+            'conflicts': """Analyze the expert responses provided and identify any conflicting viewpoints or disagreements.
+            
+            If there are conflicts, describe them clearly. If no conflicts, respond with "No significant conflicts identified."
+            
+            Format conflicts as:
+            CONFLICT: [Brief description]
+            AGENT A: [Position]
+            AGENT B: [Position]
+            RESOLUTION: [Balanced perspective]""",
+            
+            'synthesis': """Create a comprehensive synthesis combining the expert perspectives provided.
+            
+            Create a well-structured, comprehensive response that:
+            1. Addresses the user's query directly
+            2. Integrates all expert perspectives
+            3. Provides clear, actionable recommendations
+            4. Maintains professional tone
+            5. Uses clear headings and organization
+            
+            Make it comprehensive but concise, focusing on actionable value."""
+        }
     
+    @tracer.traced("synthesis")
+    @prometheus_metrics.labels(agent="synthesizer")
     def synthesize_agent_responses(self, agent_responses: List[AgentResponse], 
                                  user_query: str = "") -> SynthesisResult:
         """
@@ -178,29 +216,23 @@ class ResponseSynthesizer:
             logging.error(f"Response synthesis failed: {str(e)}")
             return self._create_fallback_synthesis(agent_responses, user_query)
     
+    @tracer.traced("synthesis.extract_insights")
     def _extract_insights(self, responses: List[AgentResponse]) -> List[SynthesisInsight]:
         """Extract key insights from agent responses"""
         insights = []
         
         for response in responses:
             # Extract key points using AI analysis
-            insight_prompt = f"""Analyze this expert response and extract the top 3 most important insights:
-
-            Expert: {response.agent_type}
-            Content: {response.content}
-            
-            For each insight, provide:
-            1. The insight in 1-2 sentences
-            2. Why it's important
-            3. Priority level (1-5)
-            
-            Format as numbered list."""
+            insight_prompt = f"""Expert: {response.agent_type}
+            Content: {response.content}"""
             
             try:
                 ai_response = ai_manager.generate_response(
                     prompt=insight_prompt,
-                    provider="anthropic",
+                    system=self.instruction_prompts['insights'],
+                    preferred_provider="anthropic",
                     task_type="analysis",
+                    hedge=True,
                     max_tokens=500
                 )
                 
@@ -238,6 +270,7 @@ class ResponseSynthesizer:
         
         return insights
     
+    @tracer.traced("synthesis.overlaps")
     def _identify_overlapping_insights(self, insights: List[SynthesisInsight]) -> List[str]:
         """Identify overlapping insights across different agents"""
         overlaps = []
@@ -259,29 +292,22 @@ class ResponseSynthesizer:
         
         return overlaps
     
+    @tracer.traced("synthesis.conflicts")
     def _identify_conflicting_viewpoints(self, responses: List[AgentResponse]) -> List[Dict[str, Any]]:
         """Identify conflicting viewpoints between agents"""
         conflicts = []
         
         # Use AI to identify conflicts
         if len(responses) > 1:
-            conflict_prompt = f"""Analyze these expert responses and identify any conflicting viewpoints or disagreements:
-
-            {chr(10).join([f"{r.agent_type}: {r.content[:500]}..." for r in responses])}
-            
-            If there are conflicts, describe them clearly. If no conflicts, respond with "No significant conflicts identified."
-            
-            Format conflicts as:
-            CONFLICT: [Brief description]
-            AGENT A: [Position]
-            AGENT B: [Position]
-            RESOLUTION: [Balanced perspective]"""
+            conflict_prompt = "\n".join([f"{r.agent_type}: {r.content[:500]}..." for r in responses])
             
             try:
                 ai_response = ai_manager.generate_response(
                     prompt=conflict_prompt,
-                    provider="anthropic",
+                    system=self.instruction_prompts['conflicts'],
+                    preferred_provider="anthropic",
                     task_type="analysis",
+                    hedge=True,
                     max_tokens=800
                 )
                 
@@ -317,6 +343,7 @@ class ResponseSynthesizer:
         
         return conflicts
     
+    @tracer.traced("synthesis.structured")
     def _generate_structured_synthesis(self, responses: List[AgentResponse], 
                                      user_query: str, insights: List[SynthesisInsight],
                                      overlaps: List[str], conflicts: List[Dict[str, Any]]) -> str:
@@ -332,9 +359,7 @@ class ResponseSynthesizer:
         )
         
         # Generate final synthesis using AI
-        synthesis_prompt = f"""Create a comprehensive synthesis combining these expert perspectives:
-
-        Original Query: {user_query}
+        synthesis_prompt = f"""Original Query: {user_query}
         
         Expert Responses:
         {chr(10).join([f"{r.agent_type}: {r.content}" for r in responses])}
@@ -346,22 +371,15 @@ class ResponseSynthesizer:
         {chr(10).join([f"- {overlap}" for overlap in overlaps])}
         
         Conflicting Viewpoints:
-        {chr(10).join([f"- {conflict['description']}: {conflict['resolution']}" for conflict in conflicts])}
-        
-        Create a well-structured, comprehensive response that:
-        1. Addresses the user's query directly
-        2. Integrates all expert perspectives
-        3. Provides clear, actionable recommendations
-        4. Maintains professional tone
-        5. Uses clear headings and organization
-        
-        Make it comprehensive but concise, focusing on actionable value."""
+        {chr(10).join([f"- {conflict['description']}: {conflict['resolution']}" for conflict in conflicts])}"""
         
         try:
             ai_response = ai_manager.generate_response(
                 prompt=synthesis_prompt,
-                provider="anthropic",
+                system=self.instruction_prompts['synthesis'],
+                preferred_provider="anthropic",
                 task_type="analysis",
+                hedge=True,
                 max_tokens=2500
             )
             
@@ -376,11 +394,13 @@ class ResponseSynthesizer:
     
     def _select_synthesis_template(self, agent_types: List[str]) -> str:
         """Select appropriate synthesis template based on agent types"""
-        if any(agent in ['CFO', 'CSA', 'COO', 'CRO'] for agent in agent_types):
+        groups = {agent_registry.get(agent).synthesis_group for agent in agent_types}
+        
+        if 'business' in groups:
             return 'business_comprehensive'
-        elif any(agent in ['Legal_Expert'] for agent in agent_types):
+        elif 'legal' in groups:
             return 'legal_comprehensive'
-        elif any(agent in ['Life_Coach', 'Career_Coach'] for agent in agent_types):
+        elif 'personal' in groups:
             return 'personal_comprehensive'
         else:
             return 'general_comprehensive'
@@ -391,22 +411,11 @@ class ResponseSynthesizer:
         """Prepare components for synthesis template"""
         components = {}
         
-        # Group responses by type
+        # Group responses by the component each agent contributes
         for response in responses:
-            if response.agent_type == 'CFO':
-                components['financial_analysis'] = response.content
-            elif response.agent_type == 'CSA':
-                components['strategic_analysis'] = response.content
-            elif response.agent_type == 'COO':
-                components['operational_analysis'] = response.content
-            elif response.agent_type == 'CRO':
-                components['risk_analysis'] = response.content
-            elif response.agent_type == 'Legal_Expert':
-                components['legal_analysis'] = response.content
-            elif response.agent_type == 'Life_Coach':
-                components['personal_analysis'] = response.content
-            elif response.agent_type == 'Career_Coach':
-                components['career_analysis'] = response.content
+            component = agent_registry.get(response.agent_type).synthesis_component
+            if component:
+                components[component] = response.content
         
         # Add summary components
         components['summary'] = f"Analysis of: {user_query}"
@@ -440,6 +449,7 @@ class ResponseSynthesizer:
         
         return synthesis
     
+    @tracer.traced("synthesis.action_items")
     def _extract_action_items(self, responses: List[AgentResponse]) -> List[str]:
         """Extract actionable items from agent responses"""
         action_items = []
@@ -456,6 +466,7 @@ class ResponseSynthesizer:
         
         return list(set(action_items))  # Remove duplicates
     
+    @tracer.traced("synthesis.confidence")
     def _calculate_synthesis_confidence(self, responses: List[AgentResponse], 
                                       insights: List[SynthesisInsight]) -> float:
         """Calculate confidence score for the synthesis"""
@@ -481,6 +492,7 @@ class ResponseSynthesizer:
         final_confidence = avg_response_confidence + perspective_bonus + insight_bonus - length_penalty
         return min(max(final_confidence, 0.0), 1.0)
     
+    @tracer.traced("synthesis.quality")
     def _assess_synthesis_quality(self, synthesis: str, responses: List[AgentResponse]) -> str:
         """Assess the quality of the synthesis"""
         word_count = len(synthesis.split())
@@ -521,7 +533,10 @@ class ResponseSynthesizer:
         """Get statistics about synthesis performance"""
         return {
             'available_templates': list(self.synthesis_templates.keys()),
-            'supported_agents': ['CFO', 'CSA', 'COO', 'CRO', 'Legal_Expert', 'Life_Coach', 'Career_Coach'],
+            'supported_agents': [
+                agent_type for agent_type, profile in agent_registry.profiles.items()
+                if profile.synthesis_component
+            ],
             'synthesis_capabilities': [
                 'Conflict resolution',
                 'Insight extraction',
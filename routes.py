@@ -1,22 +1,83 @@
-from flask import render_template, request, redirect, url_for, flash, jsonify, session
+from flask import render_template, request, redirect, url_for, flash, jsonify, session, g, Response
 from flask_login import current_user, login_required
 from app import app, db
 from replit_auth import make_replit_blueprint, require_login
 from models import User, Goal, Task, AIConversation, BusinessProcess, FinancialData, ServiceTemplate, Payment
-from goal_achievement import goal_system
-from business_automation import business_automation
-from financial_analysis import financial_system
-from service_templates import service_templates
-from admin_dashboard import admin_dashboard
-from payment_processing import payment_system
-from beekeeping_expert import beekeeping_expert
-from ai_providers import ai_manager
-from query_analyzer import query_analyzer
-from agent_chain_orchestrator import agent_orchestrator
-from response_synthesizer import response_synthesizer
+from lazy_import import lazy_singleton
+from metrics_rollup import metrics_rollup
+from job_queue import job_queue
+from conversation_store import conversation_store
+from automation_runner import automation_runner
+from bootstrap import bootstrap
+from tracing import tracer
+from prometheus_metrics import prometheus_metrics
+from sampling_profiler import sampling_profiler
+from usage_budget import usage_budget
+import job_handlers  # noqa: F401
+import os
+import hmac
 import json
 import logging
 
+# Subsystems (and the AI/Stripe SDKs behind them) load on the first request that uses them
+goal_system = lazy_singleton("goal_achievement", "goal_system")
+business_automation = lazy_singleton("business_automation", "business_automation")
+financial_system = lazy_singleton("financial_analysis", "financial_system")
+service_templates = lazy_singleton("service_templates", "service_templates")
+admin_dashboard = lazy_singleton("admin_dashboard", "admin_dashboard")
+payment_system = lazy_singleton("payment_processing", "payment_system")
+beekeeping_expert = lazy_singleton("beekeeping_expert", "beekeeping_expert")
+ai_manager = lazy_singleton("ai_providers", "ai_manager")
+query_analyzer = lazy_singleton("query_analyzer", "query_analyzer")
+
+# Trace every request; the trace id is returned in the X-Trace-Id header
+@app.before_request
+def start_request_trace():
+    if request.endpoint == 'static':
+        return
+    route = request.url_rule.rule if request.url_rule else request.path
+    g.trace_span, g.trace_token = tracer.start_span(
+        f"{request.method} {route}", kind="server", **{"http.method": request.method, "http.route": route}
+    )
+
+@app.after_request
+def add_trace_header(response):
+    span = g.get('trace_span')
+    if span is not None:
+        span.set_attribute("http.status_code", response.status_code)
+        response.headers["X-Trace-Id"] = span.trace_id
+    return response
+
+@app.teardown_request
+def end_request_trace(error=None):
+    span = g.pop('trace_span', None)
+    if span is not None:
+        if error is not None:
+            span.record_exception(error)
+        tracer.end_span(span, g.pop('trace_token', None))
+
+@app.before_request
+def start_request_profile():
+    if request.endpoint == 'static':
+        return
+    route = request.url_rule.rule if request.url_rule else request.path
+    if sampling_profiler.should_profile(route):
+        g.profile_token = sampling_profiler.start(route)
+
+@app.teardown_request
+def end_request_profile(error=None):
+    sampling_profiler.stop(g.pop('profile_token', None))
+
+@app.before_request
+def bind_usage_budget():
+    # LLM calls made while serving a user are charged to their tier's budget; admins are not limited
+    if request.endpoint != 'static' and current_user.is_authenticated and not current_user.is_admin:
+        g.budget_token = usage_budget.bind(current_user.id, current_user.subscription_tier)
+
+@app.teardown_request
+def unbind_usage_budget(error=None):
+    usage_budget.unbind(g.pop('budget_token', None))
+
 # Register Replit Auth blueprint
 app.register_blueprint(make_replit_blueprint(), url_prefix="/auth")
 
@@ -25,6 +86,24 @@ app.register_blueprint(make_replit_blueprint(), url_prefix="/auth")
 def make_session_permanent():
     session.permanent = True
 
+# Start background threads (bootstrap, metrics rollup, job workers, automation runner) in each worker process
+@app.before_request
+def start_background_services():
+    bootstrap.ensure_started()
+    metrics_rollup.ensure_started()
+    job_queue.ensure_started()
+    automation_runner.ensure_started()
+
+@app.route('/health/ready')
+def readiness():
+    """Readiness probe: 200 once the one-time bootstrap (default data) has completed"""
+    try:
+        status = bootstrap.get_status()
+        return jsonify(status), 200 if status["ready"] else 503
+    except Exception as e:
+        logging.error(f"Readiness check error: {str(e)}")
+        return jsonify({"ready": False, "error": str(e)}), 503
+
 @app.route('/')
 def index():
     """Main landing page"""
@@ -117,15 +196,15 @@ def ai_chat():
         if not prompt:
             return jsonify({"error": "Prompt is required"})
         
-        # Generate AI response
+        # Generate AI response (auto-routed chat is hedged to cut tail latency)
         if provider == 'auto':
-            response = ai_manager.generate_response(prompt, task_type=task_type)
+            response = ai_manager.generate_response(prompt, task_type=task_type, hedge=True)
         else:
             response = ai_manager.generate_response(prompt, provider=provider, task_type=task_type)
         
         if response.get('success'):
             # Store conversation
-            conversation = AIConversation(
+            conversation_id = conversation_store.save(
                 user_id=current_user.id,
                 provider=response['provider'],
                 model=response['model'],
@@ -134,18 +213,23 @@ def ai_chat():
                 tokens_used=response.get('tokens_used', 0),
                 cost=response.get('cost', 0)
             )
-            db.session.add(conversation)
-            db.session.commit()
             
             return jsonify({
                 "success": True,
                 "response": response['content'],
                 "provider": response['provider'],
                 "model": response['model'],
-                "conversation_id": conversation.id,
+                "conversation_id": conversation_id,
                 "tokens_used": response.get('tokens_used', 0),
-                "cost": response.get('cost', 0)
+                "cost": response.get('cost', 0),
+                "trace_id": tracer.current_trace_id()
             })
+        elif response.get('budget_exceeded'):
+            return jsonify({
+                "error": response['error'],
+                "budget_exceeded": True,
+                "usage": usage_budget.get_usage(current_user.id, current_user.subscription_tier)
+            }), 429
         else:
             return jsonify({"error": response.get('error', 'AI generation failed')})
             
@@ -179,6 +263,7 @@ def comprehensive_analysis():
     """
     New endpoint that automatically chains relevant agents
     for the most comprehensive response possible
+    Runs as a background job; poll /api/jobs/<job_id> for the result
     """
     try:
         # Get request data
@@ -188,108 +273,35 @@ def comprehensive_analysis():
         if not user_query:
             return jsonify({"error": "Query is required"}), 400
         
-        # Optional parameters
-        complexity_preference = data.get('complexity', 'auto')  # auto, simple, comprehensive
-        max_agents = data.get('max_agents', 5)
-        
-        # Analyze what expertise is needed
-        analysis = query_analyzer.analyze_user_query(user_query)
+        # Refuse up front when the budget is spent; the job itself fits the chain to what is left
+        if usage_budget.current_account() is not None:
+            usage = usage_budget.get_usage(current_user.id, current_user.subscription_tier)
+            if usage.get("used_fraction", 0.0) >= 1.0:
+                return jsonify({"error": "Usage budget exhausted", "budget_exceeded": True, "usage": usage}), 429
         
-        # Adjust agent chain based on preferences
-        agent_chain = analysis.agent_chain
-        if complexity_preference == 'simple':
-            agent_chain = agent_chain[:2]  # Limit to 2 agents
-        elif complexity_preference == 'comprehensive':
-            # Keep all agents, maybe add more
-            pass
-        
-        # Limit chain length
-        agent_chain = agent_chain[:max_agents]
-        
-        # Process the agent chain
-        chain_result = agent_orchestrator.process_chain(
-            query=user_query,
-            agent_chain=agent_chain,
-            user_context=f"User: {current_user.first_name or 'User'}"
-        )
+        job_id = job_queue.enqueue("comprehensive_analysis", {
+            "query": user_query,
+            "complexity": data.get('complexity', 'auto'),  # auto, simple, comprehensive
+            "max_agents": data.get('max_agents', 5),
+            "user_name": current_user.first_name
+        }, user_id=current_user.id)
         
-        # Synthesize comprehensive answer
-        synthesis_result = response_synthesizer.synthesize_agent_responses(
-            chain_result.responses, user_query
-        )
-        
-        # Store conversation history for each agent
-        conversation_ids = []
-        for response in chain_result.responses:
-            conversation = AIConversation(
-                user_id=current_user.id,
-                provider=response.provider,
-                model=response.model,
-                prompt=f"[{response.agent_type}] {user_query}",
-                response=response.content,
-                tokens_used=response.tokens_used,
-                cost=response.cost
-            )
-            db.session.add(conversation)
-            conversation_ids.append(conversation.id)
-        
-        # Store synthesis as a separate conversation
-        synthesis_conversation = AIConversation(
-            user_id=current_user.id,
-            provider="synthesis",
-            model="multi-agent",
-            prompt=user_query,
-            response=synthesis_result.comprehensive_answer,
-            tokens_used=chain_result.total_tokens,
-            cost=chain_result.total_cost
-        )
-        db.session.add(synthesis_conversation)
-        db.session.commit()
-        
-        # Calculate confidence score
-        confidence_score = min(synthesis_result.confidence_score, chain_result.confidence_score)
-        
-        return jsonify({
-            "success": True,
-            "comprehensive_answer": synthesis_result.comprehensive_answer,
-            "perspectives_included": analysis.required_perspectives,
-            "agents_consulted": agent_chain,
-            "confidence_score": confidence_score,
-            "processing_time": chain_result.processing_time,
-            "total_tokens": chain_result.total_tokens,
-            "total_cost": chain_result.total_cost,
-            "synthesis_quality": synthesis_result.synthesis_quality,
-            "key_insights": [
-                {
-                    "content": insight.content,
-                    "source_agents": insight.source_agents,
-                    "priority": insight.priority
-                }
-                for insight in synthesis_result.key_insights
-            ],
-            "action_items": synthesis_result.action_items,
-            "conflicting_viewpoints": synthesis_result.conflicting_viewpoints,
-            "consensus_points": synthesis_result.consensus_points,
-            "conversation_id": synthesis_conversation.id,
-            "agent_responses": [
-                {
-                    "agent_type": response.agent_type,
-                    "provider": response.provider,
-                    "model": response.model,
-                    "content": response.content,
-                    "tokens_used": response.tokens_used,
-                    "cost": response.cost,
-                    "confidence_score": response.confidence_score,
-                    "perspective": response.perspective
-                }
-                for response in chain_result.responses
-            ]
-        })
+        return _job_accepted(job_id)
         
     except Exception as e:
         logging.error(f"Comprehensive analysis error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/usage')
+@require_login
+def api_usage():
+    """LLM spend of the current user against their tier's daily and 30-day budgets"""
+    try:
+        return jsonify(usage_budget.get_usage(current_user.id, current_user.subscription_tier))
+    except Exception as e:
+        logging.error(f"Usage lookup error: {str(e)}")
+        return jsonify({"error": str(e)})
+
 @app.route('/api/analyze-query', methods=['POST'])
 @require_login
 def analyze_query():
@@ -322,7 +334,12 @@ def analyze_query():
             },
             "agent_capabilities": agent_capabilities,
             "estimated_cost": analysis.estimated_tokens * 0.00002,  # Rough estimate
-            "estimated_time": len(analysis.agent_chain) * 5  # Rough estimate in seconds
+            "estimated_time": len(analysis.agent_chain) * 5,  # Rough estimate in seconds
+            # What the budget allows: agents that fit and whether cheaper models will be used
+            "budget": usage_budget.plan_chain(
+                lambda agents: query_analyzer._estimate_token_usage(analysis.complexity_level, agents),
+                len(analysis.agent_chain)
+            )
         })
         
     except Exception as e:
@@ -415,11 +432,14 @@ def generate_proposal():
         if not all([template_id, client_name, project_details]):
             return jsonify({"error": "Missing required fields"})
         
-        result = service_templates.generate_proposal(
-            int(template_id), client_name, project_details, budget_range
-        )
+        job_id = job_queue.enqueue("generate_proposal", {
+            "template_id": int(template_id),
+            "client_name": client_name,
+            "project_details": project_details,
+            "budget_range": budget_range
+        }, user_id=current_user.id)
         
-        return jsonify(result)
+        return _job_accepted(job_id)
         
     except Exception as e:
         logging.error(f"Proposal generation error: {str(e)}")
@@ -444,26 +464,52 @@ def run_automation():
     try:
         automation_type = request.form.get('automation_type')
         
-        if automation_type == 'client_acquisition':
-            # Create or get existing process
-            process = business_automation.create_automation_process('client_acquisition')
-            result = business_automation.run_client_acquisition_automation(process.id)
-        elif automation_type == 'service_fulfillment':
-            service_type = request.form.get('service_type', 'general')
-            process = business_automation.create_automation_process('service_fulfillment')
-            result = business_automation.run_service_fulfillment_automation(process.id, service_type)
-        elif automation_type == 'revenue_optimization':
-            process = business_automation.create_automation_process('revenue_optimization')
-            result = business_automation.run_revenue_optimization(process.id)
-        else:
+        if automation_type not in ('client_acquisition', 'service_fulfillment', 'revenue_optimization'):
             return jsonify({"error": "Invalid automation type"})
         
-        return jsonify(result)
+        run_interval_minutes = request.form.get('run_interval_minutes', type=int)
+        if run_interval_minutes is not None and run_interval_minutes <= 0:
+            run_interval_minutes = None
+        
+        schedule_error = business_automation.schedule_error(current_user.id, run_interval_minutes)
+        if schedule_error:
+            return jsonify({"error": schedule_error}), 400
+        
+        job_id = job_queue.enqueue("run_automation", {
+            "automation_type": automation_type,
+            "service_type": request.form.get('service_type', 'general'),
+            "run_interval_minutes": run_interval_minutes
+        }, user_id=current_user.id)
+        
+        return _job_accepted(job_id)
         
     except Exception as e:
         logging.error(f"Automation execution error: {str(e)}")
         return jsonify({"error": str(e)})
 
+@app.route('/api/automations/<int:process_id>/pause', methods=['POST'])
+@require_login
+def pause_automation(process_id):
+    """Stop a scheduled automation from repeating"""
+    result = business_automation.pause_automation_process(process_id, current_user.id, current_user.is_admin)
+    return jsonify(result), 404 if "error" in result else 200
+
+@app.route('/api/automations/<int:process_id>/resume', methods=['POST'])
+@require_login
+def resume_automation(process_id):
+    """Schedule a paused automation again"""
+    result = business_automation.resume_automation_process(process_id, current_user.id, current_user.is_admin)
+    if "error" in result:
+        return jsonify(result), 404 if result["error"] == "Process not found" else 400
+    return jsonify(result)
+
+@app.route('/api/automations/<int:process_id>', methods=['DELETE'])
+@require_login
+def delete_automation(process_id):
+    """Delete an automation and its schedule"""
+    result = business_automation.delete_automation_process(process_id, current_user.id, current_user.is_admin)
+    return jsonify(result), 404 if "error" in result else 200
+
 @app.route('/admin')
 @require_login
 def admin_dashboard_page():
@@ -488,13 +534,175 @@ def admin_report():
         if not current_user.is_admin:
             return jsonify({"error": "Unauthorized"}), 403
         
-        report = admin_dashboard.generate_admin_report()
-        return jsonify(report)
+        job_id = job_queue.enqueue("admin_report", user_id=current_user.id)
+        return _job_accepted(job_id)
         
     except Exception as e:
         logging.error(f"Admin report error: {str(e)}")
         return jsonify({"error": str(e)})
 
+@app.route('/admin/automation/sweep', methods=['POST'])
+@require_login
+def admin_automation_sweep():
+    """Queue an immediate run of all due scheduled automations"""
+    try:
+        if not current_user.is_admin:
+            return jsonify({"error": "Unauthorized"}), 403
+        
+        job_id = job_queue.enqueue("automation_sweep", user_id=current_user.id)
+        return _job_accepted(job_id)
+        
+    except Exception as e:
+        logging.error(f"Automation sweep error: {str(e)}")
+        return jsonify({"error": str(e)})
+
+@app.route('/admin/compression/backfill', methods=['POST'])
+@require_login
+def admin_compression_backfill():
+    """Queue compression of stored LLM text, optionally training a new dictionary first"""
+    try:
+        if not current_user.is_admin:
+            return jsonify({"error": "Unauthorized"}), 403
+        
+        data = request.get_json(silent=True) or {}
+        job_id = job_queue.enqueue("compress_text_backfill", {
+            "train_dictionary": bool(data.get("train_dictionary", False)),
+            "batch_size": int(data.get("batch_size", 200))
+        }, user_id=current_user.id)
+        return _job_accepted(job_id)
+        
+    except Exception as e:
+        logging.error(f"Compression backfill error: {str(e)}")
+        return jsonify({"error": str(e)})
+
+@app.route('/admin/traces/<trace_id>')
+@require_login
+def admin_trace(trace_id):
+    """Span tree of one trace from the local trace export"""
+    try:
+        if not current_user.is_admin:
+            return jsonify({"error": "Unauthorized"}), 403
+        
+        trace = tracer.get_trace(trace_id)
+        if not trace["span_count"]:
+            return jsonify({"error": "Trace not found"}), 404
+        return jsonify(trace)
+        
+    except Exception as e:
+        logging.error(f"Trace lookup error: {str(e)}")
+        return jsonify({"error": str(e)})
+
+@app.route('/admin/profiler', methods=['GET', 'POST'])
+@require_login
+def admin_profiler():
+    """Sampling profiler: GET reports per-function time, POST turns it on/off for all workers"""
+    try:
+        if not current_user.is_admin:
+            return jsonify({"error": "Unauthorized"}), 403
+        
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            config = sampling_profiler.configure(
+                enabled=bool(data.get("enabled", True)),
+                sample_rate=data.get("sample_rate"),
+                target=data.get("target"),
+                duration_seconds=data.get("duration_seconds"),
+                interval_ms=data.get("interval_ms"),
+                reset=bool(data.get("reset", False))
+            )
+            return jsonify({"success": True, "config": config})
+        
+        return jsonify(sampling_profiler.report(
+            target=request.args.get("target"), limit=request.args.get("limit", 30, type=int)
+        ))
+        
+    except Exception as e:
+        logging.error(f"Profiler error: {str(e)}")
+        return jsonify({"error": str(e)})
+
+@app.route('/admin/profiler/flamegraph')
+@require_login
+def admin_profiler_flamegraph():
+    """Collapsed stacks of all workers, for flamegraph.pl / speedscope"""
+    try:
+        if not current_user.is_admin:
+            return jsonify({"error": "Unauthorized"}), 403
+        
+        return Response(sampling_profiler.flamegraph(target=request.args.get("target")), mimetype="text/plain",
+                        headers={"Content-Disposition": "attachment; filename=operatoros.folded"})
+        
+    except Exception as e:
+        logging.error(f"Profiler flamegraph error: {str(e)}")
+        return jsonify({"error": str(e)})
+
+@app.route('/metrics')
+def metrics():
+    """
+    Prometheus scrape endpoint: LLM call counts, latency, tokens and cost summed over all workers
+    Scrapers authenticate with METRICS_TOKEN as a bearer token; without one only admins can read it.
+    """
+    token = os.environ.get("METRICS_TOKEN")
+    authorization = request.headers.get("Authorization", "")
+    if token and authorization:
+        authorized = hmac.compare_digest(authorization, f"Bearer {token}")
+    else:
+        authorized = current_user.is_authenticated and current_user.is_admin
+    if not authorized:
+        return Response("Unauthorized\n", status=401, mimetype="text/plain")
+    return Response(prometheus_metrics.render(), mimetype="text/plain; version=0.0.4")
+
+def _job_accepted(job_id: str):
+    """202 response pointing the client at the job status endpoint"""
+    return jsonify({
+        "success": True,
+        "job_id": job_id,
+        "trace_id": tracer.current_trace_id(),
+        "status": "queued",
+        "status_url": url_for('job_status', job_id=job_id)
+    }), 202
+
+def _get_user_job(job_id: str):
+    """Fetch a job visible to the current user"""
+    job = job_queue.get(job_id)
+    if not job or (job.user_id != current_user.id and not current_user.is_admin):
+        return None
+    return job
+
+@app.route('/api/jobs/<job_id>')
+@require_login
+def job_status(job_id):
+    """Background job status, including the result once it has succeeded"""
+    job = _get_user_job(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job_queue.to_dict(job))
+
+@app.route('/api/jobs/<job_id>/result')
+@require_login
+def job_result(job_id):
+    """Result of a finished job; 202 while it is still queued or running"""
+    job = _get_user_job(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    
+    status = job_queue.to_dict(job)
+    if job.status == "succeeded":
+        return jsonify(status["result"])
+    if job.status in ("queued", "running"):
+        return jsonify(status), 202
+    return jsonify({"error": job.error or f"Job {job.status}", "status": job.status}), 409
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+@require_login
+def cancel_job(job_id):
+    """Cancel a queued job or request cancellation of a running one"""
+    job = _get_user_job(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    
+    status = job_queue.cancel(job_id)
+    return jsonify({"success": True, "job_id": job_id, "status": status})
+
 @app.route('/payment/create', methods=['POST'])
 @require_login
 def create_payment():
@@ -661,17 +869,3 @@ def page_not_found(e):
 @app.errorhandler(500)
 def internal_server_error(e):
     return render_template('500.html'), 500
-
-# Initialize default data
-_initialized = False
-
-@app.before_request
-def initialize_default_data():
-    """Initialize default service templates"""
-    global _initialized
-    if not _initialized:
-        try:
-            service_templates.create_default_templates()
-            _initialized = True
-        except Exception as e:
-            logging.error(f"Default data initialization error: {str(e)}")
@@ -0,0 +1,299 @@
+"""
+Sampling Profiler - OperatorOS
+Admin-toggled stack sampling of selected requests and jobs, stored as flamegraph-ready collapsed stacks
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+PROFILER_DIR = os.environ.get('PROFILER_DIR', os.path.join(tempfile.gettempdir(), 'operatoros_profiles'))
+PROFILER_INTERVAL_MS = float(os.environ.get('PROFILER_INTERVAL_MS', '5'))
+PROFILER_MAX_DEPTH = int(os.environ.get('PROFILER_MAX_DEPTH', '96'))
+# Seconds between checks of the shared config file (how fast a toggle reaches every worker)
+CONFIG_CHECK_INTERVAL = 1.0
+# Seconds between writes of a worker's collected stacks to its file
+FLUSH_INTERVAL = 10.0
+
+DEFAULT_CONFIG = {"enabled": False, "sample_rate": 0.0, "target": None, "until": None,
+                  "interval_ms": PROFILER_INTERVAL_MS, "generation": 0}
+
+class SamplingProfiler:
+    """
+    Profiling is switched on through a small JSON config file shared by all gunicorn workers.
+    A selected request or job registers its thread; one sampler thread per process then reads
+    that thread's stack from sys._current_frames() every interval. Each sample is weighted by
+    the wall time since the previous one and added to a collapsed stack rooted at the route or
+    job name ("/ai_chat;flask.app:Flask.wsgi_app;...;routes:ai_chat;... <microseconds>"). When nothing is selected
+    the cost is one monotonic clock read per request, plus a stat() of the config once a second.
+    """
+
+    def __init__(self, directory: str = PROFILER_DIR):
+        self.directory = directory
+        self.config_path = os.path.join(directory, "profiler.json")
+        self.config = dict(DEFAULT_CONFIG)
+        self._config_mtime = None
+        self._next_config_check = 0.0
+        self._stacks: Dict[str, int] = {}
+        self._active: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._pid = None
+        self._last_flush = time.monotonic()
+        self._dirty = False
+        self.stats = {"profiled": 0, "samples": 0}
+
+    # --- configuration ---
+
+    def configure(self, enabled: bool, sample_rate: float = None, target: str = None,
+                  duration_seconds: float = None, interval_ms: float = None, reset: bool = False) -> Dict[str, Any]:
+        """Turn profiling on or off for every worker; `target` limits it to one route rule or job:<type>"""
+        config = dict(self._refresh_config(force=True))
+        config["enabled"] = bool(enabled)
+        config["target"] = target or None
+        # A named target is profiled on every hit unless a rate is given
+        config["sample_rate"] = min(1.0, max(0.0, float(
+            sample_rate if sample_rate is not None else (1.0 if target else 0.01)
+        )))
+        config["interval_ms"] = max(1.0, float(interval_ms or config.get("interval_ms") or PROFILER_INTERVAL_MS))
+        config["until"] = time.time() + float(duration_seconds) if enabled and duration_seconds else None
+        if reset:
+            # Workers drop their in-memory stacks when they see a new generation
+            config["generation"] = int(config.get("generation", 0)) + 1
+            self._remove_stack_files()
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.config_path + ".tmp", "w") as f:
+            json.dump(config, f)
+        os.replace(self.config_path + ".tmp", self.config_path)
+        self._refresh_config(force=True)
+        return config
+
+    def _refresh_config(self, force: bool = False) -> Dict[str, Any]:
+        now = time.monotonic()
+        if not force and now < self._next_config_check:
+            return self.config
+        self._next_config_check = now + CONFIG_CHECK_INTERVAL
+        try:
+            mtime = os.stat(self.config_path).st_mtime_ns
+        except FileNotFoundError:
+            return self.config
+        if mtime == self._config_mtime and not force:
+            return self.config
+        try:
+            with open(self.config_path) as f:
+                config = dict(DEFAULT_CONFIG, **json.load(f))
+        except (OSError, ValueError) as e:
+            logging.error(f"Profiler config unreadable: {str(e)}")
+            return self.config
+        with self._lock:
+            if config.get("generation") != self.config.get("generation"):
+                self._stacks = {}
+            self.config, self._config_mtime = config, mtime
+        return config
+
+    def should_profile(self, name: str) -> bool:
+        """Whether a request (route rule) or job (job:<type>) should be sampled"""
+        config = self._refresh_config()
+        if not config["enabled"]:
+            return False
+        if config["until"] and time.time() > config["until"]:
+            return False
+        if config["target"] and config["target"] != name:
+            return False
+        return random.random() < config["sample_rate"]
+
+    # --- sampling ---
+
+    def start(self, name: str) -> Optional[int]:
+        """Sample the calling thread under `name` until stop(); returns a token for stop()"""
+        self.ensure_started()
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._active[thread_id] = name.replace(";", ":")
+            self.stats["profiled"] += 1
+        self._wake.set()
+        return thread_id
+
+    def stop(self, token: Optional[int]):
+        if token is None:
+            return
+        with self._lock:
+            self._active.pop(token, None)
+
+    @contextmanager
+    def profile(self, name: str):
+        """Sample the block if the profiler selects `name`"""
+        token = self.start(name) if self.should_profile(name) else None
+        try:
+            yield
+        finally:
+            self.stop(token)
+
+    def ensure_started(self):
+        """Start the sampler thread in this process (restarting it after fork)"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._stacks, self._active = {}, {}
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        sampler_id = threading.get_ident()
+        last = time.perf_counter()
+        while True:
+            with self._lock:
+                idle = not self._active
+            if idle:
+                self._maybe_flush(force=self._dirty)
+                self._wake.wait(FLUSH_INTERVAL)
+                self._wake.clear()
+                last = time.perf_counter()
+                continue
+
+            time.sleep(self.config.get("interval_ms", PROFILER_INTERVAL_MS) / 1000.0)
+            now = time.perf_counter()
+            # Weight by real elapsed time: under load the sampler runs late, not less often
+            elapsed_us = int((now - last) * 1e6)
+            last = now
+            try:
+                self._sample(sys._current_frames(), elapsed_us, sampler_id)
+            except Exception as e:
+                logging.error(f"Profiler sample failed: {str(e)}")
+            self._maybe_flush()
+
+    def _sample(self, frames: Dict[int, Any], weight_us: int, sampler_id: int):
+        with self._lock:
+            active = list(self._active.items())
+        for thread_id, name in active:
+            frame = frames.get(thread_id)
+            if frame is None or thread_id == sampler_id:
+                continue
+            stack = []
+            while frame is not None and len(stack) < PROFILER_MAX_DEPTH:
+                module = frame.f_globals.get("__name__") or os.path.basename(frame.f_code.co_filename)
+                stack.append(f"{module}:{frame.f_code.co_qualname}".replace(";", ":").replace(" ", "_"))
+                frame = frame.f_back
+            key = name + ";" + ";".join(reversed(stack))
+            with self._lock:
+                self._stacks[key] = self._stacks.get(key, 0) + weight_us
+                self._dirty = True
+                self.stats["samples"] += 1
+
+    # --- storage ---
+
+    def _stack_path(self, pid: int) -> str:
+        return os.path.join(self.directory, f"stacks_{pid}.folded")
+
+    def _maybe_flush(self, force: bool = False):
+        if force or time.monotonic() - self._last_flush >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """Write this process's collapsed stacks to its file (atomically replaced)"""
+        self._last_flush = time.monotonic()
+        self._refresh_config()
+        with self._lock:
+            stacks, self._dirty = dict(self._stacks), False
+        if not stacks:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._stack_path(os.getpid())
+            with open(path + ".tmp", "w") as f:
+                f.writelines(f"{stack} {weight}\n" for stack, weight in stacks.items())
+            os.replace(path + ".tmp", path)
+        except Exception as e:
+            logging.error(f"Profiler flush failed: {str(e)}")
+
+    def _remove_stack_files(self):
+        with self._lock:
+            self._stacks = {}
+        if not os.path.isdir(self.directory):
+            return
+        for filename in os.listdir(self.directory):
+            if filename.startswith("stacks_"):
+                os.remove(os.path.join(self.directory, filename))
+
+    def collapsed_stacks(self, target: str = None) -> Dict[str, int]:
+        """Stacks from every worker (microseconds per stack), optionally for one route or job"""
+        self.flush()
+        merged: Dict[str, int] = {}
+        if not os.path.isdir(self.directory):
+            return merged
+        for filename in os.listdir(self.directory):
+            if not (filename.startswith("stacks_") and filename.endswith(".folded")):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    for line in f:
+                        stack, _, weight = line.rstrip("\n").rpartition(" ")
+                        if stack and (target is None or stack.split(";", 1)[0] == target):
+                            merged[stack] = merged.get(stack, 0) + int(weight)
+            except (OSError, ValueError):
+                continue
+        return merged
+
+    def flamegraph(self, target: str = None) -> str:
+        """Collapsed-stack text for flamegraph.pl, speedscope or inferno (weights in microseconds)"""
+        return "".join(f"{stack} {weight}\n" for stack, weight in sorted(self.collapsed_stacks(target).items()))
+
+    def report(self, target: str = None, limit: int = 30) -> Dict[str, Any]:
+        """Per-function cumulative and self time, and time per profiled route or job"""
+        stacks = self.collapsed_stacks(target)
+        cumulative: Dict[str, int] = {}
+        own: Dict[str, int] = {}
+        targets: Dict[str, int] = {}
+        for stack, weight in stacks.items():
+            frames = stack.split(";")
+            targets[frames[0]] = targets.get(frames[0], 0) + weight
+            # A recursive function counts once per stack
+            for frame in set(frames[1:]):
+                cumulative[frame] = cumulative.get(frame, 0) + weight
+            if len(frames) > 1:
+                own[frames[-1]] = own.get(frames[-1], 0) + weight
+
+        total = sum(stacks.values())
+        functions = [
+            {
+                "function": frame,
+                "cumulative_ms": round(weight / 1000, 2),
+                "cumulative_pct": round(100.0 * weight / total, 1) if total else 0.0,
+                "self_ms": round(own.get(frame, 0) / 1000, 2)
+            }
+            for frame, weight in sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:limit]
+        ]
+        return {
+            "config": self._refresh_config(force=True),
+            "total_ms": round(total / 1000, 2),
+            "targets": {name: round(weight / 1000, 2)
+                        for name, weight in sorted(targets.items(), key=lambda item: item[1], reverse=True)},
+            "functions": functions,
+            "self_time": [
+                {"function": frame, "self_ms": round(weight / 1000, 2)}
+                for frame, weight in sorted(own.items(), key=lambda item: item[1], reverse=True)[:limit]
+            ]
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        config = self._refresh_config()
+        with self._lock:
+            return dict(self.stats, enabled=config["enabled"], target=config["target"],
+                        sample_rate=config["sample_rate"], active=len(self._active), stacks=len(self._stacks))
+
+# Global sampling profiler
+sampling_profiler = SamplingProfiler()
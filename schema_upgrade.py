@@ -0,0 +1,98 @@
+"""
+Schema Upgrade - OperatorOS
+Additive schema upgrades for existing databases: missing nullable columns and indexes, plus data backfills
+"""
+
+import re
+import logging
+from sqlalchemy import inspect, text, select, update, bindparam, or_
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import MetaData
+from typing import List
+
+def upgrade_schema(engine: Engine, metadata: MetaData) -> List[str]:
+    """
+    Bring existing tables up to the model definitions
+    db.create_all() only creates missing tables, so columns and indexes added to existing
+    models are applied here. Only additive, nullable changes are made; returns what was applied.
+    """
+    applied = []
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    preparer = engine.dialect.identifier_preparer
+
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    logging.warning(f"Skipping non-nullable column {table.name}.{column.name} without default")
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                # Quote identifiers: "user" is a reserved word on PostgreSQL
+                table_name = preparer.quote(table.name)
+                column_name = preparer.quote(column.name)
+                conn.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}'))
+                applied.append(f"column {table.name}.{column.name}")
+
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(bind=conn)
+                    applied.append(f"index {index.name}")
+
+    for change in applied:
+        logging.info(f"Schema upgrade applied: {change}")
+    return applied
+
+# Legacy SystemMetrics rows identify their entity only in additional_data
+LEGACY_METRIC_ENTITIES = (
+    ("proposal_generated", "service_template", re.compile(r"Template ID: (\d+)")),
+    ("automation_", "business_process", re.compile(r"Process ID: (\d+)")),
+)
+
+def backfill_metric_entities(engine: Engine, batch_size: int = 1000) -> int:
+    """
+    Fill entity_type/entity_id on SystemMetrics rows written before those columns existed
+    Template and automation lookups filter on the columns, so without this older proposal and
+    automation events would drop out of them. Walks the rows by id; returns how many were set.
+    """
+    from models import SystemMetrics
+
+    table = SystemMetrics.__table__
+    candidates = or_(table.c.metric_type == "proposal_generated", table.c.metric_type.like("automation\\_%", escape="\\"))
+    last_id = 0
+    updated = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.metric_type, table.c.additional_data).where(
+                    table.c.id > last_id, table.c.entity_id.is_(None),
+                    table.c.additional_data.isnot(None), candidates
+                ).order_by(table.c.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            values = []
+            for row in rows:
+                for prefix, entity_type, pattern in LEGACY_METRIC_ENTITIES:
+                    match = pattern.search(row.additional_data) if row.metric_type.startswith(prefix) else None
+                    if match:
+                        values.append({"b_id": row.id, "b_entity_type": entity_type, "b_entity_id": match.group(1)})
+                        break
+            if values:
+                conn.execute(update(table).where(table.c.id == bindparam("b_id")).values(
+                    entity_type=bindparam("b_entity_type"), entity_id=bindparam("b_entity_id")
+                ), values)
+                updated += len(values)
+
+    if updated:
+        logging.info(f"Schema upgrade backfilled entity dimensions on {updated} metric rows")
+    return updated
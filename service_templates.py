@@ -1,9 +1,87 @@
+import os
+import re
+import json
+import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 from app import db
 from models import ServiceTemplate, SystemMetrics
 from ai_providers import ai_manager
+from metrics_writer import metrics_writer
+from metrics_rollup import metrics_rollup
+from template_cache import customization_cache
+
+TEMPLATE_GENERATION_FAILED = "Template content generation failed. Please update manually."
+# Generated default template content is kept here so new environments don't call the LLM again
+TEMPLATE_SEED_FILE = os.environ.get(
+    'SERVICE_TEMPLATE_SEED_FILE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'seeds', 'service_templates.json')
+)
+DEFAULT_TEMPLATE_WORKERS = int(os.environ.get('DEFAULT_TEMPLATE_WORKERS', '4'))
+# Proposals are generated against this placeholder so a cached proposal can be reused for any client
+CLIENT_PLACEHOLDER = "[CLIENT_NAME]"
+# Shorter client names are too likely to match ordinary words, so they are left in the prompt
+CLIENT_MASK_MIN_LENGTH = 3
+
+# Default services offered on a fresh install
+DEFAULT_TEMPLATES = [
+    {
+        "name": "Business Strategy Consulting",
+        "category": "business_consulting",
+        "description": "Comprehensive business strategy development and implementation",
+        "base_price": 5000.0,
+        "automation_level": "semi-automated"
+    },
+    {
+        "name": "Digital Marketing Audit",
+        "category": "marketing_strategy",
+        "description": "Complete digital marketing analysis and optimization recommendations",
+        "base_price": 2500.0,
+        "automation_level": "automated"
+    },
+    {
+        "name": "Financial Planning & Analysis",
+        "category": "financial_planning",
+        "description": "Personal and business financial planning services",
+        "base_price": 3500.0,
+        "automation_level": "semi-automated"
+    },
+    {
+        "name": "Website Development & Optimization",
+        "category": "tech_solutions",
+        "description": "Custom website development and performance optimization",
+        "base_price": 4500.0,
+        "automation_level": "manual"
+    },
+    {
+        "name": "Content Creation Package",
+        "category": "content_creation",
+        "description": "Professional content creation for marketing and communications",
+        "base_price": 2000.0,
+        "automation_level": "automated"
+    },
+    {
+        "name": "Business Process Automation",
+        "category": "automation_services",
+        "description": "Workflow automation and efficiency optimization",
+        "base_price": 6000.0,
+        "automation_level": "automated"
+    },
+    {
+        "name": "AI Implementation & Integration Consulting",
+        "category": "tech_solutions",
+        "description": "Complete AI solution implementation for businesses - from strategy to deployment",
+        "base_price": 5000.0,
+        "automation_level": "semi-automated"
+    }
+]
+
+def _template_fingerprint(template: Dict[str, Any]) -> str:
+    """Seed entries are reused only while the template's name, category and description are unchanged"""
+    key = f"{template['name']}|{template['category']}|{template['description']}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
 
 class ServiceTemplateSystem:
     def __init__(self):
@@ -74,11 +152,11 @@ class ServiceTemplateSystem:
             if response.get("success"):
                 return response["content"]
             else:
-                return "Template content generation failed. Please update manually."
+                return TEMPLATE_GENERATION_FAILED
             
         except Exception as e:
             logging.error(f"Template content generation failed: {str(e)}")
-            return "Template content generation failed. Please update manually."
+            return TEMPLATE_GENERATION_FAILED
     
     def get_service_catalog(self) -> Dict[str, Any]:
         """Get comprehensive service catalog"""
@@ -117,6 +195,19 @@ class ServiceTemplateSystem:
             if not template:
                 return {"error": "Template not found"}
             
+            cached = customization_cache.lookup("customization", template, client_requirements)
+            if cached:
+                template.usage_count += 1
+                db.session.commit()
+                
+                return {
+                    "success": True,
+                    "customized_template": cached["content"],
+                    "original_template": template,
+                    "provider": cached["provider"],
+                    "cache": cached["match"]
+                }
+            
             prompt = f"""
             As a professional services consultant, customize this service template for a specific client:
             
@@ -139,6 +230,10 @@ class ServiceTemplateSystem:
             response = self.ai_manager.generate_response(prompt, task_type="planning")
             
             if response.get("success"):
+                customization_cache.store(
+                    "customization", template, client_requirements, response["content"], response.get("provider")
+                )
+                
                 # Track usage
                 template.usage_count += 1
                 db.session.commit()
@@ -157,17 +252,43 @@ class ServiceTemplateSystem:
             return {"error": str(e)}
     
     def generate_proposal(self, template_id: int, client_name: str, 
-                         project_details: str, budget_range: str = None) -> Dict[str, Any]:
+                         project_details: str, budget_range: str = None,
+                         user_id: str = None) -> Dict[str, Any]:
         """Generate a professional proposal based on template"""
         try:
             template = ServiceTemplate.query.get(template_id)
             if not template:
                 return {"error": "Template not found"}
             
+            # The client name is kept out of the prompt and cache key and filled in afterwards;
+            # lookarounds rather than \b so names ending in punctuation ("Acme Inc.") still match whole
+            if client_name and len(client_name.strip()) >= CLIENT_MASK_MIN_LENGTH:
+                project_details = re.sub(
+                    rf"(?<!\w){re.escape(client_name.strip())}(?!\w)",
+                    CLIENT_PLACEHOLDER, project_details, flags=re.IGNORECASE
+                )
+            requirements = f"{project_details.replace(CLIENT_PLACEHOLDER, '')}\nbudget: {budget_range or 'not specified'}"
+            
+            cached = customization_cache.lookup("proposal", template, requirements)
+            if cached:
+                template.usage_count += 1
+                db.session.commit()
+                
+                self._log_proposal_generation(template_id, client_name, user_id=user_id, provider="cache")
+                
+                return {
+                    "success": True,
+                    "proposal": cached["content"].replace(CLIENT_PLACEHOLDER, client_name),
+                    "template_used": template,
+                    "client_name": client_name,
+                    "provider": cached["provider"],
+                    "cache": cached["match"]
+                }
+            
             prompt = f"""
             As a professional services consultant, create a compelling proposal for:
             
-            Client: {client_name}
+            Client: {CLIENT_PLACEHOLDER}
             Project Details: {project_details}
             Budget Range: {budget_range or "Not specified"}
             
@@ -187,22 +308,29 @@ class ServiceTemplateSystem:
             7. Why choose us section
             8. Next steps
             
-            Make it compelling and professional.
+            Make it compelling and professional. Refer to the client only as {CLIENT_PLACEHOLDER};
+            it is replaced with the client's name.
             """
             
             response = self.ai_manager.generate_response(prompt, task_type="creative")
             
             if response.get("success"):
+                customization_cache.store(
+                    "proposal", template, requirements, response["content"], response.get("provider")
+                )
+                
                 # Track usage
                 template.usage_count += 1
                 db.session.commit()
                 
                 # Log proposal generation
-                self._log_proposal_generation(template_id, client_name)
+                self._log_proposal_generation(
+                    template_id, client_name, user_id=user_id, provider=response.get("provider")
+                )
                 
                 return {
                     "success": True,
-                    "proposal": response["content"],
+                    "proposal": response["content"].replace(CLIENT_PLACEHOLDER, client_name),
                     "template_used": template,
                     "client_name": client_name,
                     "provider": response.get("provider")
@@ -215,80 +343,127 @@ class ServiceTemplateSystem:
             return {"error": str(e)}
     
     def create_default_templates(self):
-        """Create default service templates for common services"""
+        """
+        Create default service templates for common services
+        Missing defaults are found with one query; their content comes from the seed file when
+        it has an entry for the same definition, otherwise all of it is generated concurrently.
+        Successful content is committed together and written back to the seed. Failed generations
+        are not stored; the step raises so the bootstrap retries them.
+        """
         try:
-            default_templates = [
-                {
-                    "name": "Business Strategy Consulting",
-                    "category": "business_consulting",
-                    "description": "Comprehensive business strategy development and implementation",
-                    "base_price": 5000.0,
-                    "automation_level": "semi-automated"
-                },
-                {
-                    "name": "Digital Marketing Audit",
-                    "category": "marketing_strategy",
-                    "description": "Complete digital marketing analysis and optimization recommendations",
-                    "base_price": 2500.0,
-                    "automation_level": "automated"
-                },
-                {
-                    "name": "Financial Planning & Analysis",
-                    "category": "financial_planning",
-                    "description": "Personal and business financial planning services",
-                    "base_price": 3500.0,
-                    "automation_level": "semi-automated"
-                },
-                {
-                    "name": "Website Development & Optimization",
-                    "category": "tech_solutions",
-                    "description": "Custom website development and performance optimization",
-                    "base_price": 4500.0,
-                    "automation_level": "manual"
-                },
-                {
-                    "name": "Content Creation Package",
-                    "category": "content_creation",
-                    "description": "Professional content creation for marketing and communications",
-                    "base_price": 2000.0,
-                    "automation_level": "automated"
-                },
-                {
-                    "name": "Business Process Automation",
-                    "category": "automation_services",
-                    "description": "Workflow automation and efficiency optimization",
-                    "base_price": 6000.0,
-                    "automation_level": "automated"
-                },
-                {
-                    "name": "AI Implementation & Integration Consulting",
-                    "category": "tech_solutions",
-                    "description": "Complete AI solution implementation for businesses - from strategy to deployment",
-                    "base_price": 5000.0,
-                    "automation_level": "semi-automated"
-                }
+            names = [template["name"] for template in DEFAULT_TEMPLATES]
+            existing = {
+                template.name: template for template in ServiceTemplate.query.filter(
+                    ServiceTemplate.name.in_(names)
+                ).all()
+            }
+            # Rows stored with the failure placeholder by earlier releases are filled in again
+            missing = [
+                template for template in DEFAULT_TEMPLATES
+                if template["name"] not in existing
+                or existing[template["name"]].template_content == TEMPLATE_GENERATION_FAILED
             ]
+            if not missing:
+                return
+            
+            seed = self._load_seed()
+            contents = {}
+            to_generate = []
+            for template in missing:
+                entry = seed.get(template["name"])
+                if entry and entry.get("fingerprint") == _template_fingerprint(template):
+                    contents[template["name"]] = entry["content"]
+                else:
+                    to_generate.append(template)
+            
+            if to_generate:
+                workers = min(len(to_generate), DEFAULT_TEMPLATE_WORKERS)
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="template-bootstrap") as executor:
+                    generated = executor.map(
+                        lambda template: self._generate_template_content(
+                            template["name"], template["category"], template["description"]
+                        ),
+                        to_generate
+                    )
+                    for template, content in zip(to_generate, generated):
+                        contents[template["name"]] = content
+            
+            failed = [template["name"] for template in missing
+                      if contents[template["name"]] == TEMPLATE_GENERATION_FAILED]
+            for template in missing:
+                content = contents[template["name"]]
+                if content == TEMPLATE_GENERATION_FAILED:
+                    continue
+                if template["name"] in existing:
+                    existing[template["name"]].template_content = content
+                else:
+                    db.session.add(ServiceTemplate(
+                        name=template["name"],
+                        category=template["category"],
+                        description=template["description"],
+                        price=template["base_price"],
+                        automation_level=template["automation_level"],
+                        template_content=content
+                    ))
+            db.session.commit()
             
-            for template_data in default_templates:
-                existing = ServiceTemplate.query.filter_by(name=template_data["name"]).first()
-                if not existing:
-                    self.create_service_template(**template_data)
+            newly_generated = {
+                template["name"]: {
+                    "fingerprint": _template_fingerprint(template),
+                    "content": contents[template["name"]]
+                }
+                for template in to_generate if contents[template["name"]] != TEMPLATE_GENERATION_FAILED
+            }
+            if newly_generated:
+                seed.update(newly_generated)
+                self._save_seed(seed)
             
-            logging.info("Default service templates created")
+            logging.info(f"Default service templates created: {len(missing) - len(failed)} "
+                         f"({len(missing) - len(to_generate)} from seed, "
+                         f"{len(to_generate) - len(failed)} generated)")
+            if failed:
+                raise RuntimeError(f"Template content generation failed for: {', '.join(failed)}")
             
         except Exception as e:
+            db.session.rollback()
             logging.error(f"Failed to create default templates: {str(e)}")
+            raise
+    
+    def _load_seed(self) -> Dict[str, Any]:
+        """Previously generated default template content, keyed by template name"""
+        try:
+            with open(TEMPLATE_SEED_FILE) as seed_file:
+                return json.load(seed_file)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logging.error(f"Failed to read template seed file: {str(e)}")
+            return {}
     
-    def _log_proposal_generation(self, template_id: int, client_name: str):
+    def _save_seed(self, seed: Dict[str, Any]):
+        """Write the seed atomically so a concurrent reader never sees a partial file"""
+        try:
+            os.makedirs(os.path.dirname(TEMPLATE_SEED_FILE), exist_ok=True)
+            temp_path = f"{TEMPLATE_SEED_FILE}.{os.getpid()}.tmp"
+            with open(temp_path, "w") as seed_file:
+                json.dump(seed, seed_file, indent=2, sort_keys=True)
+            os.replace(temp_path, TEMPLATE_SEED_FILE)
+        except Exception as e:
+            logging.error(f"Failed to write template seed file: {str(e)}")
+    
+    def _log_proposal_generation(self, template_id: int, client_name: str,
+                                 user_id: str = None, provider: str = None):
         """Log proposal generation for analytics"""
         try:
-            metric = SystemMetrics(
-                metric_type="proposal_generated",
-                value=1.0,
-                metadata=f"Template ID: {template_id}, Client: {client_name}"
+            metrics_writer.record(
+                "proposal_generated",
+                1.0,
+                additional_data=f"Template ID: {template_id}, Client: {client_name}",
+                entity_type="service_template",
+                entity_id=str(template_id),
+                user_id=user_id,
+                provider=provider
             )
-            db.session.add(metric)
-            db.session.commit()
             
         except Exception as e:
             logging.error(f"Failed to log proposal generation: {str(e)}")
@@ -300,16 +475,20 @@ class ServiceTemplateSystem:
             if not template:
                 return {"error": "Template not found"}
             
-            # Get usage metrics
-            usage_metrics = SystemMetrics.query.filter(
+            # Per-entity metrics are kept raw for the entity retention window only
+            window = metrics_rollup.retention["entity"]
+            recent_usage = SystemMetrics.query.filter(
+                SystemMetrics.entity_type == "service_template",
+                SystemMetrics.entity_id == str(template_id),
                 SystemMetrics.metric_type == "proposal_generated",
-                SystemMetrics.metadata.contains(f"Template ID: {template_id}")
-            ).all()
+                SystemMetrics.timestamp >= datetime.now() - window
+            ).count()
             
             return {
                 "template": template,
                 "total_usage": template.usage_count,
-                "recent_usage": len(usage_metrics),
+                "recent_usage": recent_usage,
+                "recent_usage_days": window.days,
                 "estimated_revenue": template.price * template.usage_count,
                 "performance_score": min(100, template.usage_count * 10)
             }
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Startup profile for the web app
+Imports main.py in a fresh interpreter with -X importtime and reports per-module import
+time and peak RSS. With --max-ms / --max-rss-mb it exits non-zero when a budget is exceeded.
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Runs in the child interpreter; background threads are disabled so only the import is measured
+CHILD_SCRIPT = """
+import json, resource, sys, time
+start = time.perf_counter()
+import main
+import_ms = (time.perf_counter() - start) * 1000
+result = {"import_ms": import_ms, "import_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+if sys.argv[1]:
+    start = time.perf_counter()
+    response = main.app.test_client().get(sys.argv[1])
+    result["request_ms"] = (time.perf_counter() - start) * 1000
+    result["request_status"] = response.status_code
+    result["request_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+result["modules"] = sorted(sys.modules)
+print("STARTUP_PROFILE " + json.dumps(result))
+"""
+
+def parse_importtime(stderr: str):
+    """(module, self_us, cumulative_us, depth) for each line of -X importtime output"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        entries.append((name.strip(), int(parts[0]), int(parts[1]), depth))
+    return entries
+
+def run_profile(request_path: str = "") -> dict:
+    env = dict(os.environ)
+    env.update({
+        "BOOTSTRAP_ENABLED": "false",
+        "JOB_WORKERS_ENABLED": "false",
+        "AUTOMATION_SCHEDULER_ENABLED": "false",
+        "METRICS_ROLLUP_ENABLED": "false"
+    })
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD_SCRIPT, request_path],
+        cwd=PROJECT_DIR, env=env, capture_output=True, text=True
+    )
+    result_line = next((line for line in completed.stdout.splitlines() if line.startswith("STARTUP_PROFILE ")), None)
+    if result_line is None:
+        raise RuntimeError(f"Profiling run failed:\n{completed.stderr[-2000:]}")
+    result = json.loads(result_line[len("STARTUP_PROFILE "):])
+    result["imports"] = parse_importtime(completed.stderr)
+    return result
+
+def is_project_module(name: str) -> bool:
+    return os.path.exists(os.path.join(PROJECT_DIR, f"{name.split('.')[0]}.py"))
+
+def report(result: dict, top: int):
+    imports = result["imports"]
+    print("=== STARTUP PROFILE ===")
+    print(f"\nimport main: {result['import_ms']:.0f} ms, peak RSS {result['import_rss_mb']:.1f} MB")
+    if "request_ms" in result:
+        print(f"first request: {result['request_ms']:.0f} ms (HTTP {result['request_status']}), "
+              f"peak RSS {result['request_rss_mb']:.1f} MB")
+
+    print("\nProject modules (cumulative import time):")
+    project = sorted((e for e in imports if is_project_module(e[0])), key=lambda e: -e[2])
+    for name, self_us, cumulative_us, _ in project:
+        print(f"   {name:<28} {cumulative_us / 1000:8.1f} ms   (self {self_us / 1000:6.1f} ms)")
+
+    print(f"\nTop {top} top-level packages (cumulative):")
+    packages = {}
+    for name, _, cumulative_us, _ in imports:
+        if "." not in name and not is_project_module(name):
+            packages[name] = max(packages.get(name, 0), cumulative_us)
+    for name, cumulative_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"   {name:<28} {cumulative_us / 1000:8.1f} ms")
+
+    heavy = [name for name in ("openai", "anthropic", "stripe", "pandas") if name in result["modules"]]
+    print(f"\nHeavy SDKs loaded at startup: {', '.join(heavy) if heavy else 'none'}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--request", default="", help="also time a first GET of this path, e.g. /health/ready")
+    parser.add_argument("--top", type=int, default=15, help="number of third-party packages to list")
+    parser.add_argument("--max-ms", type=float, help="fail if importing main takes longer than this")
+    parser.add_argument("--max-rss-mb", type=float, help="fail if peak RSS after import exceeds this")
+    parser.add_argument("--json", action="store_true", help="print the raw result as JSON")
+    args = parser.parse_args()
+
+    result = run_profile(args.request)
+    if args.json:
+        print(json.dumps({key: value for key, value in result.items() if key != "modules"}, indent=2))
+    else:
+        report(result, args.top)
+
+    failures = []
+    if args.max_ms is not None and result["import_ms"] > args.max_ms:
+        failures.append(f"import took {result['import_ms']:.0f} ms (budget {args.max_ms:.0f} ms)")
+    if args.max_rss_mb is not None and result["import_rss_mb"] > args.max_rss_mb:
+        failures.append(f"peak RSS {result['import_rss_mb']:.1f} MB (budget {args.max_rss_mb:.1f} MB)")
+    for failure in failures:
+        print(f"\nBUDGET EXCEEDED: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
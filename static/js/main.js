@@ -784,6 +784,51 @@ window.addEventListener('offline', function() {
     showNotification('Connection lost. Some features may not work.', 'warning');
 });
 
+/**
+ * Wait for a background job started by an API call
+ * Resolves with the job's result, or with {error} if it failed or was cancelled.
+ * Responses without a job_id are passed through unchanged.
+ */
+function waitForJob(data, onStatus, interval = 1000) {
+    if (!data || !data.job_id) {
+        return Promise.resolve(data);
+    }
+    
+    const maxInterval = 5000;
+    return new Promise(resolve => {
+        function poll() {
+            fetch(`/api/jobs/${data.job_id}`)
+                .then(response => response.json())
+                .then(job => {
+                    if (onStatus) {
+                        onStatus(job);
+                    }
+                    if (job.status === 'succeeded') {
+                        resolve(job.result);
+                    } else if (job.status === 'failed' || job.status === 'cancelled' || job.error && !job.status) {
+                        resolve({ success: false, error: job.error || `Job ${job.status}` });
+                    } else {
+                        interval = Math.min(interval * 1.5, maxInterval);
+                        setTimeout(poll, interval);
+                    }
+                })
+                .catch(() => {
+                    interval = Math.min(interval * 2, maxInterval);
+                    setTimeout(poll, interval);
+                });
+        }
+        setTimeout(poll, interval);
+    });
+}
+
+/**
+ * Cancel a background job
+ */
+function cancelJob(jobId) {
+    return fetch(`/api/jobs/${jobId}/cancel`, { method: 'POST' })
+        .then(response => response.json());
+}
+
 /**
  * Initialize service worker if available
  */
@@ -808,7 +853,9 @@ window.OperatorOS = {
     validateEmail,
     exportData,
     clearHistory,
-    rateResponse
+    rateResponse,
+    waitForJob,
+    cancelJob
 };
 
 console.log('OperatorOS Main JavaScript loaded successfully');
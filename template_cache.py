@@ -0,0 +1,197 @@
+"""
+Template Cache - OperatorOS
+Two-level cache of LLM template customizations and proposals with near-duplicate requirement matching
+"""
+
+import os
+import re
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Optional, FrozenSet, Tuple
+from sqlalchemy import select, update, delete
+from sqlalchemy.exc import IntegrityError
+
+# Requirements whose term sets overlap at least this much (Jaccard) reuse a cached result
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get('TEMPLATE_CACHE_SIMILARITY', '0.85'))
+# Most recent entries per template version compared for near-duplicates
+NEAR_DUPLICATE_CANDIDATES = int(os.environ.get('TEMPLATE_CACHE_CANDIDATES', '200'))
+LOCAL_CACHE_SIZE = int(os.environ.get('TEMPLATE_CACHE_LOCAL_SIZE', '256'))
+CACHE_ENABLED = os.environ.get('TEMPLATE_CACHE_ENABLED', 'true').lower() == 'true'
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have i in is it its of on or our so that the their this to
+we with will would you your need needs want wants looking please also
+""".split())
+
+class CustomizationCache:
+    """
+    L1 is a per-process LRU keyed exactly; L2 is the TemplateResultCache table shared by all
+    workers, which also answers near-duplicate lookups. Keys include a fingerprint of the
+    template content, so editing a template invalidates everything cached for it.
+    """
+
+    def __init__(self, local_size: int = LOCAL_CACHE_SIZE, threshold: float = NEAR_DUPLICATE_THRESHOLD):
+        self.local_size = local_size
+        self.threshold = threshold
+        self.enabled = CACHE_ENABLED
+        self._local: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"local_hits": 0, "shared_hits": 0, "near_hits": 0, "misses": 0, "stores": 0}
+
+    # --- keys ---
+
+    def template_version(self, template) -> str:
+        key = f"{template.name}|{template.description}|{template.template_content}"
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+
+    def normalize(self, requirements: str) -> Tuple[str, FrozenSet[str]]:
+        """Hash of the normalized requirement text plus its term set"""
+        tokens = [
+            token.rstrip(".,'-") for token in re.findall(r"[a-z0-9$%][a-z0-9$%.,'-]*", (requirements or "").lower())
+        ]
+        tokens = [token for token in tokens if token and token not in STOPWORDS]
+        normalized = " ".join(tokens)
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest(), frozenset(tokens)
+
+    def _similarity(self, terms: FrozenSet[str], other: FrozenSet[str]) -> float:
+        # Amounts, dates and counts change the answer, so numeric terms must match exactly
+        if {term for term in terms if any(c.isdigit() for c in term)} != \
+                {term for term in other if any(c.isdigit() for c in term)}:
+            return 0.0
+        if not terms and not other:
+            return 1.0
+        return len(terms & other) / len(terms | other)
+
+    # --- lookup / store ---
+
+    def lookup(self, kind: str, template, requirements: str) -> Optional[Dict[str, Any]]:
+        """Cached result for these requirements, exact or near-duplicate, or None"""
+        if not self.enabled:
+            return None
+        version = self.template_version(template)
+        requirements_key, terms = self.normalize(requirements)
+        local_key = (kind, template.id, version, requirements_key)
+
+        with self._lock:
+            entry = self._local.get(local_key)
+            if entry is not None:
+                self._local.move_to_end(local_key)
+                self.stats["local_hits"] += 1
+                return dict(entry, match="exact")
+
+        try:
+            entry = self._lookup_shared(kind, template.id, version, requirements_key, terms)
+        except Exception as e:
+            logging.error(f"Template cache lookup failed: {str(e)}")
+            entry = None
+
+        with self._lock:
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["near_hits" if entry["match"] == "near" else "shared_hits"] += 1
+            self._remember(local_key, {"content": entry["content"], "provider": entry["provider"]})
+        return entry
+
+    def _lookup_shared(self, kind: str, template_id: int, version: str,
+                       requirements_key: str, terms: FrozenSet[str]) -> Optional[Dict[str, Any]]:
+        from app import db
+        from models import TemplateResultCache
+
+        table = TemplateResultCache.__table__
+        scope = (table.c.kind == kind, table.c.template_id == template_id, table.c.template_version == version)
+        with db.engine.begin() as conn:
+            row = conn.execute(
+                select(table.c.id, table.c.content, table.c.provider)
+                .where(*scope, table.c.requirements_key == requirements_key)
+            ).first()
+            match, similarity = "exact", 1.0
+
+            if row is None:
+                candidates = conn.execute(
+                    select(table.c.id, table.c.requirement_terms).where(*scope)
+                    .order_by(table.c.created_at.desc()).limit(NEAR_DUPLICATE_CANDIDATES)
+                ).all()
+                best_id, similarity = None, 0.0
+                for candidate in candidates:
+                    score = self._similarity(terms, frozenset(candidate.requirement_terms.split()))
+                    if score > similarity:
+                        best_id, similarity = candidate.id, score
+                if best_id is None or similarity < self.threshold:
+                    return None
+                row = conn.execute(
+                    select(table.c.id, table.c.content, table.c.provider).where(table.c.id == best_id)
+                ).first()
+                match = "near"
+
+            conn.execute(update(table).where(table.c.id == row.id).values(
+                hit_count=table.c.hit_count + 1, last_hit_at=datetime.now()
+            ))
+        return {"content": row.content, "provider": row.provider, "match": match, "similarity": round(similarity, 3)}
+
+    def store(self, kind: str, template, requirements: str, content: str, provider: str = None):
+        """Cache a generated result; entries for older versions of the template are dropped"""
+        if not self.enabled:
+            return
+        from app import db
+        from models import TemplateResultCache
+
+        version = self.template_version(template)
+        requirements_key, terms = self.normalize(requirements)
+        table = TemplateResultCache.__table__
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(delete(table).where(
+                    table.c.kind == kind, table.c.template_id == template.id, table.c.template_version != version
+                ))
+                conn.execute(table.insert().values(
+                    kind=kind,
+                    template_id=template.id,
+                    template_version=version,
+                    requirements_key=requirements_key,
+                    requirement_terms=" ".join(sorted(terms)),
+                    content=content,
+                    provider=provider,
+                    hit_count=0,
+                    created_at=datetime.now()
+                ))
+        except IntegrityError:
+            pass  # another worker cached the same requirements first
+        except Exception as e:
+            logging.error(f"Template cache store failed: {str(e)}")
+
+        with self._lock:
+            self.stats["stores"] += 1
+            self._remember((kind, template.id, version, requirements_key), {"content": content, "provider": provider})
+
+    def _remember(self, key: Tuple, entry: Dict[str, Any]):
+        self._local[key] = entry
+        self._local.move_to_end(key)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+    def invalidate_template(self, template_id: int):
+        """Drop every cached result for a template"""
+        from app import db
+        from models import TemplateResultCache
+
+        with self._lock:
+            for key in [key for key in self._local if key[1] == template_id]:
+                del self._local[key]
+        table = TemplateResultCache.__table__
+        with db.engine.begin() as conn:
+            conn.execute(delete(table).where(table.c.template_id == template_id))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["local_entries"] = len(self._local)
+        lookups = stats["local_hits"] + stats["shared_hits"] + stats["near_hits"] + stats["misses"]
+        stats["hit_rate"] = round((lookups - stats["misses"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+# Global customization cache
+customization_cache = CustomizationCache()
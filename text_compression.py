@@ -0,0 +1,341 @@
+"""
+Text Compression - OperatorOS
+Transparent compressed storage for large LLM text: zstd with a shared trained dictionary, zlib fallback
+"""
+
+import os
+import zlib
+import time
+import struct
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable
+from sqlalchemy import select, update, func, type_coerce
+from sqlalchemy.types import TypeDecorator, LargeBinary
+
+try:
+    import zstandard as zstd
+except ImportError:  # declared dependency; a broken install degrades to zlib instead of failing writes
+    zstd = None
+    logging.warning("zstandard is not installed; compressed text is written with zlib")
+
+# Stored values start with a one-byte format tag; dictionary frames add a 4-byte dictionary id
+FORMAT_RAW = 0x00
+FORMAT_ZLIB = 0x01
+FORMAT_ZSTD = 0x02
+FORMAT_ZSTD_DICT = 0x03
+# Values written before the format tag existed are bare zlib streams, which start with 0x78
+LEGACY_ZLIB_MARKER = 0x78
+
+# Texts shorter than this are stored uncompressed; the frame overhead outweighs the savings
+MIN_COMPRESS_BYTES = int(os.environ.get('TEXT_COMPRESSION_MIN_BYTES', '64'))
+ZSTD_LEVEL = int(os.environ.get('TEXT_COMPRESSION_ZSTD_LEVEL', '6'))
+ZLIB_LEVEL = int(os.environ.get('TEXT_COMPRESSION_ZLIB_LEVEL', '6'))
+DICTIONARY_SIZE = int(os.environ.get('TEXT_COMPRESSION_DICT_SIZE', str(64 * 1024)))
+# How often a process re-reads which dictionary is active, so newly trained ones are picked up
+DICTIONARY_REFRESH_SECONDS = 300
+
+class TextCodec:
+    """
+    Encodes text to tagged bytes and back
+    New values use zstd with the active trained dictionary when one exists, plain zstd otherwise,
+    and zlib when zstandard is not installed. Every format ever written remains decodable;
+    dictionaries are stored in the database and looked up by the id in the frame header.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dictionaries: Dict[int, Any] = {}
+        self._active_dictionary_id: Optional[int] = None
+        self._active_checked_at = 0.0
+        self._local = threading.local()
+
+    @property
+    def zstd_available(self) -> bool:
+        return zstd is not None
+
+    # --- encoding ---
+
+    def compress(self, text: str) -> bytes:
+        data = text.encode('utf-8')
+        if len(data) < MIN_COMPRESS_BYTES:
+            return bytes([FORMAT_RAW]) + data
+        if zstd is None:
+            return bytes([FORMAT_ZLIB]) + zlib.compress(data, ZLIB_LEVEL)
+
+        dictionary_id = self._current_dictionary_id()
+        if dictionary_id is not None:
+            compressor = self._compressor(dictionary_id)
+            return bytes([FORMAT_ZSTD_DICT]) + struct.pack('>I', dictionary_id) + compressor.compress(data)
+        return bytes([FORMAT_ZSTD]) + self._compressor(None).compress(data)
+
+    def decompress(self, blob: bytes) -> str:
+        blob = bytes(blob)
+        if not blob:
+            return ""
+        tag = blob[0]
+        if tag == FORMAT_RAW:
+            return blob[1:].decode('utf-8')
+        if tag == FORMAT_ZLIB:
+            return zlib.decompress(blob[1:]).decode('utf-8')
+        if tag == LEGACY_ZLIB_MARKER:
+            return zlib.decompress(blob).decode('utf-8')
+        if zstd is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed text")
+        if tag == FORMAT_ZSTD:
+            return self._decompressor(None).decompress(blob[1:]).decode('utf-8')
+        if tag == FORMAT_ZSTD_DICT:
+            dictionary_id = struct.unpack('>I', blob[1:5])[0]
+            return self._decompressor(dictionary_id).decompress(blob[5:]).decode('utf-8')
+        raise ValueError(f"Unknown compressed text format: {tag}")
+
+    def is_current(self, blob: bytes) -> bool:
+        """True if a stored value already uses the format new writes would use"""
+        blob = bytes(blob)
+        if not blob:
+            return True
+        tag = blob[0]
+        if tag == FORMAT_RAW:
+            return len(blob) - 1 < MIN_COMPRESS_BYTES
+        if zstd is None:
+            return tag == FORMAT_ZLIB
+        dictionary_id = self._current_dictionary_id()
+        if dictionary_id is None:
+            return tag == FORMAT_ZSTD
+        return tag == FORMAT_ZSTD_DICT and struct.unpack('>I', blob[1:5])[0] == dictionary_id
+
+    # zstd (de)compressors are not thread-safe, so each thread keeps its own per dictionary
+    def _compressor(self, dictionary_id: Optional[int]):
+        compressors = self._local.__dict__.setdefault('compressors', {})
+        if dictionary_id not in compressors:
+            dictionary = self._load_dictionary(dictionary_id) if dictionary_id is not None else None
+            compressors[dictionary_id] = zstd.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dictionary)
+        return compressors[dictionary_id]
+
+    def _decompressor(self, dictionary_id: Optional[int]):
+        decompressors = self._local.__dict__.setdefault('decompressors', {})
+        if dictionary_id not in decompressors:
+            dictionary = self._load_dictionary(dictionary_id) if dictionary_id is not None else None
+            decompressors[dictionary_id] = zstd.ZstdDecompressor(dict_data=dictionary)
+        return decompressors[dictionary_id]
+
+    # --- dictionaries ---
+
+    def _load_dictionary(self, dictionary_id: int):
+        with self._lock:
+            if dictionary_id in self._dictionaries:
+                return self._dictionaries[dictionary_id]
+
+        from app import db
+        from models import CompressionDictionary
+
+        table = CompressionDictionary.__table__
+        with db.engine.connect() as conn:
+            data = conn.execute(select(table.c.dict_data).where(table.c.id == dictionary_id)).scalar()
+        if data is None:
+            raise LookupError(f"Compression dictionary {dictionary_id} not found")
+
+        dictionary = zstd.ZstdCompressionDict(bytes(data))
+        dictionary.precompute_compress(level=ZSTD_LEVEL)
+        with self._lock:
+            self._dictionaries[dictionary_id] = dictionary
+        return dictionary
+
+    def _current_dictionary_id(self) -> Optional[int]:
+        """Id of the active dictionary, re-read from the database every few minutes"""
+        if time.time() - self._active_checked_at < DICTIONARY_REFRESH_SECONDS:
+            return self._active_dictionary_id
+
+        from app import db
+        from models import CompressionDictionary
+
+        table = CompressionDictionary.__table__
+        try:
+            with db.engine.connect() as conn:
+                self._active_dictionary_id = conn.execute(
+                    select(table.c.id).where(table.c.active.is_(True)).order_by(table.c.id.desc()).limit(1)
+                ).scalar()
+        except Exception as e:
+            logging.error(f"Failed to read active compression dictionary: {str(e)}")
+        self._active_checked_at = time.time()
+        return self._active_dictionary_id
+
+    def train_dictionary(self, samples: List[str] = None, sample_limit: int = 2000,
+                         dict_size: int = DICTIONARY_SIZE) -> Dict[str, Any]:
+        """Train a zstd dictionary on stored LLM text (or the given samples) and make it active"""
+        from app import db
+        from models import CompressionDictionary
+
+        if zstd is None:
+            return {"error": "zstandard is not installed"}
+
+        if samples is None:
+            samples = self.collect_samples(sample_limit)
+        encoded = [sample.encode('utf-8') for sample in samples if sample]
+        if len(encoded) < 20:
+            return {"error": f"Not enough samples to train a dictionary ({len(encoded)})"}
+
+        try:
+            dictionary = zstd.train_dictionary(dict_size, encoded, level=ZSTD_LEVEL)
+        except zstd.ZstdError as e:
+            logging.error(f"Compression dictionary training failed: {str(e)}")
+            return {"error": str(e)}
+        table = CompressionDictionary.__table__
+        with db.engine.begin() as conn:
+            conn.execute(update(table).where(table.c.active.is_(True)).values(active=False))
+            dictionary_id = conn.execute(table.insert().values(
+                algorithm="zstd",
+                dict_data=dictionary.as_bytes(),
+                sample_count=len(encoded),
+                active=True,
+                created_at=datetime.now()
+            )).inserted_primary_key[0]
+
+        self._active_dictionary_id = dictionary_id
+        self._active_checked_at = time.time()
+        logging.info(f"Trained compression dictionary {dictionary_id} from {len(encoded)} samples")
+        return {"dictionary_id": dictionary_id, "samples": len(encoded), "size": len(dictionary.as_bytes())}
+
+    def collect_samples(self, limit: int = 2000) -> List[str]:
+        """Most recent full responses and financial analyses, the text the dictionary is for"""
+        from app import db
+        from models import AIConversationContent, FinancialData
+
+        samples = []
+        with db.engine.connect() as conn:
+            samples.extend(conn.execute(
+                select(AIConversationContent.response_text)
+                .order_by(AIConversationContent.conversation_id.desc()).limit(limit)
+            ).scalars())
+            samples.extend(conn.execute(
+                select(FinancialData.analysis_result_compressed)
+                .where(FinancialData.analysis_result_compressed.isnot(None))
+                .order_by(FinancialData.id.desc()).limit(limit // 4)
+            ).scalars())
+        return samples
+
+    # --- backfill ---
+
+    def backfill(self, batch_size: int = 200, preview_chars: int = None,
+                 check_cancelled: Callable[[], None] = None) -> Dict[str, int]:
+        """
+        Move existing text into compressed storage, one keyset-paginated batch per transaction
+        - AIConversation rows with long prompts/responses get an AIConversationContent row and previews
+        - FinancialData.analysis_result text moves to the compressed column
+        - compressed values in an older format are re-encoded with the current one
+        """
+        from app import db
+        from models import AIConversation, AIConversationContent, FinancialData
+        from conversation_store import conversation_store
+
+        preview_chars = preview_chars or conversation_store.preview_chars
+        check_cancelled = check_cancelled or (lambda: None)
+        stats = {"conversations_moved": 0, "financial_moved": 0, "recompressed": 0}
+
+        # Long conversation text written before the side table existed
+        conversations = AIConversation.__table__
+        contents = AIConversationContent.__table__
+        last_id = 0
+        while True:
+            check_cancelled()
+            with db.engine.begin() as conn:
+                rows = conn.execute(
+                    select(conversations.c.id, conversations.c.prompt, conversations.c.response)
+                    .outerjoin(contents, contents.c.conversation_id == conversations.c.id)
+                    .where(
+                        conversations.c.id > last_id,
+                        contents.c.conversation_id.is_(None),
+                        (func.length(conversations.c.prompt) > preview_chars) |
+                        (func.length(conversations.c.response) > preview_chars)
+                    )
+                    .order_by(conversations.c.id).limit(batch_size)
+                ).all()
+                if not rows:
+                    break
+                conn.execute(AIConversationContent.__table__.insert(), [
+                    {"conversation_id": row.id, "prompt_compressed": row.prompt, "response_compressed": row.response}
+                    for row in rows
+                ])
+                for row in rows:
+                    conn.execute(update(conversations).where(conversations.c.id == row.id).values(
+                        prompt=conversation_store._preview(row.prompt),
+                        response=conversation_store._preview(row.response)
+                    ))
+                last_id = rows[-1].id
+                stats["conversations_moved"] += len(rows)
+
+        # Financial analyses still in the plain text column
+        financial = FinancialData.__table__
+        last_id = 0
+        while True:
+            check_cancelled()
+            with db.engine.begin() as conn:
+                rows = conn.execute(
+                    select(financial.c.id, financial.c.analysis_result)
+                    .where(financial.c.id > last_id, financial.c.analysis_result.isnot(None))
+                    .order_by(financial.c.id).limit(batch_size)
+                ).all()
+                if not rows:
+                    break
+                for row in rows:
+                    conn.execute(update(financial).where(financial.c.id == row.id).values(
+                        analysis_result=None, analysis_result_compressed=row.analysis_result
+                    ))
+                last_id = rows[-1].id
+                stats["financial_moved"] += len(rows)
+
+        # Values compressed before zstd or the current dictionary was available
+        targets = [
+            (contents, contents.c.conversation_id, ["prompt_compressed", "response_compressed"]),
+            (financial, financial.c.id, ["analysis_result_compressed"])
+        ]
+        for table, key, column_names in targets:
+            last_id = 0
+            while True:
+                check_cancelled()
+                with db.engine.begin() as conn:
+                    rows = conn.execute(
+                        select(key, *[type_coerce(table.c[name], LargeBinary).label(name) for name in column_names])
+                        .where(key > last_id).order_by(key).limit(batch_size)
+                    ).all()
+                    if not rows:
+                        break
+                    for row in rows:
+                        stale = {
+                            name: self.decompress(row._mapping[name])
+                            for name in column_names
+                            if row._mapping[name] is not None and not self.is_current(row._mapping[name])
+                        }
+                        if stale:
+                            conn.execute(update(table).where(key == row[0]).values(**stale))
+                            stats["recompressed"] += 1
+                    last_id = rows[-1][0]
+
+        return stats
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "zstd_available": self.zstd_available,
+            "active_dictionary_id": self._active_dictionary_id,
+            "loaded_dictionaries": len(self._dictionaries)
+        }
+
+class CompressedText(TypeDecorator):
+    """Text column stored as compressed bytes; values are plain str on the Python side"""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return text_codec.compress(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return text_codec.decompress(value)
+
+# Global text codec
+text_codec = TextCodec()
@@ -70,34 +70,46 @@ class TokenLimiter:
         Priority: system_prompt > query > user_context
         Returns: (truncated_system, truncated_context, truncated_query, was_truncated)
         """
+        system_tokens = self.estimate_tokens(system_prompt, provider)
+        truncated_context, truncated_query, was_truncated = self.fit_to_budget(
+            system_tokens, user_context, query, provider
+        )
+        return system_prompt, truncated_context, truncated_query, was_truncated
+    
+    def fit_to_budget(self, reserved_tokens: int, user_context: str, 
+                      query: str, provider: str) -> Tuple[str, str, bool]:
+        """
+        Truncate context and query to fit alongside already-measured static prompt text
+        Priority: reserved (static) tokens > query > user_context
+        Returns: (truncated_context, truncated_query, was_truncated)
+        """
         safe_limit = self.get_safe_limit(provider)
         
         # Calculate token estimates
-        system_tokens = self.estimate_tokens(system_prompt, provider)
         query_tokens = self.estimate_tokens(query, provider)
         context_tokens = self.estimate_tokens(user_context, provider)
         
-        total_tokens = system_tokens + query_tokens + context_tokens
+        total_tokens = reserved_tokens + query_tokens + context_tokens
         
         # If within limits, return as-is
         if total_tokens <= safe_limit:
-            return system_prompt, user_context, query, False
+            return user_context, query, False
         
         logger.warning(f"Prompt exceeds safe limit ({total_tokens} > {safe_limit}). Truncating...")
         
         # Reserve tokens for system prompt and query (highest priority)
-        reserved_tokens = system_tokens + query_tokens
-        available_for_context = safe_limit - reserved_tokens
+        reserved_total = reserved_tokens + query_tokens
+        available_for_context = safe_limit - reserved_total
         
         # If system + query already exceed limit, truncate query
-        if reserved_tokens > safe_limit:
+        if reserved_total > safe_limit:
             logger.warning("System prompt + query exceed limits. Truncating query...")
-            available_for_query = safe_limit - system_tokens
+            available_for_query = safe_limit - reserved_tokens
             if available_for_query > 0:
                 truncated_query = self._truncate_text(query, available_for_query, provider)
             else:
                 truncated_query = query[:100]  # Minimum query
-            return system_prompt, "", truncated_query, True
+            return "", truncated_query, True
         
         # Truncate context to fit available space
         if available_for_context > 0:
@@ -107,7 +119,7 @@ class TokenLimiter:
         
         logger.info(f"Truncated context from {context_tokens} to {self.estimate_tokens(truncated_context, provider)} tokens")
         
-        return system_prompt, truncated_context, query, True
+        return truncated_context, query, True
     
     def _truncate_text(self, text: str, max_tokens: int, provider: str) -> str:
         """Truncate text to fit within token limit"""
@@ -0,0 +1,298 @@
+"""
+Tracing - OperatorOS
+In-process request and stage tracing with OpenTelemetry-shaped spans and a local JSONL exporter
+"""
+
+import os
+import json
+import time
+import random
+import logging
+import tempfile
+import threading
+import functools
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Callable
+
+TRACING_ENABLED = os.environ.get('TRACING_ENABLED', 'true').lower() == 'true'
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', '1.0'))
+TRACE_EXPORT_PATH = os.environ.get(
+    'TRACE_EXPORT_PATH', os.path.join(tempfile.gettempdir(), 'operatoros_traces.jsonl')
+)
+# Finished spans are written when their local root ends, or once this many are buffered
+TRACE_FLUSH_SPANS = int(os.environ.get('TRACE_FLUSH_SPANS', '500'))
+# The export file is rotated to "<path>.1" (replacing the previous one) at this size, so disk
+# use stays under twice this
+TRACE_MAX_BYTES = int(os.environ.get('TRACE_MAX_BYTES', str(64 * 1024 * 1024)))
+# Newest part of the export file searched when a trace is looked up
+TRACE_LOOKUP_BYTES = int(os.environ.get('TRACE_LOOKUP_BYTES', str(16 * 1024 * 1024)))
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+class Span:
+    """One timed operation; serialized in the OTLP/JSON span layout"""
+
+    __slots__ = ("trace_id", "span_id", "parent_span_id", "name", "kind", "sampled", "is_local_root",
+                 "start_ns", "end_ns", "attributes", "events", "status", "status_message")
+
+    def __init__(self, name: str, trace_id: str, parent_span_id: Optional[str], sampled: bool,
+                 kind: str = "internal", is_local_root: bool = False):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_span_id = parent_span_id
+        self.name = name
+        self.kind = kind
+        self.sampled = sampled
+        self.is_local_root = is_local_root
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes: Dict[str, Any] = {}
+        self.events: List[Dict[str, Any]] = []
+        self.status = "UNSET"
+        self.status_message = None
+
+    def set_attribute(self, key: str, value: Any):
+        if value is not None:
+            self.attributes[key] = value if isinstance(value, (str, bool, int, float)) else str(value)
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def add_event(self, name: str, **attributes):
+        self.events.append({"name": name, "timeUnixNano": time.time_ns(), "attributes": attributes})
+
+    def record_exception(self, error: BaseException):
+        self.status, self.status_message = "ERROR", str(error)
+        self.add_event("exception", **{"exception.type": type(error).__name__, "exception.message": str(error)})
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id or "",
+            "name": self.name,
+            "kind": f"SPAN_KIND_{self.kind.upper()}",
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "events": self.events,
+            "status": {"code": f"STATUS_CODE_{self.status}", "message": self.status_message or ""},
+            "resource": {"service.name": "operatoros", "process.pid": os.getpid()}
+        }
+
+class Tracer:
+    """
+    The current span lives in a contextvar, so nesting follows the call stack within a thread;
+    work handed to another thread or a background job carries current_context() and resumes
+    the trace with span(..., parent=context). Unsampled traces still get ids but export nothing.
+    """
+
+    def __init__(self, export_path: str = TRACE_EXPORT_PATH, sample_rate: float = TRACE_SAMPLE_RATE):
+        self.enabled = TRACING_ENABLED
+        self.export_path = export_path
+        self.sample_rate = sample_rate
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=100)
+        self.stats = {"spans": 0, "traces": 0, "exported": 0, "export_errors": 0, "rotations": 0}
+
+    # --- spans ---
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[Dict[str, Any]] = None, kind: str = "internal",
+             **attributes):
+        """
+        Time a block as a child of the current span. `parent` (from current_context(), possibly
+        in another thread or process) continues that trace; with neither, a new trace starts.
+        """
+        span, token = self.start_span(name, parent=parent, kind=kind, **attributes)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            self.end_span(span, token)
+
+    def start_span(self, name: str, parent: Optional[Dict[str, Any]] = None, kind: str = "internal",
+                   **attributes):
+        """Open a span and make it current; for code that cannot use `with tracer.span(...)`"""
+        if not self.enabled:
+            return Span(name, "0" * 32, None, False), None
+
+        current = _current_span.get()
+        if parent:
+            span = Span(name, parent["trace_id"], parent.get("span_id"), parent.get("sampled", True),
+                        kind=kind, is_local_root=True)
+        elif current is not None:
+            span = Span(name, current.trace_id, current.span_id, current.sampled, kind=kind)
+        else:
+            span = Span(name, f"{random.getrandbits(128):032x}", None,
+                        random.random() < self.sample_rate, kind=kind, is_local_root=True)
+        span.set_attributes(attributes)
+        return span, _current_span.set(span)
+
+    def traced(self, name: str):
+        """Decorator running each call of a function inside a span"""
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def end_span(self, span: Span, token):
+        """Close a span from start_span and restore the previous current span"""
+        if token is None:
+            return
+        _current_span.reset(token)
+        self._end(span)
+
+    def _end(self, span: Span):
+        span.end_ns = time.time_ns()
+        if span.status == "UNSET":
+            span.status = "OK"
+        if not span.sampled:
+            return
+        with self._lock:
+            self.stats["spans"] += 1
+            self._buffer.append(span.to_dict())
+            if span.is_local_root:
+                self.stats["traces"] += 1
+                self._recent.append({
+                    "trace_id": span.trace_id, "name": span.name,
+                    "duration_ms": round(span.duration_ms, 2), "status": span.status
+                })
+            flush = span.is_local_root or len(self._buffer) >= TRACE_FLUSH_SPANS
+        if flush:
+            self.flush()
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def current_trace_id(self) -> Optional[str]:
+        span = _current_span.get()
+        return span.trace_id if span is not None else None
+
+    def current_context(self) -> Optional[Dict[str, Any]]:
+        """JSON-safe reference to the current span, for continuing the trace elsewhere"""
+        span = _current_span.get()
+        if span is None or not self.enabled:
+            return None
+        return {"trace_id": span.trace_id, "span_id": span.span_id, "sampled": span.sampled}
+
+    def set_attributes(self, **attributes):
+        """Attach attributes to the current span, if any"""
+        span = _current_span.get()
+        if span is not None:
+            span.set_attributes(attributes)
+
+    def wrap(self, func: Callable) -> Callable:
+        """Bind func to the caller's trace context, for running it on an executor thread"""
+        context = contextvars.copy_context()
+        return lambda *args, **kwargs: context.run(func, *args, **kwargs)
+
+    # --- export ---
+
+    def flush(self):
+        """Append buffered spans to the JSONL export file in one write"""
+        with self._lock:
+            spans, self._buffer = self._buffer, []
+        if not spans:
+            return
+        try:
+            data = "".join(json.dumps(span, default=str) + "\n" for span in spans)
+            # A single O_APPEND write keeps lines from different workers intact
+            fd = os.open(self.export_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, data.encode("utf-8"))
+                if os.fstat(fd).st_size >= TRACE_MAX_BYTES:
+                    self._rotate(fd)
+            finally:
+                os.close(fd)
+            with self._lock:
+                self.stats["exported"] += len(spans)
+        except Exception as e:
+            with self._lock:
+                self.stats["export_errors"] += 1
+            logging.error(f"Trace export failed: {str(e)}")
+
+    def _rotate(self, fd: int):
+        """Move the full export file aside, unless another worker already has"""
+        try:
+            # Only rotate the file this write went to; a fresh file must not replace the full one
+            if os.stat(self.export_path).st_ino != os.fstat(fd).st_ino:
+                return
+            os.replace(self.export_path, self.export_path + ".1")
+            with self._lock:
+                self.stats["rotations"] += 1
+        except FileNotFoundError:
+            pass
+
+    def get_trace(self, trace_id: str) -> Dict[str, Any]:
+        """Spans of one trace from the export files, as a tree with per-stage durations"""
+        self.flush()
+        spans = []
+        needle = trace_id.encode("utf-8")
+        remaining = TRACE_LOOKUP_BYTES
+        # Newest file first; the rotated one is read only for what the lookup window has left
+        for path in (self.export_path, self.export_path + ".1"):
+            if remaining <= 0:
+                break
+            try:
+                with open(path, "rb") as f:
+                    f.seek(0, os.SEEK_END)
+                    size = f.tell()
+                    f.seek(max(0, size - remaining))
+                    remaining -= size
+                    for line in f:
+                        if needle in line:
+                            try:
+                                spans.append(json.loads(line))
+                            except ValueError:
+                                continue
+            except FileNotFoundError:
+                continue
+
+        children: Dict[str, List[Dict[str, Any]]] = {}
+        span_ids = {span["spanId"] for span in spans}
+        for span in sorted(spans, key=lambda s: s["startTimeUnixNano"]):
+            parent = span["parentSpanId"] if span["parentSpanId"] in span_ids else ""
+            children.setdefault(parent, []).append(span)
+
+        def build(span):
+            return {
+                "name": span["name"],
+                "span_id": span["spanId"],
+                "duration_ms": span["durationMs"],
+                "status": span["status"]["code"].replace("STATUS_CODE_", ""),
+                "attributes": span["attributes"],
+                "children": [build(child) for child in children.get(span["spanId"], [])]
+            }
+
+        roots = children.get("", [])
+        return {
+            "trace_id": trace_id,
+            "span_count": len(spans),
+            "duration_ms": round(
+                (max(s["endTimeUnixNano"] for s in spans) - min(s["startTimeUnixNano"] for s in spans)) / 1e6, 2
+            ) if spans else 0.0,
+            "spans": [build(root) for root in roots]
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, enabled=self.enabled, sample_rate=self.sample_rate,
+                        export_path=self.export_path, recent=list(self._recent)[-10:])
+
+# Global tracer
+tracer = Tracer()
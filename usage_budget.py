@@ -0,0 +1,371 @@
+"""
+Usage Budget - OperatorOS
+Per-user LLM spend caps by subscription tier over rolling daily and 30-day windows, shared across worker processes
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Callable, Tuple
+from sqlalchemy import select, update, case, func
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+
+# USD per rolling 24 hours / 30 days; unknown tiers get the free budget
+DEFAULT_TIER_BUDGETS = {
+    "free": {"daily": 0.50, "monthly": 5.00},
+    "premium": {"daily": 5.00, "monthly": 60.00},
+    "professional": {"daily": 20.00, "monthly": 250.00},
+    "enterprise": {"daily": 100.00, "monthly": 1500.00}
+}
+# Share of a budget after which calls switch to cheaper models and chains get shorter
+DEFAULT_DEGRADE_AT = 0.8
+
+BUCKET_SECONDS = 3600
+DAY_BUCKETS = 24
+MONTH_BUCKETS = 30 * 24
+# Reservations older than this are treated as calls that died before reconciling
+RESERVATION_TTL_BUCKETS = 2
+
+@dataclass
+class BudgetAccount:
+    """The user LLM calls in the current context are charged to"""
+    user_id: str
+    tier: str
+    economy: bool = False
+
+@dataclass
+class BudgetReservation:
+    """Estimated cost held against an account until the call's actual cost is known"""
+    account: str
+    bucket: int
+    amount: float
+
+class BudgetExceeded(Exception):
+    """Raised when a call's estimated cost does not fit in the user's remaining budget"""
+
+    def __init__(self, user_id: str, window: str, limit: float, used: float):
+        super().__init__(f"{window.capitalize()} usage budget of ${limit:.2f} reached (${used:.2f} used)")
+        self.user_id = user_id
+        self.window = window
+        self.limit = limit
+        self.used = used
+
+_account: contextvars.ContextVar[Optional[BudgetAccount]] = contextvars.ContextVar("budget_account", default=None)
+
+class UsageBudget:
+    """
+    Spend is kept in hourly UsageBudgetBucket rows in the application database, so every
+    worker and every autoscaled instance enforces the same cap. A user's earlier conversation
+    costs are loaded once, when their UsageBudgetAccount row is created. Each provider call
+    reserves its estimated cost before it is made, holding that row's lock while it checks the
+    windows, and replaces the reservation with the actual cost afterwards in a single UPDATE.
+    Calls made outside a bound account (admins, automations without an owner) are not limited;
+    scheduled runs of a user's automation are charged to that user.
+    """
+
+    def __init__(self, budgets: Dict[str, Dict[str, float]] = None):
+        self.enabled = os.environ.get('USAGE_BUDGET_ENABLED', 'true').lower() == 'true'
+        self.budgets = dict(DEFAULT_TIER_BUDGETS)
+        self.budgets.update(budgets or self._load_env_budgets())
+        self.degrade_at = float(os.environ.get('USAGE_BUDGET_DEGRADE_AT', str(DEFAULT_DEGRADE_AT)))
+
+        self._lock = threading.Lock()
+        self._seeded = set()
+        self.stats = {"reserved": 0, "rejected": 0, "reconciled": 0,
+                      "estimated_cost": 0.0, "actual_cost": 0.0}
+
+    def _load_env_budgets(self) -> Dict[str, Dict[str, float]]:
+        """Read tier budget overrides from USAGE_BUDGETS (JSON)"""
+        raw = os.environ.get('USAGE_BUDGETS')
+        if not raw:
+            return {}
+        try:
+            return json.loads(raw)
+        except ValueError as e:
+            logging.error(f"Invalid USAGE_BUDGETS: {str(e)}")
+            return {}
+
+    @contextmanager
+    def _begin(self):
+        """Transaction on the application database, usable from threads without an app context"""
+        from flask import has_app_context
+        from app import app, db
+
+        if has_app_context():
+            with db.engine.begin() as conn:
+                yield conn
+            return
+        with app.app_context():
+            with db.engine.begin() as conn:
+                yield conn
+
+    # --- accounts ---
+
+    def limits_for(self, tier: str) -> Dict[str, float]:
+        return self.budgets.get(tier or "free") or self.budgets["free"]
+
+    def bind(self, user_id: str, tier: str):
+        """Charge LLM calls in the current context to a user; returns a token for unbind()"""
+        if not self.enabled:
+            return None
+        return _account.set(BudgetAccount(user_id=user_id, tier=tier or "free"))
+
+    def unbind(self, token):
+        if token is not None:
+            _account.reset(token)
+
+    @contextmanager
+    def account_for_user(self, user_id: Optional[str]):
+        """Charge the block to a stored user (by id); admins and missing users are not limited"""
+        token = None
+        if self.enabled and user_id:
+            from app import db
+            from models import User
+
+            user = db.session.get(User, user_id)
+            if user is not None and not user.is_admin:
+                token = self.bind(user.id, user.subscription_tier)
+        try:
+            yield
+        finally:
+            self.unbind(token)
+
+    @contextmanager
+    def economy(self, enabled: bool = True):
+        """Prefer cheaper providers and models for LLM calls in the block"""
+        account = _account.get()
+        token = None
+        if enabled and account is not None and not account.economy:
+            token = _account.set(BudgetAccount(account.user_id, account.tier, economy=True))
+        try:
+            yield
+        finally:
+            self.unbind(token)
+
+    def current_account(self) -> Optional[BudgetAccount]:
+        return _account.get()
+
+    def should_economize(self) -> bool:
+        """Whether the current call should use the cheaper route: requested, or its user is near the limit"""
+        account = _account.get()
+        if account is None:
+            return False
+        if account.economy:
+            return True
+        return self._used_fraction(account) >= self.degrade_at
+
+    # --- counters ---
+
+    def _bucket(self, now: float = None) -> int:
+        return int((now or time.time()) // BUCKET_SECONDS)
+
+    def _ensure_seeded(self, account: str):
+        """Load a user's recent spend from stored conversations the first time any instance sees them"""
+        from models import UsageBudgetAccount, UsageBudgetBucket
+
+        if account in self._seeded:
+            return
+        accounts = UsageBudgetAccount.__table__
+        try:
+            with self._begin() as conn:
+                if conn.execute(select(accounts.c.user_id).where(accounts.c.user_id == account)).first():
+                    self._seeded.add(account)
+                    return
+            with self._begin() as conn:
+                # The account row's primary key makes exactly one instance's seed win
+                conn.execute(accounts.insert().values(user_id=account))
+                buckets = self._stored_spend(conn, account)
+                if buckets:
+                    conn.execute(UsageBudgetBucket.__table__.insert(), [
+                        {"user_id": account, "bucket": bucket, "spent": spent, "reserved": 0.0}
+                        for bucket, spent in buckets.items()
+                    ])
+            self._seeded.add(account)
+        except IntegrityError:
+            self._seeded.add(account)
+        except Exception as e:
+            logging.warning(f"Usage budget seeding failed for {account}: {str(e)}")
+
+    def _stored_spend(self, conn, user_id: str) -> Dict[int, float]:
+        """Per-bucket cost of the user's conversations in the last 30 days"""
+        from datetime import datetime, timedelta
+        from models import AIConversation
+
+        since = datetime.now() - timedelta(seconds=MONTH_BUCKETS * BUCKET_SECONDS)
+        rows = conn.execute(select(AIConversation.created_at, AIConversation.cost).where(
+            AIConversation.user_id == user_id,
+            AIConversation.created_at >= since,
+            AIConversation.cost > 0,
+            # Synthesis rows repeat the total of the agent rows they summarize
+            AIConversation.provider != "synthesis"
+        )).all()
+        buckets: Dict[int, float] = {}
+        for created_at, cost in rows:
+            bucket = self._bucket(created_at.timestamp())
+            buckets[bucket] = buckets.get(bucket, 0.0) + cost
+        return buckets
+
+    def _window_totals(self, conn, account: str, bucket: int) -> Tuple[float, float]:
+        """(last 24 hours, last 30 days) spend, both including live reservations"""
+        from models import UsageBudgetBucket
+
+        columns = UsageBudgetBucket.__table__.c
+        day, month, reserved = conn.execute(select(
+            func.coalesce(func.sum(case((columns.bucket > bucket - DAY_BUCKETS, columns.spent))), 0.0),
+            func.coalesce(func.sum(columns.spent), 0.0),
+            func.coalesce(func.sum(case((columns.bucket > bucket - RESERVATION_TTL_BUCKETS, columns.reserved))), 0.0)
+        ).where(
+            columns.user_id == account,
+            columns.bucket > bucket - MONTH_BUCKETS
+        )).one()
+        return float(day) + float(reserved), float(month) + float(reserved)
+
+    def _used_fraction(self, account: BudgetAccount) -> float:
+        usage = self.get_usage(account.user_id, account.tier)
+        return usage.get("used_fraction", 0.0)
+
+    def get_usage(self, user_id: str, tier: str) -> Dict[str, Any]:
+        """Spend and limits for the rolling day and 30 days; used_fraction is the tighter of the two"""
+        limits = self.limits_for(tier)
+        self._ensure_seeded(user_id)
+        try:
+            with self._begin() as conn:
+                day, month = self._window_totals(conn, user_id, self._bucket())
+        except SQLAlchemyError as e:
+            logging.warning(f"Usage budget read failed: {str(e)}")
+            return {"tier": tier, "error": str(e), "used_fraction": 0.0}
+        return {
+            "tier": tier,
+            "daily": {"used": round(day, 6), "limit": limits["daily"]},
+            "monthly": {"used": round(month, 6), "limit": limits["monthly"]},
+            "remaining": round(max(0.0, min(limits["daily"] - day, limits["monthly"] - month)), 6),
+            "used_fraction": max(day / limits["daily"] if limits["daily"] else 0.0,
+                                 month / limits["monthly"] if limits["monthly"] else 0.0)
+        }
+
+    # --- enforcement ---
+
+    def reserve(self, estimated_cost: float) -> Optional[BudgetReservation]:
+        """
+        Hold `estimated_cost` against the current account before a provider call
+        Raises BudgetExceeded when it does not fit in the daily or 30-day budget; returns
+        None (no limit) when no account is bound or the store is unusable.
+        """
+        account = _account.get()
+        if not self.enabled or account is None:
+            return None
+
+        from models import UsageBudgetAccount, UsageBudgetBucket
+
+        limits = self.limits_for(account.tier)
+        self._ensure_seeded(account.user_id)
+        bucket = self._bucket()
+        accounts = UsageBudgetAccount.__table__
+        buckets = UsageBudgetBucket.__table__
+        try:
+            with self._begin() as conn:
+                # Lock the user's account row so concurrent reservations on any instance check in turn
+                conn.execute(select(accounts.c.user_id).where(
+                    accounts.c.user_id == account.user_id
+                ).with_for_update())
+                day, month = self._window_totals(conn, account.user_id, bucket)
+                for window, used in (("daily", day), ("monthly", month)):
+                    if used + estimated_cost > limits[window]:
+                        with self._lock:
+                            self.stats["rejected"] += 1
+                        raise BudgetExceeded(account.user_id, window, limits[window], used)
+                updated = conn.execute(update(buckets).where(
+                    buckets.c.user_id == account.user_id, buckets.c.bucket == bucket
+                ).values(reserved=buckets.c.reserved + estimated_cost)).rowcount
+                if not updated:
+                    conn.execute(buckets.insert().values(
+                        user_id=account.user_id, bucket=bucket, spent=0.0, reserved=estimated_cost
+                    ))
+        except SQLAlchemyError as e:
+            logging.warning(f"Usage budget store error ({str(e)}), allowing call")
+            return None
+
+        with self._lock:
+            self.stats["reserved"] += 1
+            self.stats["estimated_cost"] += estimated_cost
+        return BudgetReservation(account=account.user_id, bucket=bucket, amount=estimated_cost)
+
+    def reconcile(self, reservation: Optional[BudgetReservation], actual_cost: float):
+        """Replace a reservation with the call's actual cost (0 for calls that failed)"""
+        if reservation is None:
+            return
+        from models import UsageBudgetBucket
+
+        buckets = UsageBudgetBucket.__table__
+        try:
+            with self._begin() as conn:
+                conn.execute(update(buckets).where(
+                    buckets.c.user_id == reservation.account, buckets.c.bucket == reservation.bucket
+                ).values(
+                    reserved=case((buckets.c.reserved > reservation.amount, buckets.c.reserved - reservation.amount),
+                                  else_=0.0),
+                    spent=buckets.c.spent + (actual_cost or 0.0)
+                ))
+        except SQLAlchemyError as e:
+            logging.warning(f"Usage budget reconcile failed: {str(e)}")
+            return
+        with self._lock:
+            self.stats["reconciled"] += 1
+            self.stats["actual_cost"] += actual_cost or 0.0
+
+    def plan_chain(self, estimate_tokens: Callable[[int], int], chain_length: int,
+                   user_id: str = None, tier: str = None) -> Dict[str, Any]:
+        """
+        Fit an agent chain into the remaining budget before running it
+        `estimate_tokens(n)` gives the expected tokens of an n-agent chain. Below the degrade
+        threshold the full chain runs as planned; near the limit it runs on cheaper models with
+        as many agents as still fit; when not even one agent fits it is refused.
+        """
+        account = _account.get()
+        user_id = user_id or (account.user_id if account else None)
+        tier = tier or (account.tier if account else None)
+        full_cost = self._estimate_chain_cost(estimate_tokens(chain_length), economy=False)
+        plan = {"allowed": True, "max_agents": chain_length, "economy": False,
+                "estimated_cost": round(full_cost, 6)}
+        if not self.enabled or not user_id:
+            return plan
+
+        usage = self.get_usage(user_id, tier)
+        plan["remaining"] = usage.get("remaining")
+        if "error" in usage:
+            return plan
+        if usage["used_fraction"] < self.degrade_at and full_cost <= usage["remaining"]:
+            return plan
+
+        for agents in range(chain_length, 0, -1):
+            cost = self._estimate_chain_cost(estimate_tokens(agents), economy=True)
+            if cost <= usage["remaining"]:
+                plan.update(max_agents=agents, economy=True, estimated_cost=round(cost, 6))
+                return plan
+        plan.update(allowed=False, max_agents=0, economy=True)
+        return plan
+
+    def _estimate_chain_cost(self, tokens: int, economy: bool) -> float:
+        """Cost of `tokens` on the priciest configured provider, split evenly between input and output"""
+        from ai_providers import ai_manager
+        return ai_manager.estimate_cost(tokens // 2, tokens - tokens // 2, economy=economy)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Configured budgets and local counters"""
+        with self._lock:
+            stats = dict(self.stats)
+        return {
+            "enabled": self.enabled,
+            "shared_store": "database",
+            "budgets": self.budgets,
+            "degrade_at": self.degrade_at,
+            **stats
+        }
+
+# Global usage budget
+usage_budget = UsageBudget()